@@ -0,0 +1,112 @@
+"""Crawl-budget reports from server access logs.
+
+Usage:
+    # Verified Googlebot/Bingbot hits (reverse DNS) next to an export's traffic
+    uv run python scripts/access_logs.py ingest --log /var/log/nginx/access.log* \
+        --csv data/<export>.csv --out-dir artifacts/crawl_budget
+
+    # Verify against a published IP list instead of DNS
+    uv run python scripts/access_logs.py ingest --log access.log.gz --csv data/<export>.csv \
+        --verify ranges --ip-ranges googlebot.json
+
+    # Throughput on a generated log (bytes/second, peak RSS)
+    uv run python scripts/access_logs.py bench --size-mb 1024
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from designrush_seo_audit.access_logs import (
+    SITE,
+    crawl_budget_reports,
+    crawl_hits,
+    ingest_access_logs,
+    read_bot_hits,
+    verified_ips,
+)
+from designrush_seo_audit.analysis import load_positions
+
+
+def write_sample_log(path: Path, size_mb: int, seed: int = 0) -> int:
+    """Write a combined-format log of about `size_mb` MB (~10% bot lines); returns the line count."""
+    rng = random.Random(seed)
+    paths = [f"/agency/{s}" for s in ("search-engine-optimization", "website-design-development", "branding")]
+    paths += [f"{p}/{state}" for p in paths for state in ("texas", "florida", "new-york", "california")]
+    paths += [f"/trends/article-{i}" for i in range(200)]
+    agents = ["Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/128.0 Safari/537.36"] * 18 + [
+        "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+        "Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)",
+    ]
+    block = []
+    for i in range(20000):
+        day = 1 + i % 28
+        block.append(
+            f'66.249.66.{rng.randint(1, 254)} - - [{day:02d}/Sep/2025:{rng.randint(0, 23):02d}:14:03 +0000] '
+            f'"GET {rng.choice(paths)}?page={rng.randint(1, 3)} HTTP/1.1" {rng.choice([200] * 9 + [301, 404])} '
+            f'{rng.randint(2000, 90000)} "-" "{rng.choice(agents)}"\n'
+        )
+    data = "".join(block).encode()
+    lines = 0
+    with open(path, "wb") as f:
+        while f.tell() < size_mb << 20:
+            f.write(data)
+            lines += len(block)
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Access-log crawl-budget analysis")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ingest = sub.add_parser("ingest", help="Parse logs and join crawl hits to ranking traffic")
+    p_ingest.add_argument("--log", type=Path, nargs="+", required=True, help="Access log files (plain or .gz)")
+    p_ingest.add_argument("--csv", type=Path, required=True, help="Path to the SEMrush CSV")
+    p_ingest.add_argument("--out-dir", type=Path, default=Path("artifacts") / "crawl_budget")
+    p_ingest.add_argument("--verify", choices=["dns", "ranges", "none"], default="dns", help="How bot IPs are verified")
+    p_ingest.add_argument("--ip-ranges", type=Path, default=None, help="Published bot IP list for --verify ranges")
+    p_ingest.add_argument("--site", default=SITE, help="Scheme and host that log paths belong to")
+    p_bench = sub.add_parser("bench", help="Ingest a generated log and report throughput")
+    p_bench.add_argument("--size-mb", type=int, default=1024)
+    for p in (p_ingest, p_bench):
+        p.add_argument("--workers", type=int, default=None, help="Parser processes (defaults to CPU count)")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        if args.verify == "ranges" and not args.ip_ranges:
+            parser.error("--verify ranges needs --ip-ranges")
+        start = time.perf_counter()
+        daily = ingest_access_logs(args.log, args.verify, args.ip_ranges, site=args.site, workers=args.workers)
+        reports = crawl_budget_reports(load_positions(args.csv), daily)
+        args.out_dir.mkdir(parents=True, exist_ok=True)
+        for name, rdf in reports.items():
+            rdf.write_csv(args.out_dir / f"{name}.csv")
+        print(f"{int(daily['hits'].sum()):,} verified bot hits in {time.perf_counter() - start:.1f}s → {args.out_dir}")
+        with pl.Config(tbl_rows=20, tbl_hide_dataframe_shape=True):
+            print(reports["crawl_budget_by_service"].head(20))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = Path(tmp) / "access.log"
+        lines = write_sample_log(log, args.size_mb)
+        size = log.stat().st_size
+        start = time.perf_counter()
+        hits = read_bot_hits([log], workers=args.workers)
+        elapsed = time.perf_counter() - start
+        daily = crawl_hits(hits, verified_ips(hits, verify="none"))
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        rss_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        print(
+            f"{size / 2**20:,.0f} MB, {lines:,} lines in {elapsed:.1f}s "
+            f"({size / 2**30 / elapsed * 60:.1f} GB/min); {int(daily['hits'].sum()):,} bot hits, "
+            f"{daily.height:,} URL-days; peak RSS {rss:,.0f} MB (largest worker {rss_children:,.0f} MB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
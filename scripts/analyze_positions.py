@@ -3,6 +3,12 @@
 Usage:
     uv run python scripts/analyze_positions.py \
         --csv data/www.designrush.com_agency-organic.Positions-us-20250911-2025-09-12T16_10_02Z.csv
+
+    # Draft preview on a stratified sample (writes artifacts/<date>-draft/)
+    uv run python scripts/analyze_positions.py --csv data/<export>.csv --sample 0.05
+
+    # Quarantine malformed rows instead of failing on the first one
+    uv run python scripts/analyze_positions.py --csv data/<export>.csv --quarantine
 """
 from __future__ import annotations
 
@@ -33,7 +39,86 @@ def main() -> None:
         action="store_true",
         help="Also capture screenshots (Spider) and rebuild the deck including them",
     )
+    parser.add_argument(
+        "--sample",
+        type=float,
+        nargs="?",
+        const=0.05,
+        default=None,
+        metavar="FRACTION",
+        help="Draft mode: run on a stratified sample of the long tail (default fraction 0.05) "
+        "and report scaled estimates with error bars",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for --sample")
+    parser.add_argument(
+        "--sketches",
+        action="store_true",
+        help="Also write sketch-based distinct counts and percentiles (services_sketches.csv, locations_sketches.csv)",
+    )
+    parser.add_argument(
+        "--links-csv",
+        type=Path,
+        default=None,
+        help="Crawled internal links (CSV with source,target URL columns) to add to the link-equity graph",
+    )
+    parser.add_argument(
+        "--crawl",
+        action="store_true",
+        help="Also fetch every ranking URL for title/meta/H1/canonical/internal links (pages.csv, page_links.csv)",
+    )
+    parser.add_argument(
+        "--pages",
+        type=Path,
+        default=None,
+        help="Page titles/headings for keyword coverage: a pages.csv from a crawl or a local HTML mirror directory",
+    )
+    parser.add_argument(
+        "--access-log",
+        type=Path,
+        nargs="+",
+        default=None,
+        help="Server access logs (combined/nginx, plain or .gz) for crawl-budget reports",
+    )
+    parser.add_argument(
+        "--log-verify",
+        choices=["dns", "ranges", "none"],
+        default="dns",
+        help="Verify bot IPs by forward-confirmed reverse DNS, against --ip-ranges, or trust the user agent",
+    )
+    parser.add_argument(
+        "--ip-ranges",
+        type=Path,
+        default=None,
+        help="Published bot IP list (e.g. Google's googlebot.json) for --log-verify ranges",
+    )
+    parser.add_argument(
+        "--gsc",
+        type=Path,
+        default=None,
+        help="Search Console performance export (query, page, clicks, impressions, position; CSV or Parquet) "
+        "to calibrate the CTR curve used by the forecasts",
+    )
+    parser.add_argument(
+        "--buckets",
+        type=lambda v: tuple(int(x) for x in v.split(",")),
+        default=None,
+        help="Position bucket upper bounds for ranking_distribution.csv, e.g. 3,10,50 (the default)",
+    )
+    parser.add_argument(
+        "--backlinks",
+        type=Path,
+        nargs="+",
+        default=None,
+        help="SEMrush or Ahrefs backlink exports (CSV/TSV or Parquet) for off-page reports",
+    )
+    parser.add_argument(
+        "--quarantine",
+        action="store_true",
+        help="Set aside malformed rows (to quarantine.parquet, with line and reason) instead of aborting",
+    )
     args = parser.parse_args()
+    if args.log_verify == "ranges" and not args.ip_ranges:
+        parser.error("--log-verify ranges needs --ip-ranges")
 
     csv_path: Path
     if isinstance(args.csv, Path):
@@ -45,11 +130,29 @@ def main() -> None:
             raise SystemExit("No matching CSV found in data/")
         csv_path = matches[0]
 
-    arts = run_full_analysis(csv_path, args.out_dir)
+    arts = run_full_analysis(
+        csv_path,
+        args.out_dir,
+        sample_fraction=args.sample,
+        sample_seed=args.seed,
+        sketches=args.sketches,
+        links_csv=args.links_csv,
+        crawl=args.crawl,
+        pages_path=args.pages,
+        access_logs=args.access_log,
+        log_verify=args.log_verify,
+        ip_ranges_path=args.ip_ranges,
+        gsc_path=args.gsc,
+        backlinks=args.backlinks,
+        agency_buckets=args.buckets,
+        quarantine=args.quarantine,
+    )
     print(f"Artifacts written to: {arts.base_dir}")
     print(f"- Summary: {arts.summary_md}")
     print(f"- Top keywords: {arts.top_keywords_csv}")
     print(f"- Quick wins: {arts.quick_wins_csv}")
+    if arts.quarantine_parquet:
+        print(f"- Quarantined rows: {arts.quarantine_parquet}")
     if arts.deck_md:
         print(f"- Deck: {arts.deck_md}")
     if arts.deck_html:
@@ -76,9 +179,10 @@ def main() -> None:
             subprocess.run(cmd, check=False)
         except Exception as e:
             print(f"Warning: screenshot capture failed: {e}")
-        # Rebuild deck to pick up screenshots
+        # Rebuild only the decks (no re-ingestion, crawl, log parsing or export reads) to pick up screenshots
         print("Rebuilding deck to include screenshots…")
-        run_full_analysis(csv_path, arts.base_dir)
+        if arts.rebuild_deck:
+            arts.deck_md, arts.deck_html = arts.rebuild_deck()
         print(f"Screenshots embedded. Open: {arts.base_dir / 'deck.html'}")
 
 
@@ -0,0 +1,91 @@
+"""Submit audit jobs to the shared queue and run workers against it.
+
+Usage:
+    # Queue a run (any machine that can reach the queue file)
+    uv run python scripts/audit_queue.py submit \
+        --csv data/www.designrush.com_agency-organic.Positions-us-20250911-2025-09-12T16_10_02Z.csv
+
+    # Start a worker (run one per core/box; they coordinate through the file)
+    uv run python scripts/audit_queue.py worker
+
+    # Inspect job states and stage timings
+    uv run python scripts/audit_queue.py status
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from designrush_seo_audit.jobs import DEFAULT_QUEUE_PATH, JobQueue, run_worker
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="File-backed audit job queue")
+    parser.add_argument(
+        "--queue",
+        type=Path,
+        default=DEFAULT_QUEUE_PATH,
+        help="Path to the SQLite queue file (put it on a shared filesystem for multi-machine use)",
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=120.0,
+        help="Seconds without a heartbeat before a running job is reclaimed",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_submit = sub.add_parser("submit", help="Queue a run_full_analysis job")
+    p_submit.add_argument("--csv", type=Path, required=True, help="Path to the SEMrush CSV")
+    p_submit.add_argument("--out-dir", type=Path, default=None, help="Output directory (defaults to artifacts/jobs/<job id>/)")
+    p_submit.add_argument("--max-attempts", type=int, default=3)
+    p_submit.add_argument("--no-charts", action="store_true", help="Skip chart generation")
+    p_submit.add_argument("--no-deck", action="store_true", help="Skip deck generation")
+
+    p_worker = sub.add_parser("worker", help="Claim and run queued jobs")
+    p_worker.add_argument("--id", default=None, help="Worker id (defaults to <host>:<pid>)")
+    p_worker.add_argument("--poll", type=float, default=2.0, help="Seconds between polls when idle")
+    p_worker.add_argument("--max-jobs", type=int, default=None, help="Exit after this many jobs")
+    p_worker.add_argument("--exit-when-idle", action="store_true", help="Exit once the queue is empty")
+
+    sub.add_parser("status", help="Show job states and stage timings")
+
+    args = parser.parse_args()
+    queue = JobQueue(args.queue, lease_seconds=args.lease)
+
+    if args.command == "submit":
+        job_id = queue.submit(
+            args.csv,
+            args.out_dir,
+            max_attempts=args.max_attempts,
+            generate_charts=not args.no_charts,
+            generate_deck=not args.no_deck,
+        )
+        print(f"Queued job {job_id}: {args.csv}")
+    elif args.command == "worker":
+        n = run_worker(
+            queue,
+            worker=args.id,
+            poll_interval=args.poll,
+            max_jobs=args.max_jobs,
+            exit_when_idle=args.exit_when_idle,
+        )
+        print(f"Worker processed {n} job(s)")
+    else:
+        counts = queue.counts()
+        print("Jobs: " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())) if counts else "Jobs: none")
+        for job in queue.jobs():
+            line = f"- #{job.id} {job.state} attempts {job.attempts}/{job.max_attempts} {job.csv_path}"
+            if job.worker:
+                line += f" [{job.worker}]"
+            if job.timings:
+                total = sum(job.timings.values())
+                stages = ", ".join(f"{k} {v:.2f}s" for k, v in job.timings.items())
+                line += f" total {total:.2f}s ({stages})"
+            if job.error:
+                line += f" error: {job.error}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,248 @@
 """Lightweight checks for the SEO audit dataset.
 
+The data-quality rules (null rates, ranges, duplicates, Traffic (%) total,
+timestamps, unclassified URLs; see designrush_seo_audit/quality.py) run in
+one lazy scan of the export and print a report; only fatal rules fail the
+run. The consistency checks of the sharded aggregates and the taxonomy
+matcher follow, then the coverage of the draft-mode (--sample) error bars,
+the internal-linking neighbour search (exactness and a 100k-URL scale run)
+and the job queue under several worker processes.
+
 Run with:
-    uv run python scripts/checks.py
+    uv run python scripts/checks.py [--csv data/<export>.csv] [--samples 5]
 """
 from __future__ import annotations
 
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
 from pathlib import Path
 
+import numpy as np
 import polars as pl
+from polars.testing import assert_frame_equal
 
 from designrush_seo_audit.analysis import (
-    REQUIRED_COLUMNS,
+    COL_TRAFFIC,
+    COL_KEYWORD,
+    COL_TRAFFIC_COST,
+    COL_URL,
+    categories_breakdown,
+    intent_mix,
     load_positions,
+    overview,
+    services_breakdown,
+    top_keywords_by_traffic,
+    top_pages_by_traffic,
 )
+from designrush_seo_audit.jobs import DONE, RUNNING, Job, JobQueue, run_worker
+from designrush_seo_audit.linking import similar_pages, url_token_matrix
+from designrush_seo_audit.partials import aggregate_sharded, finalize, split_frame
+from designrush_seo_audit.quality import check_positions
+from designrush_seo_audit.sampling import sample_error_bars, stratified_sample
+from designrush_seo_audit.taxonomy import load_taxonomy
 
 
-def main() -> None:
-    # Find the CSV
-    matches = list(Path("data").glob("www.designrush.com_*organic.Positions-*.csv"))
-    assert matches, "No SEMrush organic positions CSV found in data/"
-    csv_path = matches[0]
-    df = load_positions(csv_path)
+def check_sharded_aggregates(df: pl.DataFrame) -> None:
+    """Merged partial aggregates must match the single-frame reports exactly."""
+    one = finalize(aggregate_sharded(split_frame(df, 1)))
+    sixteen = finalize(aggregate_sharded(split_frame(df, 16)))
+    single = {
+        "categories": categories_breakdown(df),
+        "services": services_breakdown(df),
+        "intents": intent_mix(df),
+        "top_pages": top_pages_by_traffic(df, 100),
+        "top_keywords": top_keywords_by_traffic(df, 100),
+    }
+    ov = overview(df)
+    for res in (one, sixteen):
+        for name, expected in single.items():
+            assert_frame_equal(res[name], expected, check_exact=True)
+        for k in ("total_keywords", "traffic", "traffic_cost", "avg_position"):
+            assert res["overview"][k] == ov[k], f"overview[{k}] differs after merge"
+        assert_frame_equal(res["overview"]["by_bucket"], ov["by_bucket"], check_exact=True)
+
+
+def check_service_matcher(df: pl.DataFrame) -> None:
+    """The compiled taxonomy matcher must agree with a plain last-match-wins regex chain."""
+    taxonomy = load_taxonomy()
+    expr: pl.Expr = pl.lit("other")
+    for pat, label in zip(taxonomy.patterns, taxonomy.labels):
+        expr = pl.when(pl.col(COL_URL).str.contains(pat)).then(pl.lit(label)).otherwise(expr)
+    urls = df.select(COL_URL).unique()
+    chain = urls.select(expr.alias("service"))
+    compiled = urls.select(taxonomy.service_expr(pl.col(COL_URL)).alias("service"))
+    assert_frame_equal(compiled, chain, check_exact=True)
 
-    # Basic sanity checks
-    assert df.height > 0, "CSV is empty"
-    for c in REQUIRED_COLUMNS:
-        assert c in df.columns, f"Missing column: {c}"
 
-    # Check duplicates by keyword+url
-    dupes = (
-        df.group_by(["Keyword", "URL"]).len().filter(pl.col("len") > 1)
+def check_sample_coverage(df: pl.DataFrame, fraction: float = 0.2, seeds: int = 100, min_coverage: float = 0.85) -> None:
+    """Draft-mode 95% intervals must cover the true totals in most seeded samples."""
+    truth = {c: float(df[c].sum()) for c in (COL_TRAFFIC, COL_TRAFFIC_COST)}
+    covered = dict.fromkeys(truth, 0)
+    for seed in range(seeds):
+        overall = sample_error_bars(stratified_sample(df, fraction, seed=seed)).filter(pl.col("service") == "(all)")
+        for metric, lo, hi in overall.select("metric", "ci95_low", "ci95_high").iter_rows():
+            covered[metric] += lo <= truth[metric] <= hi
+    for metric, hits in covered.items():
+        assert hits / seeds >= min_coverage, (
+            f"Draft 95% intervals for {metric} cover the true total in only {hits}/{seeds} samples"
+        )
+
+
+def _synthetic_pages(urls: int, keywords_per_url: int = 8, vocab: int = 20_000, seed: int = 0) -> pl.DataFrame:
+    """One service of `urls` pages ranking for Zipf-distributed keyword tokens plus a service word."""
+    rng = np.random.default_rng(seed)
+    n = urls * keywords_per_url
+    words = np.minimum(rng.zipf(1.3, (n, 2)), vocab)
+    return pl.DataFrame(
+        {
+            COL_URL: np.repeat(np.arange(urls), keywords_per_url).astype(str),
+            "w1": words[:, 0],
+            "w2": words[:, 1],
+            "service": "seo",
+            COL_TRAFFIC: 1.0,
+        }
+    ).select(
+        COL_URL,
+        pl.format("seo agencies w{} w{}", "w1", "w2").alias(COL_KEYWORD),
+        "service",
+        COL_TRAFFIC,
     )
-    assert dupes.height == 0, f"Duplicate keyword+url rows detected: {dupes.height}"
 
-    # Spot check top rows have numeric positions
-    assert df.select(pl.all().exclude("Position")).height >= 0  # structural
-    assert df["Position"].cast(pl.Int64, strict=False).null_count() == 0
+
+def check_similar_pages(urls: int = 1_500, k: int = 5) -> None:
+    """Sparse top-k neighbours equal a brute-force token join over the same matrix."""
+    matrix, _ = url_token_matrix(_synthetic_pages(urls))
+    fast = similar_pages(matrix, k=k, max_postings=urls)
+    right = matrix.rename({"uid": "uid_b", "weight": "weight_b"})
+    brute = (
+        matrix.join(right, on="token")
+        .filter(pl.col("uid") != pl.col("uid_b"))
+        .group_by(["uid", "uid_b"])
+        .agg((pl.col("weight") * pl.col("weight_b")).sum().alias("similarity"))
+        .filter(pl.col("similarity") >= 0.05)
+        .sort(["uid", "similarity", "uid_b"], descending=[False, True, False])
+        .filter(pl.int_range(pl.len()).over("uid") < k)
+    )
+    assert_frame_equal(fast.drop("shared_tokens"), brute, check_exact=False)
+    assert fast["shared_tokens"].null_count() == 0
+
+
+def check_linking_scale(urls: int = 100_000, seconds: float = 60.0) -> None:
+    """Neighbour search over one 100k-page service finishes in bounded time."""
+    matrix, _ = url_token_matrix(_synthetic_pages(urls))
+    start = time.monotonic()
+    similar = similar_pages(matrix, k=5)
+    elapsed = time.monotonic() - start
+    assert elapsed < seconds, f"similar_pages took {elapsed:.1f}s for {urls} URLs"
+    assert similar.height > 0 and similar.group_by("uid").len()["len"].max() <= 5
+    print(f"- Linking: {urls} URLs in one service, top-5 neighbours in {elapsed:.1f}s")
+
+
+def _stub_job(job: Job) -> None:
+    """Stand-in for run_full_analysis: log the run, hang on a first "hang" attempt."""
+    if job.options.get("hang") and job.attempts == 1:
+        time.sleep(3600)
+    time.sleep(0.01)
+    with open(job.options["log"], "a") as f:
+        f.write(f"{job.id}\n")
+
+
+def _queue_worker(path: str, lease: float, worker: str, **kwargs: object) -> None:
+    run_worker(JobQueue(path, lease_seconds=lease), worker=worker, runner=_stub_job, poll_interval=0.1, **kwargs)
+
+
+def check_job_queue(workers: int = 4, jobs: int = 40, lease: float = 2.0) -> None:
+    """Parallel workers run every job exactly once; a killed worker's job is reclaimed after the lease."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path, log = os.path.join(tmp, "queue.sqlite3"), os.path.join(tmp, "runs.log")
+        queue = JobQueue(path, lease_seconds=lease)
+        ids = [queue.submit("export.csv", log=log) for _ in range(jobs)]
+        procs = [
+            mp.Process(target=_queue_worker, args=(path, lease, f"w{i}"), kwargs={"exit_when_idle": True})
+            for i in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(60)
+            assert p.exitcode == 0, f"worker exited with {p.exitcode}"
+        runs = [int(line) for line in Path(log).read_text().split()]
+        assert sorted(runs) == ids, "every job must run exactly once"
+        assert all(j.state == DONE and j.attempts == 1 for j in queue.jobs()), queue.counts()
+
+        # Kill a worker mid-job; another reclaims the job once the lease expires
+        hung = queue.submit("export.csv", log=log, hang=True)
+        victim = mp.Process(target=_queue_worker, args=(path, lease, "victim"), kwargs={"max_jobs": 1})
+        victim.start()
+        deadline = time.monotonic() + 30
+        while queue.get(hung).state != RUNNING:
+            assert time.monotonic() < deadline, "the hung job was never claimed"
+            time.sleep(0.05)
+        victim.kill()
+        victim.join()
+        rescuer = mp.Process(
+            target=_queue_worker, args=(path, lease, "rescuer"), kwargs={"max_jobs": 1, "heartbeat_interval": lease / 4}
+        )
+        rescuer.start()
+        rescuer.join(30 + lease)
+        assert rescuer.exitcode == 0, f"rescuer exited with {rescuer.exitcode}"
+        job = queue.get(hung)
+        assert (job.state, job.attempts, job.worker) == (DONE, 2, "rescuer"), job
+        assert Path(log).read_text().split().count(str(hung)) == 1
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description="Data-quality and consistency checks for a positions export")
+    ap.add_argument("--csv", default=None, help="SEMrush export (default: first data/www.designrush.com_*organic.Positions-*.csv)")
+    ap.add_argument("--samples", type=int, default=5, help="Offending rows shown per failed rule")
+    args = ap.parse_args(argv)
+
+    if args.csv:
+        csv_path = Path(args.csv)
+    else:
+        matches = list(Path("data").glob("www.designrush.com_*organic.Positions-*.csv"))
+        assert matches, "No SEMrush organic positions CSV found in data/"
+        csv_path = matches[0]
+
+    # Every data-quality rule in one scan; raises DataQualityError on fatal rules
+    report = check_positions(csv_path, sample_size=args.samples, fail_fast=False)
+    with pl.Config(tbl_rows=-1, fmt_str_lengths=80, tbl_hide_dataframe_shape=True):
+        print(report.table().drop("description"))
+        if report.failures:
+            print("Sample offending rows:")
+            print(report.samples())
+    if report.fatal:
+        print("Fatal rules failed: " + ", ".join(r.rule.name for r in report.fatal))
+        return 1
+
+    df = load_positions(csv_path)
+
+    # Map-reduce aggregates: 1-shard and 16-shard runs equal the single-frame CSVs
+    check_sharded_aggregates(df)
+
+    # Compiled service taxonomy labels every URL like the regex chain would
+    check_service_matcher(df)
+
+    # Draft-mode error bars are honest: intervals cover the full-export totals across seeds
+    check_sample_coverage(df)
+
+    # Internal linking: sparse top-k equals the exact join, and scales to 100k pages in one service
+    check_similar_pages()
+    check_linking_scale()
+
+    # Job queue: parallel worker processes, exactly-once completion, lease reclaim
+    check_job_queue()
 
     print("Checks passed:")
     print(f"- Rows: {df.height}")
     print(f"- Columns: {len(df.columns)}")
+    print(f"- Warnings: {len(report.failures)}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
-
+    raise SystemExit(main(sys.argv[1:]))
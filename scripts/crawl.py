@@ -0,0 +1,144 @@
+"""Crawl ranking URLs for on-page elements, or benchmark the crawler locally.
+
+Usage:
+    # Fetch every ranking URL in an export; writes pages.csv and page_links.csv
+    uv run python scripts/crawl.py crawl --csv data/<export>.csv --out-dir artifacts/crawl
+
+    # Crawl a local stand-in site of generated pages (cold, then warm with 304s)
+    uv run python scripts/crawl.py bench --pages 5000 --fail-rate 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import polars as pl
+
+from designrush_seo_audit.analysis import COL_URL, read_positions_csv
+from designrush_seo_audit.crawler import CrawlConfig, crawl, link_edges, pages_for_csv
+
+
+def _page(i: int, n: int) -> bytes:
+    links = "".join(f'<li><a href="/agency/p{(i * 7 + k) % n}/">Agency {k}</a></li>' for k in range(1, 21))
+    return (
+        f"<!doctype html><html><head><title>Top Agencies #{i} | DesignRush</title>"
+        f'<meta name="description" content="Generated page {i}.">'
+        f'<link rel="canonical" href="/agency/p{i}/"></head><body>'
+        f"<h1>Top Agencies #{i}</h1><h2>Overview</h2><p>{'Lorem ipsum. ' * 200}</p>"
+        f'<h2>Related</h2><ul>{links}</ul><a href="https://example.org/">external</a></body></html>'
+    ).encode()
+
+
+def serve_stand_in(n: int, fail_rate: float = 0.0) -> tuple[str, threading.Event]:
+    """Serve `n` generated pages over keep-alive HTTP/1.1 on localhost; returns (base URL, stop event).
+
+    Pages carry ETags and answer If-None-Match with 304; `fail_rate` of
+    requests get a 503 to exercise retries.
+    """
+    ready, stop = threading.Event(), threading.Event()
+    base: list[str] = []
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+                m = re.match(r"GET /agency/p(\d+)/ ", head)
+                i = int(m.group(1)) if m else -1
+                etag = f'"p{i}"'
+                if not 0 <= i < n:
+                    status, body, extra = "404 Not Found", b"", ""
+                elif random.random() < fail_rate:
+                    status, body, extra = "503 Service Unavailable", b"", "Retry-After: 0\r\n"
+                elif f"If-None-Match: {etag}" in head:
+                    status, body, extra = "304 Not Modified", b"", f"ETag: {etag}\r\n"
+                else:
+                    status, body, extra = "200 OK", _page(i, n), f"ETag: {etag}\r\n"
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: text/html; charset=utf-8\r\n{extra}"
+                    f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    def run() -> None:
+        async def main() -> None:
+            server = await asyncio.start_server(handle, "127.0.0.1", 0, backlog=1024)
+            base.append(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+            ready.set()
+            while not stop.is_set():
+                await asyncio.sleep(0.1)
+            server.close()
+
+        asyncio.run(main())
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return base[0], stop
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="On-page crawler")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_crawl = sub.add_parser("crawl", help="Crawl the unique URLs of a SEMrush CSV")
+    p_crawl.add_argument("--csv", type=Path, required=True, help="Path to the SEMrush CSV")
+    p_crawl.add_argument("--out-dir", type=Path, default=Path("artifacts") / "crawl")
+    p_bench = sub.add_parser("bench", help="Crawl a generated local site and report pages/second")
+    p_bench.add_argument("--pages", type=int, default=2000)
+    p_bench.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    for p in (p_crawl, p_bench):
+        p.add_argument("--concurrency", type=int, default=CrawlConfig.concurrency)
+        p.add_argument("--per-host", type=int, default=CrawlConfig.per_host, help="Open connections per host")
+        p.add_argument("--rate", type=float, default=None, help="Requests/second per host (0 = unlimited)")
+    p_crawl.add_argument("--no-cache", action="store_true", help="Skip the on-disk response cache")
+    args = parser.parse_args()
+
+    if args.command == "crawl":
+        cfg = CrawlConfig(
+            concurrency=args.concurrency,
+            per_host=args.per_host,
+            rate=CrawlConfig.rate if args.rate is None else args.rate,
+            cache_dir=None if args.no_cache else CrawlConfig.cache_dir,
+        )
+        urls = read_positions_csv(args.csv)[COL_URL].drop_nulls().unique(maintain_order=True).to_list()
+        start = time.perf_counter()
+        pages = crawl(urls, cfg)
+        elapsed = time.perf_counter() - start
+        args.out_dir.mkdir(parents=True, exist_ok=True)
+        pages_for_csv(pages).write_csv(args.out_dir / "pages.csv")
+        link_edges(pages).write_csv(args.out_dir / "page_links.csv")
+        print(f"{pages.height} pages in {elapsed:.1f}s → {args.out_dir}/pages.csv, page_links.csv")
+        print(pages.group_by("status").len().sort("status"))
+        return
+
+    base, stop = serve_stand_in(args.pages, args.fail_rate)
+    urls = [f"{base}/agency/p{i}/" for i in range(args.pages)]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cfg = CrawlConfig(
+            concurrency=args.concurrency,
+            per_host=args.per_host,
+            rate=0.0 if args.rate is None else args.rate,
+            backoff=0.01,
+            cache_dir=Path(cache_dir),
+        )
+        for label in ("cold", "warm"):
+            start = time.perf_counter()
+            pages = crawl(urls, cfg)
+            elapsed = time.perf_counter() - start
+            ok = pages.filter(pl.col("status") == 200)
+            print(
+                f"{label}: {pages.height} pages in {elapsed:.2f}s ({pages.height / elapsed:,.0f} pages/s), "
+                f"{ok.height} ok, {int(pages['from_cache'].sum())} from cache (304), "
+                f"{pages['error'].drop_nulls().len()} errors, {int(ok['n_internal_links'].sum())} internal links"
+            )
+    stop.set()
+
+
+if __name__ == "__main__":
+    main()
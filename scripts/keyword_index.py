@@ -0,0 +1,80 @@
+"""Build and query the inverted keyword index.
+
+Usage:
+    # Build (or refresh, if the CSV changed) the index under artifacts/index/<csv stem>/
+    uv run python scripts/keyword_index.py build \
+        --csv data/www.designrush.com_agency-organic.Positions-us-20250911-2025-09-12T16_10_02Z.csv
+
+    # Search: terms are ANDed, OR separates alternatives, trailing * is a prefix
+    uv run python scripts/keyword_index.py search "shopify" --csv data/<export>.csv
+    uv run python scripts/keyword_index.py search "seo agen* OR marketing" --csv data/<export>.csv \
+        --service seo --pos-max 10 --intent commercial
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import polars as pl
+
+from designrush_seo_audit.keyword_index import ensure_index, open_index, search
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inverted keyword index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_source(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--csv", type=Path, default=None, help="Path to the SEMrush CSV (index is built if stale)")
+        p.add_argument("--index", type=Path, default=None, help="Index directory (defaults to artifacts/index/<csv stem>/)")
+
+    p_build = sub.add_parser("build", help="Build the index for a CSV")
+    add_source(p_build)
+    p_build.add_argument("--rebuild", action="store_true", help="Rebuild even if the index is up to date")
+
+    p_search = sub.add_parser("search", help="Query the index")
+    p_search.add_argument("query", help='e.g. "shopify", "web design OR webdesign", "seo agen*"')
+    add_source(p_search)
+    p_search.add_argument("--service", action="append", default=None, help="Restrict to a service (repeatable)")
+    p_search.add_argument("--pos-min", type=int, default=None)
+    p_search.add_argument("--pos-max", type=int, default=None)
+    p_search.add_argument("--intent", default=None, help="Keyword intent, e.g. commercial")
+    p_search.add_argument("--top", type=int, default=20, help="Number of top rows (by traffic) to show")
+
+    args = parser.parse_args()
+    if args.csv is None and args.index is None:
+        parser.error("pass --csv or --index")
+
+    start = time.perf_counter()
+    index_dir = ensure_index(args.csv, args.index, rebuild=getattr(args, "rebuild", False)) if args.csv else args.index
+    index = open_index(index_dir)
+    if args.command == "build":
+        print(f"Index: {index_dir} ({index.rows} rows, {len(index.vocab)} tokens) in {time.perf_counter() - start:.1f}s")
+        return
+
+    start = time.perf_counter()
+    result = search(
+        index,
+        args.query,
+        service=args.service,
+        pos_min=args.pos_min,
+        pos_max=args.pos_max,
+        intent=args.intent,
+        top=args.top,
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    agg = result.aggregates
+    print(f"Query: {args.query!r} — {agg['rows']} rows in {elapsed:.1f} ms")
+    print(
+        f"Traffic {agg['traffic']:,.0f} | Traffic cost {agg['traffic_cost']:,.0f} | Volume {agg['volume']:,}"
+        + (f" | Avg position {agg['avg_position']:.1f} | Top-3 share {agg['top3_share']:.0%}" if agg["avg_position"] else "")
+    )
+    with pl.Config(tbl_rows=max(args.top, 20), fmt_str_lengths=60, tbl_hide_dataframe_shape=True):
+        if agg["rows"]:
+            print(result.by_service)
+            print(result.top_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Validate the service taxonomy and report per-pattern hits.
+
+Usage:
+    # Check config/service_patterns.json (or the built-in defaults)
+    uv run python scripts/taxonomy.py validate [--config config/service_patterns.json]
+
+    # Hit counts, dead/shadowed patterns and match timings over an export's URLs
+    uv run python scripts/taxonomy.py stats --csv data/<export>.csv
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import polars as pl
+
+from designrush_seo_audit.analysis import COL_URL, read_positions_csv
+from designrush_seo_audit.taxonomy import load_taxonomy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Service taxonomy registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_validate = sub.add_parser("validate", help="Compile the taxonomy and list overlaps/unreachable patterns")
+    p_stats = sub.add_parser("stats", help="Per-pattern hit counts and timings over a CSV's URLs")
+    for p in (p_validate, p_stats):
+        p.add_argument("--config", type=Path, default=None, help="Taxonomy JSON (defaults to config/service_patterns.json)")
+    p_stats.add_argument("--csv", type=Path, required=True, help="Path to the SEMrush CSV")
+    args = parser.parse_args()
+
+    try:
+        taxonomy = load_taxonomy(args.config)
+    except (ValueError, FileNotFoundError) as e:
+        raise SystemExit(str(e))
+    n_regex = sum(lits is None for lits in taxonomy.literals)
+    print(
+        f"Taxonomy {taxonomy.digest[:12]}: {len(taxonomy.patterns)} patterns "
+        f"({len(taxonomy.patterns) - n_regex} literal, {n_regex} regex), {len(taxonomy.services)} services"
+    )
+    with pl.Config(tbl_rows=-1, fmt_str_lengths=80, tbl_hide_dataframe_shape=True):
+        issues = taxonomy.validation_report()
+        print(issues if issues.height else "No overlapping or unreachable patterns")
+        if args.command == "validate":
+            return
+
+        urls = read_positions_csv(args.csv)[COL_URL].unique()
+        start = time.perf_counter()
+        urls.to_frame().select(taxonomy.service_expr(pl.col(COL_URL)))
+        elapsed = (time.perf_counter() - start) * 1000
+        hits = taxonomy.hit_report(urls)
+        print(
+            f"{urls.len()} distinct URLs classified in {elapsed:.1f} ms "
+            f"(patterns one by one: {hits['match_ms'].sum():.1f} ms)"
+        )
+        print(hits)
+
+
+if __name__ == "__main__":
+    main()
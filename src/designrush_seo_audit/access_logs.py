@@ -0,0 +1,293 @@
+"""Search-engine crawl hits from server access logs, for crawl-budget analysis.
+
+Logs in the Apache/nginx "combined" format are streamed in ~64 MB blocks:
+
+- plain files are memory-mapped and split into newline-aligned byte ranges;
+  gzipped files are decompressed sequentially into newline-aligned blocks
+- blocks are parsed by a process pool: each worker pre-filters lines by bot
+  user agent (a literal scan), parses the survivors with one vectorized
+  regex and returns counts per (bot, ip, day, path, status class)
+- partial counts are merged as they arrive, so memory depends on the number
+  of distinct (bot, ip, day, path) keys, not on the log size
+
+Bot user agents are only trusted once their IP is verified, either by
+forward-confirmed reverse DNS (one lookup per distinct IP, cached for the
+run) or against published IP ranges (e.g. Google's `googlebot.json`). Paths
+become URLs on `site` and are classified with `url_service` /
+`url_category`, then joined to ranking traffic.
+"""
+from __future__ import annotations
+
+import gzip
+import ipaddress
+import json
+import mmap
+import os
+import socket
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import polars as pl
+
+from .analysis import COL_TRAFFIC, COL_URL, _wcount, _wsum, url_category, url_service
+from .paths import normalize_url
+
+
+BLOCK_SIZE = 64 << 20
+SITE = "https://www.designrush.com"
+
+# Bot name → (user-agent substring, reverse-DNS domains that verify it)
+BOTS: dict[str, tuple[str, tuple[str, ...]]] = {
+    "googlebot": ("Googlebot", (".googlebot.com", ".google.com", ".googleusercontent.com")),
+    "bingbot": ("bingbot", (".search.msn.com",)),
+}
+
+# host ident user [time] "method path proto" status bytes "referer" "user agent"
+_COMBINED = r'^(\S+) \S+ \S+ \[(\d{2}/\w{3}/\d{4})[^\]]*\] "\S+ (\S+)[^"]*" (\d{3}) \S+ "[^"]*" "([^"]*)"'
+_KEYS = ["bot", "ip", "date", "path", "status_class"]
+_SCHEMA = {"bot": pl.Utf8, "ip": pl.Utf8, "date": pl.Date, "path": pl.Utf8, "status_class": pl.Utf8, "hits": pl.UInt32}
+
+
+def _parse_block(data: bytes) -> pl.DataFrame:
+    """Hit counts per (bot, ip, date, path, status class) for one block of log lines."""
+    lines = pl.Series("line", data.decode("utf-8", errors="replace").split("\n"))
+    bot = pl.lit(None, dtype=pl.Utf8)
+    for name, (ua, _) in reversed(BOTS.items()):
+        bot = pl.when(pl.col("ua").str.contains(ua, literal=True)).then(pl.lit(name)).otherwise(bot)
+    return (
+        lines.to_frame()
+        .filter(pl.col("line").str.contains("|".join(ua for ua, _ in BOTS.values())))
+        .select(pl.col("line").str.extract_groups(_COMBINED).struct.rename_fields(["ip", "date", "path", "status", "ua"]))
+        .unnest("line")
+        .drop_nulls("ip")
+        .select(
+            bot.alias("bot"),
+            "ip",
+            pl.col("date").str.to_date("%d/%b/%Y", strict=False),
+            pl.col("path").str.replace(r"[?#].*$", ""),
+            (pl.col("status").str.head(1) + "xx").alias("status_class"),
+        )
+        .drop_nulls(["bot", "date"])
+        .group_by(_KEYS)
+        .agg(pl.len().cast(pl.UInt32).alias("hits"))
+    )
+
+
+def _parse_range(task: tuple[str, int, int]) -> pl.DataFrame:
+    path, start, end = task
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return _parse_block(mm[start:end])
+
+
+def _ranges(path: Path, block_size: int) -> Iterator[tuple[str, int, int]]:
+    """Newline-aligned byte ranges of a plain log file."""
+    size = path.stat().st_size
+    if size == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            nl = mm.find(b"\n", min(start + block_size, size) - 1)
+            end = size if nl == -1 else nl + 1
+            yield str(path), start, end
+            start = end
+
+
+def _gzip_blocks(path: Path, block_size: int) -> Iterator[bytes]:
+    """Newline-aligned decompressed blocks of a gzipped log file."""
+    rest = b""
+    with gzip.open(path, "rb") as f:
+        while data := f.read(block_size):
+            data = rest + data
+            cut = data.rfind(b"\n") + 1
+            if cut == 0:
+                rest = data
+                continue
+            rest = data[cut:]
+            yield data[:cut]
+    if rest:
+        yield rest
+
+
+def _merge(parts: list[pl.DataFrame]) -> pl.DataFrame:
+    return pl.concat(parts).group_by(_KEYS).agg(pl.sum("hits")) if parts else pl.DataFrame(schema=_SCHEMA)
+
+
+def read_bot_hits(
+    paths: Iterable[str | Path],
+    workers: int | None = None,
+    block_size: int = BLOCK_SIZE,
+) -> pl.DataFrame:
+    """Unverified bot hits per (bot, ip, date, path, status class) across log files.
+
+    At most `2 × workers` blocks are in flight, and finished blocks are
+    folded into the running total every `workers` results.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks: list = []
+    for p in map(Path, paths):
+        tasks.append(((_gzip_blocks if p.suffix == ".gz" else _ranges)(p, block_size), p.suffix == ".gz"))
+
+    total = pl.DataFrame(schema=_SCHEMA)
+    done: list[pl.DataFrame] = []
+    # Spawned workers (forking a process that already runs Polars threads can deadlock)
+    with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as pool:
+        pending: set = set()
+        for blocks, is_gz in tasks:
+            for block in blocks:
+                pending.add(pool.submit(_parse_block if is_gz else _parse_range, block))
+                if len(pending) >= 2 * workers:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    done.extend(f.result() for f in finished)
+                if len(done) >= workers:
+                    total, done = _merge([total, *done]), []
+        done.extend(f.result() for f in pending)
+    return _merge([total, *done])
+
+
+def _dns_verified(ip: str, domains: tuple[str, ...]) -> bool:
+    """Forward-confirmed reverse DNS: the PTR host is in `domains` and resolves back to `ip`."""
+    try:
+        host = socket.gethostbyaddr(ip)[0].lower()
+        return host.endswith(domains) and ip in socket.gethostbyname_ex(host)[2]
+    except OSError:
+        return False
+
+
+def load_ip_ranges(path: str | Path) -> list[ipaddress.IPv4Network | ipaddress.IPv6Network]:
+    """Networks from a published bot IP list (`{"prefixes": [{"ipv4Prefix": ...}, ...]}`)."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return [
+        ipaddress.ip_network(prefix, strict=False)
+        for item in data.get("prefixes", [])
+        for prefix in (item.get("ipv4Prefix"), item.get("ipv6Prefix"))
+        if prefix
+    ]
+
+
+def verified_ips(
+    hits: pl.DataFrame,
+    verify: str = "dns",
+    ip_ranges: list | None = None,
+    dns_workers: int = 32,
+) -> pl.DataFrame:
+    """(bot, ip, verified) for each distinct bot IP.
+
+    `verify` is "dns" (forward-confirmed reverse DNS), "ranges" (membership
+    in `ip_ranges`) or "none" (trust the user agent).
+    """
+    pairs = hits.select("bot", "ip").unique().sort("bot", "ip")
+    if verify == "none":
+        ok = [True] * pairs.height
+    elif verify == "ranges":
+        if not ip_ranges:
+            raise ValueError('verify="ranges" needs ip_ranges (see load_ip_ranges)')
+        nets = ip_ranges
+
+        def in_ranges(ip: str) -> bool:
+            try:
+                addr = ipaddress.ip_address(ip)
+            except ValueError:
+                return False
+            return any(addr in net for net in nets)
+
+        ok = [in_ranges(ip) for ip in pairs["ip"]]
+    elif verify == "dns":
+        with ThreadPoolExecutor(dns_workers) as pool:
+            ok = list(pool.map(lambda r: _dns_verified(r[1], BOTS[r[0]][1]), pairs.iter_rows()))
+    else:
+        raise ValueError(f"Unknown verification mode: {verify!r}")
+    return pairs.with_columns(pl.Series("verified", ok, dtype=pl.Boolean))
+
+
+def crawl_hits(hits: pl.DataFrame, verified: pl.DataFrame, site: str = SITE) -> pl.DataFrame:
+    """Verified hits per (URL, date, bot) with status-class counts, URLs classified by service/category."""
+    url = normalize_url(pl.lit(site.rstrip("/")) + pl.col("path"))
+    daily = (
+        hits.join(verified.filter("verified").select("bot", "ip"), on=["bot", "ip"], how="semi")
+        .with_columns(url.alias(COL_URL))
+        .group_by(COL_URL, "date", "bot")
+        .agg(
+            pl.sum("hits").alias("hits"),
+            *[pl.col("hits").filter(pl.col("status_class") == c).sum().alias(f"hits_{c}") for c in ("2xx", "3xx", "4xx", "5xx")],
+        )
+    )
+    urls = daily.select(COL_URL).unique().with_columns(
+        url_service(pl.col(COL_URL)).alias("service"),
+        url_category(pl.col(COL_URL)).alias("url_category"),
+    )
+    return daily.join(urls, on=COL_URL).sort(COL_URL, "date", "bot")
+
+
+def crawl_budget_reports(df: pl.DataFrame, daily: pl.DataFrame) -> dict[str, pl.DataFrame]:
+    """Crawl hits next to ranking traffic per URL and per (service, url_category).
+
+    `crawl_share / traffic_share` > 1 means a page or section gets more of
+    the crawl than its share of organic traffic.
+    """
+    traffic = (
+        df.filter(pl.col(COL_URL).is_not_null())
+        .with_columns(normalize_url(pl.col(COL_URL)).alias(COL_URL))
+        .group_by(COL_URL)
+        .agg(_wsum(df, COL_TRAFFIC).alias("traffic"), _wcount(df).alias("keywords"))
+    )
+    by_url = (
+        daily.group_by(COL_URL, "service", "url_category")
+        .agg(
+            pl.sum("hits").alias("crawl_hits"),
+            pl.sum("hits_4xx", "hits_5xx"),
+            pl.col("date").n_unique().alias("days_crawled"),
+            pl.min("date").alias("first_crawled"),
+            pl.max("date").alias("last_crawled"),
+        )
+        .join(traffic, on=COL_URL, how="full", coalesce=True)
+        .with_columns(
+            pl.when(pl.col("service").is_null()).then(url_service(pl.col(COL_URL))).otherwise("service").alias("service"),
+            pl.when(pl.col("url_category").is_null())
+            .then(url_category(pl.col(COL_URL)))
+            .otherwise("url_category")
+            .alias("url_category"),
+            pl.col("crawl_hits", "hits_4xx", "hits_5xx", "days_crawled").fill_null(0),
+            pl.col("traffic", "keywords").fill_null(0),
+        )
+    )
+    total_hits = float(by_url["crawl_hits"].sum()) or 1.0
+    total_traffic = float(by_url["traffic"].sum()) or 1.0
+
+    def shares(frame: pl.DataFrame) -> pl.DataFrame:
+        return frame.with_columns(
+            (pl.col("crawl_hits") / total_hits).alias("crawl_share"),
+            (pl.col("traffic") / total_traffic).alias("traffic_share"),
+        ).with_columns(
+            pl.when(pl.col("traffic_share") > 0).then(pl.col("crawl_share") / pl.col("traffic_share")).alias("crawl_to_traffic")
+        )
+
+    by_section = (
+        by_url.group_by("service", "url_category")
+        .agg(
+            pl.len().alias("urls"),
+            (pl.col("crawl_hits") > 0).sum().alias("urls_crawled"),
+            ((pl.col("crawl_hits") == 0) & (pl.col("traffic") > 0)).sum().alias("ranking_urls_not_crawled"),
+            pl.sum("crawl_hits", "hits_4xx", "hits_5xx", "traffic", "keywords"),
+        )
+    )
+    return {
+        "crawl_budget_by_url": shares(by_url).sort(["crawl_hits", "traffic", COL_URL], descending=[True, True, False]),
+        "crawl_budget_by_service": shares(by_section).sort(["crawl_hits", "traffic"], descending=True),
+        "crawl_hits_daily": daily,
+    }
+
+
+def ingest_access_logs(
+    paths: Iterable[str | Path],
+    verify: str = "dns",
+    ip_ranges_path: str | Path | None = None,
+    site: str = SITE,
+    workers: int | None = None,
+) -> pl.DataFrame:
+    """Verified daily crawl hits per URL from access logs (see `crawl_hits`)."""
+    hits = read_bot_hits(paths, workers=workers)
+    ranges = load_ip_ranges(ip_ranges_path) if ip_ranges_path else None
+    return crawl_hits(hits, verified_ips(hits, verify=verify, ip_ranges=ranges), site=site)
@@ -0,0 +1,101 @@
+"""The /agency quick-report family on the loaded positions frame.
+
+These tables used to come from `scripts/analyze_agency.py`, which parsed the
+export a second time with its own loader. They are now computed from the
+frame `run_full_analysis` already loaded (weighted on draft samples), so
+one ingestion produces both report families.
+
+- ranking_distribution: keywords per position bucket; the bucket edges
+  are configurable (`AGENCY_BUCKETS` by default: 1–3, 4–10, 11–50, 51+)
+- top_keywords: keywords by traffic, then volume
+- underperforming_opportunities: positions 11–50 with volume ≥ 500, by
+  volume then lowest difficulty
+- intent_breakdown: keywords per intent combination
+- serp_features_counts: keywords per SERP feature
+"""
+from __future__ import annotations
+
+from typing import Sequence
+
+import polars as pl
+
+from .analysis import (
+    COL_INTENTS,
+    COL_KD,
+    COL_KEYWORD,
+    COL_POS,
+    COL_SERP_FEATS,
+    COL_TRAFFIC,
+    COL_URL,
+    COL_VOLUME,
+    SAMPLE_WEIGHT,
+    _is_weighted,
+    _wcount,
+    bucket_position,
+)
+
+
+AGENCY_BUCKETS = (3, 10, 50)
+
+
+def ranking_distribution(df: pl.DataFrame, edges: Sequence[int] = AGENCY_BUCKETS) -> pl.DataFrame:
+    """Keyword count and share per position bucket."""
+    return (
+        df.filter(pl.col(COL_POS).is_not_null())
+        .group_by(bucket_position(pl.col(COL_POS), edges).alias("pos_bucket"))
+        .agg(_wcount(df).alias("count"))
+        .with_columns((pl.col("count") / pl.sum("count")).alias("share"))
+        .sort("pos_bucket")
+    )
+
+
+def top_keywords(df: pl.DataFrame, n: int = 200) -> pl.DataFrame:
+    return (
+        df.filter(pl.col(COL_KEYWORD).is_not_null())
+        .sort([pl.col(COL_TRAFFIC).fill_null(0), pl.col(COL_VOLUME).fill_null(0)], descending=True)
+        .select(COL_KEYWORD, COL_POS, COL_VOLUME, COL_TRAFFIC, COL_URL)
+        .head(n)
+    )
+
+
+def underperforming_opportunities(df: pl.DataFrame, n: int = 300, min_volume: int = 500) -> pl.DataFrame:
+    """Positions 11–50 with at least `min_volume` searches, easiest of the biggest first."""
+    return (
+        df.filter(pl.col(COL_POS).is_between(11, 50) & (pl.col(COL_VOLUME) >= min_volume))
+        .sort([COL_VOLUME, COL_KD, COL_KEYWORD, COL_URL], descending=[True, False, False, False], nulls_last=True)
+        .select(COL_KEYWORD, COL_POS, COL_VOLUME, COL_KD, COL_URL)
+        .head(n)
+    )
+
+
+def intent_breakdown(df: pl.DataFrame) -> pl.DataFrame:
+    return (
+        df.group_by(pl.col(COL_INTENTS).fill_null("Unknown"))
+        .agg(_wcount(df).alias("count"))
+        .sort(["count", COL_INTENTS], descending=[True, False])
+    )
+
+
+def serp_features_counts(df: pl.DataFrame) -> pl.DataFrame:
+    return (
+        df.select(
+            pl.col(COL_SERP_FEATS).fill_null("").str.split(", ").alias("features"),
+            *([SAMPLE_WEIGHT] if _is_weighted(df) else []),
+        )
+        .explode("features")
+        .filter(pl.col("features") != "")
+        .group_by("features")
+        .agg(_wcount(df).alias("count"))
+        .sort(["count", "features"], descending=[True, False])
+    )
+
+
+def agency_reports(df: pl.DataFrame, edges: Sequence[int] = AGENCY_BUCKETS) -> dict[str, pl.DataFrame]:
+    """All five tables, keyed by their CSV name."""
+    return {
+        "ranking_distribution": ranking_distribution(df, edges),
+        "top_keywords": top_keywords(df),
+        "underperforming_opportunities": underperforming_opportunities(df),
+        "intent_breakdown": intent_breakdown(df),
+        "serp_features_counts": serp_features_counts(df),
+    }
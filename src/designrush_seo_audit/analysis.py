@@ -3,10 +3,14 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import date, datetime
 from pathlib import Path
-from typing import Iterable
+from typing import TYPE_CHECKING, Callable, Iterable, Sequence
 
 import polars as pl
-import json
+import time
+
+if TYPE_CHECKING:
+    from .opportunity import OpportunityWeights
+    from .search_console import CtrCurve
 
 
 # Column names from the SEMrush export
@@ -28,6 +32,23 @@ COL_SERP_FEATS = "SERP Features by Keyword"
 COL_INTENTS = "Keyword Intents"
 COL_POSITION_TYPE = "Position Type"
 
+# Types of the numeric export columns (see prepare_positions)
+NUMERIC_TYPES: dict[str, type[pl.DataType]] = {
+    COL_POS: pl.Int64,
+    COL_PREV_POS: pl.Int64,
+    COL_VOLUME: pl.Int64,
+    COL_KD: pl.Float64,
+    COL_CPC: pl.Float64,
+    COL_TRAFFIC: pl.Float64,
+    COL_TRAFFIC_PCT: pl.Float64,
+    COL_TRAFFIC_COST: pl.Float64,
+    COL_COMPETITION: pl.Float64,
+    COL_RESULTS: pl.Float64,
+}
+
+# Inclusive upper bounds of the position buckets (last bucket is open-ended)
+POSITION_BUCKETS = (3, 10, 20, 50)
+
 
 REQUIRED_COLUMNS: tuple[str, ...] = (
     COL_KEYWORD,
@@ -50,11 +71,20 @@ REQUIRED_COLUMNS: tuple[str, ...] = (
 )
 
 
+# Optional per-row expansion weight (set on draft samples, see sampling.py)
+SAMPLE_WEIGHT = "sample_weight"
+
+
 def load_positions(csv_path: str | Path) -> pl.DataFrame:
     """Load the SEMrush Organic Positions CSV using Polars.
 
     Ensures expected data types and trims whitespace.
     """
+    return prepare_positions(read_positions_csv(csv_path))
+
+
+def read_positions_csv(csv_path: str | Path) -> pl.DataFrame:
+    """Read the raw export and verify the required columns are present."""
     df = pl.read_csv(
         csv_path,
         try_parse_dates=True,
@@ -66,19 +96,23 @@ def load_positions(csv_path: str | Path) -> pl.DataFrame:
     missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns: {missing}")
+    return df
+
 
+def scan_positions_csv(csv_path: str | Path) -> pl.LazyFrame:
+    """Lazy counterpart of `read_positions_csv` (only the header is read here)."""
+    lf = pl.scan_csv(csv_path, try_parse_dates=True, infer_schema_length=1000, ignore_errors=False)
+    missing = [c for c in REQUIRED_COLUMNS if c not in lf.collect_schema().names()]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    return lf
+
+
+def prepare_positions(df: pl.DataFrame) -> pl.DataFrame:
+    """Normalize types of a raw export frame and add the helper columns."""
     # Normalize types and values
     df = df.with_columns(
-        pl.col(COL_POS).cast(pl.Int64, strict=False),
-        pl.col(COL_PREV_POS).cast(pl.Int64, strict=False),
-        pl.col(COL_VOLUME).cast(pl.Int64, strict=False),
-        pl.col(COL_KD).cast(pl.Float64, strict=False),
-        pl.col(COL_CPC).cast(pl.Float64, strict=False),
-        pl.col(COL_TRAFFIC).cast(pl.Float64, strict=False),
-        pl.col(COL_TRAFFIC_PCT).cast(pl.Float64, strict=False),
-        pl.col(COL_TRAFFIC_COST).cast(pl.Float64, strict=False),
-        pl.col(COL_COMPETITION).cast(pl.Float64, strict=False),
-        pl.col(COL_RESULTS).cast(pl.Float64, strict=False),
+        *(pl.col(c).cast(dtype, strict=False) for c, dtype in NUMERIC_TYPES.items()),
         # Parse Timestamp to date (robust to YYYY-MM-DD or other)
         pl.col(COL_TIMESTAMP).cast(pl.Utf8).str.to_date(strict=False).alias(COL_TIMESTAMP),
         # Strip strings
@@ -102,19 +136,24 @@ def load_positions(csv_path: str | Path) -> pl.DataFrame:
     return df
 
 
-def bucket_position(pos: pl.Expr) -> pl.Expr:
-    """Return a position bucket label for the numeric position expression."""
-    return (
-        pl.when(pos <= 3)
-        .then(pl.lit("01-03"))
-        .when(pos <= 10)
-        .then(pl.lit("04-10"))
-        .when(pos <= 20)
-        .then(pl.lit("11-20"))
-        .when(pos <= 50)
-        .then(pl.lit("21-50"))
-        .otherwise(pl.lit("51+"))
-    )
+def bucket_position(pos: pl.Expr, edges: Sequence[int] = POSITION_BUCKETS) -> pl.Expr:
+    """Return a position bucket label for the numeric position expression.
+
+    `edges` are the inclusive upper bounds of each bucket; labels are
+    zero-padded ("01-03", ..., "51+") so they sort in position order.
+    """
+    labels = bucket_labels(edges)
+    expr = pl.when(pos <= edges[0]).then(pl.lit(labels[0]))
+    for hi, label in zip(edges[1:], labels[1:]):
+        expr = expr.when(pos <= hi).then(pl.lit(label))
+    return expr.otherwise(pl.lit(labels[-1]))
+
+
+def bucket_labels(edges: Sequence[int] = POSITION_BUCKETS) -> list[str]:
+    """Labels of the `len(edges) + 1` buckets, in position order."""
+    width = len(str(edges[-1] + 1))
+    lows = [1, *(e + 1 for e in edges)]
+    return [f"{lo:0{width}d}-{hi:0{width}d}" for lo, hi in zip(lows, edges)] + [f"{lows[-1]:0{width}d}+"]
 
 
 def url_category(url: pl.Expr) -> pl.Expr:
@@ -166,33 +205,16 @@ def _default_service_patterns() -> list[tuple[str, str]]:
     ]
 
 
-def _load_service_patterns_from_config() -> list[tuple[str, str]] | None:
-    cfg = Path("config/service_patterns.json")
-    if not cfg.exists():
-        return None
-    try:
-        data = json.loads(cfg.read_text(encoding="utf-8"))
-        # expected: list of {"pattern": "regex", "label": "slug"}
-        patterns = []
-        for item in data:
-            patterns.append((str(item["pattern"]), str(item["label"])) )
-        return patterns
-    except Exception:
-        return None
-
-
 def url_service(url: pl.Expr) -> pl.Expr:
     """Classify URL to a fine-grained agency service taxonomy.
 
     Returns a short slug such as 'seo', 'ppc', 'web_design', etc.
-    Honors optional overrides in config/service_patterns.json when present.
+    Honors optional overrides in config/service_patterns.json when present
+    (validated and compiled by taxonomy.py; the last matching pattern wins).
     """
-    patterns = _load_service_patterns_from_config() or _default_service_patterns()
+    from .taxonomy import load_taxonomy
 
-    expr: pl.Expr = pl.lit("other")
-    for pat, label in patterns:
-        expr = pl.when(url.str.contains(pat)).then(pl.lit(label)).otherwise(expr)
-    return expr
+    return load_taxonomy().service_expr(url)
 
 
 def _explode_list_column_from_str(df: pl.DataFrame, column: str, sep: str = ",") -> pl.DataFrame:
@@ -207,27 +229,64 @@ def _explode_list_column_from_str(df: pl.DataFrame, column: str, sep: str = ",")
     )
 
 
+def _is_weighted(df: pl.DataFrame) -> bool:
+    return SAMPLE_WEIGHT in df.columns
+
+
+def _wcount(df: pl.DataFrame) -> pl.Expr:
+    """Row count, scaled by the sample weight on draft samples."""
+    return pl.sum(SAMPLE_WEIGHT) if _is_weighted(df) else pl.len()
+
+
+def _wcount_if(df: pl.DataFrame, cond: pl.Expr) -> pl.Expr:
+    weight = pl.col(SAMPLE_WEIGHT) if _is_weighted(df) else 1
+    return pl.when(cond).then(weight).otherwise(0).sum()
+
+
+def _wsum(df: pl.DataFrame, col: str) -> pl.Expr:
+    if _is_weighted(df):
+        return (pl.col(col) * pl.col(SAMPLE_WEIGHT)).sum()
+    return pl.sum(col)
+
+
+def _wmean(df: pl.DataFrame, col: str) -> pl.Expr:
+    if _is_weighted(df):
+        w = pl.when(pl.col(col).is_not_null()).then(pl.col(SAMPLE_WEIGHT))
+        return (pl.col(col) * pl.col(SAMPLE_WEIGHT)).sum() / w.sum()
+    return pl.mean(col)
+
+
+def _total_rows(df: pl.DataFrame) -> float | int:
+    return float(df[SAMPLE_WEIGHT].sum()) if _is_weighted(df) else df.height
+
+
 def overview(df: pl.DataFrame) -> dict:
-    """Compute high-level overview metrics."""
-    total_keywords = df.height
+    """Compute high-level overview metrics.
+
+    On draft samples (`sample_weight` column present) counts and sums are
+    scaled back up to estimates for the full export.
+    """
+    total_keywords = _total_rows(df)
     totals = df.select(
-        pl.sum(COL_TRAFFIC).alias("traffic"),
-        pl.sum(COL_TRAFFIC_COST).alias("traffic_cost"),
-        pl.mean(COL_POS).alias("avg_position"),
+        _wsum(df, COL_TRAFFIC).alias("traffic"),
+        _wsum(df, COL_TRAFFIC_COST).alias("traffic_cost"),
+        _wmean(df, COL_POS).alias("avg_position"),
     ).row(0)
 
     by_bucket = (
         df.group_by("pos_bucket")
         .agg(
-            pl.count().alias("keywords"),
-            pl.sum(COL_TRAFFIC).alias("traffic"),
+            _wcount(df).alias("keywords"),
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
         )
         .with_columns((pl.col("keywords") / total_keywords).alias("share"))
+        # Bucket counts are exact on samples (buckets are strata); keep them integral
+        .with_columns(pl.col("keywords").round(0).cast(pl.Int64) if _is_weighted(df) else pl.col("keywords"))
         .sort("pos_bucket")
     )
 
     return {
-        "total_keywords": int(total_keywords),
+        "total_keywords": int(round(total_keywords)),
         "traffic": float(totals[0]),
         "traffic_cost": float(totals[1]),
         "avg_position": float(totals[2]) if totals[2] is not None else None,
@@ -236,7 +295,7 @@ def overview(df: pl.DataFrame) -> dict:
 
 
 def top_keywords_by_traffic(df: pl.DataFrame, n: int = 50) -> pl.DataFrame:
-    return df.sort(COL_TRAFFIC, descending=True).head(n)
+    return df.sort([COL_TRAFFIC, COL_KEYWORD, COL_URL], descending=[True, False, False]).head(n)
 
 
 def top_keywords_by_volume(df: pl.DataFrame, n: int = 50) -> pl.DataFrame:
@@ -247,24 +306,31 @@ def top_pages_by_traffic(df: pl.DataFrame, n: int = 100) -> pl.DataFrame:
     return (
         df.group_by(COL_URL)
         .agg(
-            pl.sum(COL_TRAFFIC).alias("traffic"),
-            pl.sum(COL_TRAFFIC_COST).alias("traffic_cost"),
-            pl.mean(COL_POS).alias("avg_position"),
-            pl.count().alias("keywords"),
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
+            _wsum(df, COL_TRAFFIC_COST).alias("traffic_cost"),
+            _wmean(df, COL_POS).alias("avg_position"),
+            _wcount(df).alias("keywords"),
         )
-        .sort(["traffic", "traffic_cost"], descending=[True, True])
+        .sort(["traffic", "traffic_cost", COL_URL], descending=[True, True, False])
         .head(n)
     )
 
 
-def quick_wins(df: pl.DataFrame, n: int = 100) -> pl.DataFrame:
-    """Keywords in positions 4–10 with high volume and CPC."""
-    return (
-        df.filter((pl.col(COL_POS) >= 4) & (pl.col(COL_POS) <= 10))
-        .with_columns((pl.col(COL_VOLUME) * (pl.col(COL_CPC).fill_null(0.0))).alias("priority"))
-        .sort(["priority", COL_VOLUME, COL_CPC], descending=[True, True, True])
-        .head(n)
-    )
+def quick_wins(
+    df: pl.DataFrame,
+    n: int = 100,
+    by: str | None = None,
+    weights: OpportunityWeights | None = None,
+    ctr_curve: CtrCurve | None = None,
+) -> pl.DataFrame:
+    """Keywords in positions 4–10 ranked by opportunity score (see opportunity.py).
+
+    Keeps the top `n` overall, or per `by` segment. `weights` changes the
+    position band or the score factors; `priority` is volume × CPC.
+    """
+    from .opportunity import QUICK_WINS, score_opportunities, top_opportunities
+
+    return top_opportunities(score_opportunities(df, weights or QUICK_WINS, ctr_curve), n, by=by)
 
 
 def movers(df: pl.DataFrame, n: int = 50) -> tuple[pl.DataFrame, pl.DataFrame]:
@@ -280,11 +346,11 @@ def intent_mix(df: pl.DataFrame) -> pl.DataFrame:
     return (
         exploded.group_by(COL_INTENTS)
         .agg(
-            pl.count().alias("keywords"),
-            pl.sum(COL_TRAFFIC).alias("traffic"),
+            _wcount(df).alias("keywords"),
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
         )
-        .with_columns((pl.col("keywords") / df.height).alias("share"))
-        .sort("traffic", descending=True)
+        .with_columns((pl.col("keywords") / _total_rows(df)).alias("share"))
+        .sort(["traffic", COL_INTENTS], descending=[True, False])
     )
 
 
@@ -309,9 +375,9 @@ def serp_features_presence(df: pl.DataFrame, features: Iterable[str] | None = No
         result.append(
             {
                 "feature": f,
-                "keywords": sub.height,
-                "traffic": float(sub.select(pl.sum(COL_TRAFFIC)).item() or 0.0),
-                "top3_share": float(sub.select(pl.mean("is_top3")).item() or 0.0),
+                "keywords": _total_rows(sub),
+                "traffic": float(sub.select(_wsum(sub, COL_TRAFFIC)).item() or 0.0),
+                "top3_share": float(sub.select(_wmean(sub, "is_top3")).item() or 0.0),
             }
         )
     return pl.DataFrame(result).sort("traffic", descending=True)
@@ -326,12 +392,12 @@ def categories_breakdown(df: pl.DataFrame) -> pl.DataFrame:
     return (
         df.group_by("url_category")
         .agg(
-            pl.count().alias("keywords"),
-            pl.sum(COL_TRAFFIC).alias("traffic"),
-            pl.sum(COL_TRAFFIC_COST).alias("traffic_cost"),
-            pl.mean(COL_POS).alias("avg_position"),
+            _wcount(df).alias("keywords"),
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
+            _wsum(df, COL_TRAFFIC_COST).alias("traffic_cost"),
+            _wmean(df, COL_POS).alias("avg_position"),
         )
-        .sort("traffic", descending=True)
+        .sort(["traffic", "url_category"], descending=[True, False])
     )
 
 
@@ -339,14 +405,14 @@ def services_breakdown(df: pl.DataFrame) -> pl.DataFrame:
     return (
         df.group_by("service")
         .agg(
-            pl.count().alias("keywords"),
-            pl.sum(COL_TRAFFIC).alias("traffic"),
-            pl.sum(COL_TRAFFIC_COST).alias("traffic_cost"),
-            pl.mean(COL_POS).alias("avg_position"),
-            (pl.when(pl.col("pos_change") > 0).then(1).otherwise(0)).sum().alias("improving"),
-            (pl.when(pl.col("pos_change") < 0).then(1).otherwise(0)).sum().alias("declining"),
+            _wcount(df).alias("keywords"),
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
+            _wsum(df, COL_TRAFFIC_COST).alias("traffic_cost"),
+            _wmean(df, COL_POS).alias("avg_position"),
+            _wcount_if(df, pl.col("pos_change") > 0).alias("improving"),
+            _wcount_if(df, pl.col("pos_change") < 0).alias("declining"),
         )
-        .sort("traffic", descending=True)
+        .sort(["traffic", "service"], descending=[True, False])
     )
 
 
@@ -382,52 +448,55 @@ def position_ctr(pos: int) -> float:
     return 0.005
 
 
+def position_ctr_expr(pos: pl.Expr) -> pl.Expr:
+    """`position_ctr` as a Polars expression."""
+    return (
+        pl.when(pos <= 1)
+        .then(0.28)
+        .when(pos == 2)
+        .then(0.15)
+        .when(pos == 3)
+        .then(0.11)
+        .when(pos == 4)
+        .then(0.08)
+        .when(pos == 5)
+        .then(0.07)
+        .when(pos == 6)
+        .then(0.06)
+        .when(pos == 7)
+        .then(0.05)
+        .when(pos == 8)
+        .then(0.04)
+        .when(pos == 9)
+        .then(0.035)
+        .when(pos == 10)
+        .then(0.03)
+        .when(pos <= 20)
+        .then(0.015)
+        .otherwise(0.005)
+    )
+
+
 def forecast_quick_wins_uplift(
-    df: pl.DataFrame, target_pos: int = 3, n: int = 200
+    df: pl.DataFrame, target_pos: int = 3, n: int = 200, ctr_curve: CtrCurve | None = None
 ) -> tuple[dict, pl.DataFrame, pl.DataFrame]:
     """Estimate uplift moving quick wins to a target position.
 
+    CTRs come from `ctr_curve` (per service, calibrated on Search Console
+    data; see search_console.py) when given, else from `position_ctr`.
     Returns (summary_dict, details_df, by_service_df)
     """
-    # Build quick wins set (reuse same priority logic)
-    q = (
-        df.filter((pl.col(COL_POS) >= 4) & (pl.col(COL_POS) <= 10))
-        .with_columns((pl.col(COL_VOLUME) * (pl.col(COL_CPC).fill_null(0.0))).alias("priority"))
-        .sort(["priority", COL_VOLUME, COL_CPC], descending=[True, True, True])
-        .head(n)
-    )
-
-    # Compute CTRs and uplifts
-    def _ctr_expr_for(col: str) -> pl.Expr:
-        return (
-            pl.when(pl.col(col) <= 1)
-            .then(0.28)
-            .when(pl.col(col) == 2)
-            .then(0.15)
-            .when(pl.col(col) == 3)
-            .then(0.11)
-            .when(pl.col(col) == 4)
-            .then(0.08)
-            .when(pl.col(col) == 5)
-            .then(0.07)
-            .when(pl.col(col) == 6)
-            .then(0.06)
-            .when(pl.col(col) == 7)
-            .then(0.05)
-            .when(pl.col(col) == 8)
-            .then(0.04)
-            .when(pl.col(col) == 9)
-            .then(0.035)
-            .when(pl.col(col) == 10)
-            .then(0.03)
-            .when(pl.col(col) <= 20)
-            .then(0.015)
-            .otherwise(0.005)
-        )
+    q = quick_wins(df, n, ctr_curve=ctr_curve)
 
+    if ctr_curve is not None:
+        ctr_current = ctr_curve.expr(pl.col(COL_POS), pl.col("service"))
+        ctr_target = ctr_curve.expr(pl.lit(target_pos), pl.col("service"))
+    else:
+        ctr_current = position_ctr_expr(pl.col(COL_POS))
+        ctr_target = pl.lit(position_ctr(target_pos))
     details = q.with_columns(
-        _ctr_expr_for(COL_POS).alias("ctr_current"),
-        pl.lit(position_ctr(target_pos)).alias("ctr_target"),
+        ctr_current.alias("ctr_current"),
+        ctr_target.alias("ctr_target"),
     ).with_columns(
         (pl.col(COL_VOLUME) * pl.col("ctr_current")).alias("clicks_current"),
         (pl.col(COL_VOLUME) * pl.col("ctr_target")).alias("clicks_target"),
@@ -486,43 +555,43 @@ def _is_geo_url(url: pl.Expr) -> pl.Expr:
     return url.str.contains(r"/agency/[^/]+/([a-z-]+)(/[a-z-]+)?$")
 
 
-def geo_reports(df: pl.DataFrame) -> dict[str, pl.DataFrame]:
+def geo_location(url: pl.Expr) -> pl.Expr:
+    """Location key from the last 1-2 path segments after the service.
+
+    Example: /agency/website-design-development/texas/houston -> texas/houston
+    """
+    return (
+        url.str.extract(r"/agency/[^/]+/(.+)$", 1)
+        .str.replace_all(r"[^a-z0-9-/]", "")
+        .str.split("/")
+        .list.tail(2)
+        .list.join("/")
+    )
+
+
+def geo_reports(df: pl.DataFrame, ctr_curve: CtrCurve | None = None) -> dict[str, pl.DataFrame]:
     geo_df = df.filter(pl.col("url_category") == "geo")
     top_pages = (
         geo_df.group_by(COL_URL)
         .agg(
-            pl.sum(COL_TRAFFIC).alias("traffic"),
-            pl.mean(COL_POS).alias("avg_position"),
-            pl.count().alias("keywords"),
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
+            _wmean(df, COL_POS).alias("avg_position"),
+            _wcount(df).alias("keywords"),
         )
         .sort("traffic", descending=True)
     )
     wins = geo_df.filter(pl.col("pos_change") > 0).sort("pos_change", descending=True).head(200)
     losses = geo_df.filter(pl.col("pos_change") < 0).sort("pos_change", descending=False).head(200)
-    qw = (
-        geo_df.filter((pl.col(COL_POS) >= 4) & (pl.col(COL_POS) <= 10))
-        .with_columns((pl.col(COL_VOLUME) * (pl.col(COL_CPC).fill_null(0.0))).alias("priority"))
-        .sort(["priority", COL_VOLUME, COL_CPC], descending=[True, True, True])
-        .head(200)
-    )
-    # Try to extract last 1-2 path segments as location key
-    # Example: /agency/website-design-development/texas/houston -> texas/houston
-    parts = (
-        geo_df.select(
-            pl.col(COL_URL),
-            pl.col(COL_URL)
-            .str.extract(r"/agency/[^/]+/(.+)$", 1)
-            .str.replace_all(r"[^a-z0-9-/]", "")
-            .alias("loc_path"),
-            pl.col(COL_TRAFFIC),
-        )
-        .with_columns(
-            pl.col("loc_path").str.split("/").list.tail(2).list.join("/").alias("location"),
-        )
+    qw = quick_wins(geo_df, 200, ctr_curve=ctr_curve)
+    parts = geo_df.select(
+        pl.col(COL_URL),
+        geo_location(pl.col(COL_URL)).alias("location"),
+        pl.col(COL_TRAFFIC),
+        *([SAMPLE_WEIGHT] if _is_weighted(df) else []),
     )
     by_location = (
         parts.group_by("location")
-        .agg(pl.count().alias("pages"), pl.sum(COL_TRAFFIC).alias("traffic"))
+        .agg(_wcount(df).alias("pages"), _wsum(df, COL_TRAFFIC).alias("traffic"))
         .sort("traffic", descending=True)
     )
     return {
@@ -559,6 +628,10 @@ class AnalysisArtifacts:
     deck_html: Path | None = None
     vega_specs: dict[str, Path] | None = None
     forecast_by_service_csv: Path | None = None
+    stage_timings: dict[str, float] | None = None
+    quarantine_parquet: Path | None = None
+    # Rewrites only the decks from the run's in-memory frames (None without generate_deck)
+    rebuild_deck: Callable[[], tuple[Path | None, Path | None]] | None = None
 
 
 def run_full_analysis(
@@ -566,8 +639,85 @@ def run_full_analysis(
     out_dir: str | Path | None = None,
     generate_charts: bool = True,
     generate_deck: bool = True,
+    sample_fraction: float | None = None,
+    sample_seed: int = 0,
+    sketches: bool = False,
+    links_csv: str | Path | None = None,
+    crawl: bool = False,
+    pages_path: str | Path | None = None,
+    access_logs: list[str | Path] | None = None,
+    log_verify: str = "dns",
+    ip_ranges_path: str | Path | None = None,
+    gsc_path: str | Path | None = None,
+    backlinks: list[str | Path] | None = None,
+    agency_buckets: Sequence[int] | None = None,
+    quarantine: bool = False,
 ) -> AnalysisArtifacts:
-    df = load_positions(csv_path)
+    """Run every report and write artifacts.
+
+    With `sample_fraction` set, runs in draft mode on a stratified sample
+    (see sampling.py): counts and sums are scaled estimates, error bars go
+    into summary.md, and the default output dir gets a `-draft` suffix.
+    With `sketches`, also writes approximate distinct counts and percentiles
+    (see sketches.py) to services_sketches.csv and locations_sketches.csv.
+    `links_csv` (source,target) adds crawled links to the link-equity graph.
+    With `crawl`, fetches every ranking URL (see crawler.py), writes
+    pages.csv, page_links.csv and top_keywords_on_page.csv, and adds the
+    crawled links to the link-equity graph.
+    Crawled pages, or `pages_path` (a pages.csv or a local HTML mirror),
+    feed the title/H1 keyword coverage reports (see coverage.py).
+    `access_logs` (combined/nginx format, plain or .gz) add verified bot
+    crawl hits next to traffic per URL and per service/category
+    (see access_logs.py; `log_verify` is "dns", "ranges" with the
+    published bot IP list at `ip_ranges_path`, or "none").
+    `gsc_path` (a Search Console performance export) calibrates the CTR
+    curve used by the uplift forecasts and writes ctr_curve.csv and
+    gsc_keywords.csv (see search_console.py).
+    `backlinks` (SEMrush or Ahrefs backlink exports) add off-page reports
+    per URL and per service (see backlinks.py).
+    The /agency quick reports (ranking_distribution.csv and friends, see
+    agency_reports.py) are written from the same frame; `agency_buckets`
+    sets their position bucket edges.
+    Previous → current position bucket transitions, overall and per
+    service, category and intent, go to position_transitions.csv and
+    position_transition_matrix.csv (see transitions.py).
+    With `quarantine`, rows that fail to parse or break a fatal quality
+    rule are set aside instead of aborting the run: they go to
+    quarantine.parquet with their CSV line and reason codes, and the
+    counts per reason to summary.md (see quality.py).
+    """
+    # Wall-clock seconds per pipeline stage (surfaced on AnalysisArtifacts)
+    timings: dict[str, float] = {}
+    clock = time.perf_counter()
+
+    def _mark(stage: str) -> None:
+        nonlocal clock
+        now = time.perf_counter()
+        timings[stage] = timings.get(stage, 0.0) + (now - clock)
+        clock = now
+
+    rejects: pl.DataFrame | None = None
+    if quarantine:
+        from .quality import load_positions_quarantined
+
+        df, rejects = load_positions_quarantined(csv_path)
+        rows_read = df.height + rejects.height
+        if sample_fraction:
+            from .sampling import stratified_sample
+
+            df = stratified_sample(df, fraction=sample_fraction, seed=sample_seed)
+    elif sample_fraction:
+        from .sampling import load_positions_sample
+
+        df = load_positions_sample(csv_path, fraction=sample_fraction, seed=sample_seed)
+    else:
+        df = load_positions(csv_path)
+    _mark("load")
+    # Keyword-text service labels for URLs the taxonomy can't place
+    from .keyword_service import add_keyword_service, services_breakdown_resolved
+
+    df = add_keyword_service(df)
+    _mark("keyword_service")
     # Target dir based on most recent timestamp found or today
     ts = df.select(pl.max(COL_TIMESTAMP)).to_series().item()
     if isinstance(ts, (datetime, date)):
@@ -575,35 +725,102 @@ def run_full_analysis(
     else:
         stamp = date.today().strftime("%Y-%m-%d")
 
+    if sample_fraction:
+        stamp = f"{stamp}-draft"
     base_dir = Path(out_dir) if out_dir else Path("artifacts") / stamp
     base_dir.mkdir(parents=True, exist_ok=True)
+    quarantine_parquet = None
+    if rejects is not None:
+        quarantine_parquet = base_dir / "quarantine.parquet"
+        rejects.write_parquet(quarantine_parquet)
+
+    # Search Console: calibrated CTR curve for scores and forecasts
+    ctr_curve = None
+    if gsc_path:
+        from .search_console import gsc_reports
+
+        ctr_curve, gsc = gsc_reports(df, gsc_path)
+        for name, gdf in gsc.items():
+            save_df(gdf, base_dir / f"{name}.csv")
+        _mark("search_console")
 
     ov = overview(df)
     top_kw = top_keywords_by_traffic(df, 100)
     top_pg = top_pages_by_traffic(df, 100)
-    qw = quick_wins(df, 200)
+    qw = quick_wins(df, 200, ctr_curve=ctr_curve)
     imp, dec = movers(df, 100)
     intents = intent_mix(df)
     serp = serp_features_presence(df)
     cats = categories_breakdown(df)
     svcs = services_breakdown(df)
+    svcs_resolved = services_breakdown_resolved(df)
+    # Positions 4–50 under the same scoring, selected without sorting the frame
+    from .opportunity import STRIKING_DISTANCE, score_opportunities, top_opportunities
+
+    striking = score_opportunities(df, STRIKING_DISTANCE, ctr_curve)
+    _mark("aggregate")
 
     overview_csv = base_dir / "overview_buckets.csv"
     save_df(ov["by_bucket"], overview_csv)
     save_df(top_kw, base_dir / "top_keywords_by_traffic.csv")
     save_df(top_pg, base_dir / "top_pages_by_traffic.csv")
     save_df(qw, base_dir / "quick_wins.csv")
+    save_df(top_opportunities(striking, 500), base_dir / "opportunities.csv")
+    save_df(top_opportunities(striking, 50, by="service"), base_dir / "opportunities_by_service.csv")
     save_df(imp, base_dir / "movers_improvers.csv")
     save_df(dec, base_dir / "movers_decliners.csv")
     save_df(intents, base_dir / "intent_mix.csv")
     save_df(serp, base_dir / "serp_features.csv")
     save_df(cats, base_dir / "categories.csv")
     save_df(svcs, base_dir / "services_summary.csv")
+    save_df(svcs_resolved, base_dir / "services_summary_resolved.csv")
+    _mark("write")
+
+    # /agency quick reports on the same frame (no second parse of the export)
+    from .agency_reports import AGENCY_BUCKETS, agency_reports
+
+    for name, adf in agency_reports(df, agency_buckets or AGENCY_BUCKETS).items():
+        save_df(adf, base_dir / f"{name}.csv")
+    _mark("agency_reports")
+
+    # Previous → current position bucket transitions, every slice from one group_by
+    from .transitions import position_transitions, transition_matrix
+
+    transitions = position_transitions(df)
+    trans_matrix = transition_matrix(transitions)
+    save_df(transitions, base_dir / "position_transitions.csv")
+    save_df(trans_matrix, base_dir / "position_transition_matrix.csv")
+    _mark("transitions")
+
+    # SERP-feature co-occurrence over the full feature vocabulary
+    from .serp_features import serp_cooccurrence
+
+    serp_co = serp_cooccurrence(df)
+    save_df(serp_co["pairs"], base_dir / "serp_feature_pairs.csv")
+    save_df(serp_co["combos"], base_dir / "serp_feature_combos.csv")
+    _mark("serp_cooccurrence")
+
+    # Collapsed views: keyword variants rolled up to canonical groups
+    from .canonical import collapse_variants
+
+    collapsed = collapse_variants(df)
+    save_df(top_keywords_by_traffic(collapsed, 100), base_dir / "top_keywords_collapsed.csv")
+    save_df(quick_wins(collapsed, 200, ctr_curve=ctr_curve), base_dir / "quick_wins_collapsed.csv")
+    _mark("canonical")
+
+    if sketches:
+        from .sketches import partial_sketches, services_breakdown_with_sketches, sketch_summary
+
+        sketch_state = partial_sketches(df)
+        save_df(services_breakdown_with_sketches(svcs, sketch_state), base_dir / "services_sketches.csv")
+        save_df(sketch_summary(sketch_state)["locations"], base_dir / "locations_sketches.csv")
+        _mark("sketches")
 
     # Per-service win/loss/quick-win tables
     services_dir = base_dir / "services"
     services_dir.mkdir(parents=True, exist_ok=True)
     svc_list = svcs.select("service").to_series().to_list()
+    qw_by_service = quick_wins(df, 50, by="service", ctr_curve=ctr_curve)
     for svc in svc_list:
         sub = df.filter(pl.col("service") == svc)
         # Threshold: skip tiny services (< 20 keywords)
@@ -611,12 +828,7 @@ def run_full_analysis(
             continue
         wins = sub.filter(pl.col("pos_change") > 0).sort("pos_change", descending=True).head(50)
         losses = sub.filter(pl.col("pos_change") < 0).sort("pos_change", descending=False).head(50)
-        qw_svc = (
-            sub.filter((pl.col(COL_POS) >= 4) & (pl.col(COL_POS) <= 10))
-            .with_columns((pl.col(COL_VOLUME) * (pl.col(COL_CPC).fill_null(0.0))).alias("priority"))
-            .sort(["priority", COL_VOLUME, COL_CPC], descending=[True, True, True])
-            .head(50)
-        )
+        qw_svc = qw_by_service.filter(pl.col("service") == svc)
         top_kw_svc = top_keywords_by_traffic_for_service(df, svc, 50)
         serp_svc = serp_features_presence_for_df(sub)
         internal_targets = internal_targets_for_service(df, svc, 20)
@@ -627,11 +839,97 @@ def run_full_analysis(
         save_df(top_kw_svc, services_dir / f"top_keywords_{svc}.csv")
         save_df(serp_svc, services_dir / f"serp_features_{svc}.csv")
         save_df(internal_targets, services_dir / f"internal_targets_{svc}.csv")
+    _mark("services")
+
+    # Internal link suggestions (sparse keyword-token similarity → quick-win targets)
+    from .linking import internal_link_suggestions
+
+    links = internal_link_suggestions(df, ctr_curve=ctr_curve)
+    for (svc,), ldf in links.group_by("service", maintain_order=True):
+        save_df(ldf, services_dir / f"internal_link_suggestions_{svc}.csv")
+    _mark("linking")
+
+    from .link_equity import link_equity_reports, load_link_edges
+
+    extra_edges = [load_link_edges(links_csv)] if links_csv else []
+    pages = None
+    if crawl:
+        from .crawler import crawl as crawl_pages, join_pages, link_edges, pages_for_csv
+
+        pages = crawl_pages(df[COL_URL].drop_nulls().unique(maintain_order=True).to_list())
+        save_df(pages_for_csv(pages), base_dir / "pages.csv")
+        page_links = link_edges(pages)
+        save_df(page_links, base_dir / "page_links.csv")
+        extra_edges.append(page_links)
+        save_df(join_pages(top_kw, pages), base_dir / "top_keywords_on_page.csv")
+        _mark("crawl")
+    if pages_path:
+        from .coverage import load_pages
+
+        pages = load_pages(pages_path)
+    if pages is not None:
+        from .coverage import coverage_reports
+
+        for name, cdf in coverage_reports(df, pages).items():
+            save_df(cdf, base_dir / f"{name}.csv")
+        _mark("coverage")
+
+    if access_logs:
+        from .access_logs import crawl_budget_reports, ingest_access_logs
+
+        crawl_daily = ingest_access_logs(access_logs, verify=log_verify, ip_ranges_path=ip_ranges_path)
+        for name, bdf in crawl_budget_reports(df, crawl_daily).items():
+            save_df(bdf, base_dir / f"{name}.csv")
+        _mark("access_logs")
+
+    if backlinks:
+        from .backlinks import backlink_reports
+
+        for name, bdf in backlink_reports(df, backlinks).items():
+            save_df(bdf, base_dir / f"{name}.csv")
+        _mark("backlinks")
+
+    # Link equity over the directory hierarchy (+ crawled links when given)
+    equity = link_equity_reports(df, extra_edges=pl.concat(extra_edges) if extra_edges else None)
+    for name, edf in equity.items():
+        save_df(edf, base_dir / f"{name}.csv")
+    _mark("link_equity")
 
     # Geo reports
-    geo = geo_reports(df)
+    geo = geo_reports(df, ctr_curve=ctr_curve)
     for name, gdf in geo.items():
         save_df(gdf, base_dir / f"{name}.csv")
+    _mark("geo")
+
+    # Traffic rollup at every path prefix (flat table + nested tree)
+    from .paths import path_rollup, write_path_tree
+
+    rollup = path_rollup(df)
+    save_df(rollup, base_dir / "path_rollup.csv")
+    write_path_tree(rollup, base_dir / "path_tree.json")
+    _mark("paths")
+
+    # Keyword cannibalization (one keyword → several of our URLs)
+    from .cannibalization import cannibalization_reports
+
+    cannibal = cannibalization_reports(df)
+    for name, cdf in cannibal.items():
+        save_df(cdf, base_dir / f"{name}.csv")
+    _mark("cannibalization")
+
+    # Keyword topic clusters (MinHash/LSH over keyword text)
+    from .topics import topic_clusters
+
+    topics = topic_clusters(df)
+    save_df(topics, base_dir / "topic_clusters.csv")
+    _mark("topics")
+
+    # Keyword n-gram / modifier tables
+    from .ngrams import ngram_tables
+
+    for name, ndf in ngram_tables(df).items():
+        save_df(ndf, base_dir / f"{name}.csv")
+    _mark("ngrams")
 
     # Write summary markdown
     summary_md = base_dir / "summary.md"
@@ -640,8 +938,31 @@ def run_full_analysis(
     total_cost = ov["traffic_cost"]
     avg_pos = ov["avg_position"]
     by_b = ov["by_bucket"].to_dict(as_series=False)
+    error_bars = None
+    if _is_weighted(df):
+        from .sampling import sample_error_bars
+
+        error_bars = sample_error_bars(df)
+        save_df(error_bars, base_dir / "sample_error_bars.csv")
     with summary_md.open("w", encoding="utf-8") as f:
         f.write("# Organic Positions Summary\n\n")
+        if error_bars is not None:
+            f.write(
+                f"> Draft run on a stratified sample of {df.height:,} rows "
+                f"({sample_fraction:.1%} of the long tail; high-value rows kept). "
+                "Counts and traffic are scaled estimates.\n\n"
+            )
+        if rejects is not None:
+            from .quality import quarantine_summary
+
+            reasons = quarantine_summary(rejects, rows_read)
+            f.write(
+                f"> Ingestion: {rejects.height:,} of {rows_read:,} rows "
+                f"({rejects.height / max(rows_read, 1):.2%}) quarantined to quarantine.parquet"
+            )
+            if reasons.height:
+                f.write(" — " + ", ".join(f"{r} {n:,}" for r, n, _ in reasons.head(8).iter_rows()))
+            f.write(".\n\n")
         f.write(f"- Total keywords: {total_kw}\n")
         f.write(f"- Est. traffic: {total_traffic:,.0f}\n")
         f.write(f"- Est. traffic cost: ${total_cost:,.0f}\n")
@@ -651,7 +972,37 @@ def run_full_analysis(
             f"{b} {k}/{total_kw} ({s:.1%})"
             for b, k, s in zip(by_b["pos_bucket"], by_b["keywords"], by_b["share"])
         ]
-        f.write(", ".join(b_items) + "\n\n")
+        f.write(", ".join(b_items) + "\n")
+        n_distinct = int(df[COL_KEYWORD].n_unique())
+        f.write(
+            f"- Keyword variants: {n_distinct} distinct keywords → {collapsed.height} canonical groups "
+            f"({n_distinct / max(collapsed.height, 1):.2f}× duplication)\n"
+        )
+        n_other = int(svcs_resolved["keywords_from_url"].filter(svcs_resolved["service"] == "other").sum())
+        n_recovered = int(svcs_resolved["keywords_from_text"].sum())
+        f.write(
+            f"- Keyword-text services: {n_recovered} of {n_recovered + n_other} 'other' keywords "
+            "assigned a service from the keyword text\n"
+        )
+        combos = serp_co["combos"]
+        if combos.height:
+            aio = serp_co["pairs"].filter((pl.col("feature_a") == "AI overview") & (pl.col("feature_b") == "AI overview"))
+            top3_total = float(df.filter(pl.col("is_top3")).select(_wsum(df, COL_TRAFFIC)).item() or 0.0)
+            aio_top3 = float(aio["top3_traffic"].sum())
+            f.write(
+                f"- SERP features: most common combination is {combos['features'][0]} "
+                f"({combos['keyword_share'][0]:.1%} of keywords); top-3 traffic under AI overview: "
+                f"{aio_top3:,.0f} ({aio_top3 / top3_total if top3_total else 0.0:.1%})\n"
+            )
+        f.write("\n")
+
+        if error_bars is not None:
+            f.write("## Error bars (95% CI)\n")
+            # Per metric: the overall row, then the top 5 services by estimate
+            shown = error_bars.filter(pl.int_range(pl.len()).over("metric") < 6).sort("metric", maintain_order=True)
+            for svc, metric, est, se, lo, hi in shown.iter_rows():
+                f.write(f"- {svc} {metric}: {est:,.0f} ± {1.96 * se:,.0f} ({lo:,.0f}–{hi:,.0f})\n")
+            f.write("\n")
 
         # Quick takeaways
         top_kw_row = top_kw.select([COL_KEYWORD, COL_TRAFFIC, COL_POS, COL_URL]).head(5)
@@ -665,6 +1016,27 @@ def run_full_analysis(
             kw, vol, cpc, pos, url = r
             f.write(f"- {kw} (vol {vol:,}, CPC ${cpc:,.2f}) at pos {pos} → {url}\n")
 
+        if topics.height:
+            f.write("\n## Topic clusters\n")
+            for topic, n_kw, tr, pos, url in topics.select(
+                "topic", "keywords", "traffic", "avg_position", "dominant_url"
+            ).head(5).iter_rows():
+                f.write(f"- {topic}: {n_kw} keywords, traffic {tr:,.0f}, avg pos {pos:.1f} → {url}\n")
+
+        clusters = cannibal["cannibalization_clusters"]
+        if clusters.height:
+            f.write("\n## Cannibalization\n")
+            f.write(
+                f"- {cannibal['cannibalized_keywords'].height} keywords rank with several URLs; "
+                f"{clusters.height} conflict clusters\n"
+            )
+            top = clusters.sort(["contested_traffic", "cluster_id"], descending=[True, False]).head(5)
+            for svc, n_urls, n_kw, tr, url in top.select(
+                "service", "urls", "contested_keywords", "contested_traffic", "dominant_url"
+            ).iter_rows():
+                f.write(f"- {svc}: {n_urls} URLs share {n_kw} keywords (traffic {tr:,.0f}) → {url}\n")
+    _mark("summary")
+
     charts: dict[str, Path] | None = None
     deck_md: Path | None = None
     deck_html: Path | None = None
@@ -680,6 +1052,7 @@ def run_full_analysis(
                 intent=intents,
                 categories=cats,
                 services=svcs,
+                transitions=trans_matrix,
             )
             # Also write Vega-Lite specs for portability
             vega_specs = generate_vega_specs(
@@ -688,27 +1061,31 @@ def run_full_analysis(
                 intent=intents,
                 categories=cats,
                 services=svcs,
+                transitions=trans_matrix,
             )
         except Exception:
             charts = None
             vega_specs = None
+        _mark("charts")
 
     # Forecast uplift for quick wins
     forecast_summary = None
     forecast_by_service = None
     try:
-        forecast_summary, _forecast_details, forecast_by_service = forecast_quick_wins_uplift(df, target_pos=3, n=200)
+        forecast_summary, _forecast_details, forecast_by_service = forecast_quick_wins_uplift(df, target_pos=3, n=200, ctr_curve=ctr_curve)
         save_df(forecast_by_service, base_dir / "forecast_by_service.csv")
     except Exception:
         pass
+    _mark("forecast")
 
-    if generate_deck:
+    def build_decks() -> tuple[Path | None, Path | None]:
+        """Write deck.md / deck.html from this run's frames (rerun after adding screenshots)."""
         try:
             from .deck import write_deck
             from .html_deck import write_html_deck
 
             # Geo reports
-            geo = geo_reports(df)
+            geo = geo_reports(df, ctr_curve=ctr_curve)
 
             deck_md = write_deck(
                 base_dir=base_dir,
@@ -723,6 +1100,7 @@ def run_full_analysis(
                 geo=geo,
                 forecast_summary=forecast_summary,
                 forecast_by_service=forecast_by_service,
+                transitions=transitions,
             )
             deck_html = write_html_deck(
                 base_dir=base_dir,
@@ -740,9 +1118,13 @@ def run_full_analysis(
                 forecast_summary=forecast_summary,
                 forecast_by_service=forecast_by_service,
             )
+            return deck_md, deck_html
         except Exception:
-            deck_md = None
-            deck_html = None
+            return None, None
+
+    if generate_deck:
+        deck_md, deck_html = build_decks()
+        _mark("deck")
 
     return AnalysisArtifacts(
         base_dir=base_dir,
@@ -762,4 +1144,7 @@ def run_full_analysis(
         deck_html=deck_html,
         vega_specs=vega_specs,
         forecast_by_service_csv=(base_dir / "forecast_by_service.csv") if forecast_by_service is not None else None,
+        stage_timings=timings,
+        quarantine_parquet=quarantine_parquet,
+        rebuild_deck=build_decks if generate_deck else None,
     )
@@ -0,0 +1,303 @@
+"""Off-page reports from SEMrush or Ahrefs backlink exports.
+
+Backlink exports run to tens of millions of rows (one per linking page ×
+target), so they are never loaded whole:
+
+- each file is scanned lazily (CSV/TSV or Parquet) and mapped to canonical
+  columns (source_url, target_url, anchor, follow flag, authority), whatever the
+  tool's spelling
+- the scan is rolled up to one row per (target, referring domain) and per
+  (target, anchor) by lazy group-bys on the streaming engine, reading each
+  row once, so memory depends on the number of distinct pairs, not on the
+  export size
+- per-target and per-service metrics (referring domains, follow/nofollow
+  mix, authority) are roll-ups of the (target, domain) table; only the
+  `top_k` strongest referring domains per target are kept for output
+- anchor texts are tokenized once per distinct anchor and expanded to
+  n-grams (see ngrams.py), weighted by their link counts
+
+Targets are joined to the ranking page facts (keywords, traffic, best
+position) on the normalized URL; ranking pages without backlinks are kept
+with zero referring domains.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable
+
+import polars as pl
+
+from .analysis import COL_KEYWORD, COL_POS, COL_TRAFFIC, COL_URL, _wcount, _wcount_if, _wsum, url_service
+from .ngrams import _row_ngrams, keyword_tokens
+from .paths import normalize_url
+
+
+TOP_K = 10
+BRAND = "designrush"
+_GENERIC_ANCHORS = frozenset(
+    [
+        "here", "click here", "this link", "link", "website", "site", "this site", "page", "source",
+        "read more", "learn more", "more", "more info", "visit", "visit website", "view", "details",
+        "this article", "article",
+    ]
+)
+
+# Export column names (SEMrush and Ahrefs spellings) → canonical names
+_COLUMNS = {
+    "source url": "source_url",
+    "referring page url": "source_url",
+    "referring page": "source_url",
+    "target url": "target_url",
+    "anchor": "anchor",
+    "anchor text": "anchor",
+    "nofollow": "nofollow",
+    "sponsored": "sponsored",
+    "ugc": "ugc",
+    "link type": "link_type",
+    "type": "link_type",
+}
+# Authority columns by preference: domain-level scores first
+_AUTHORITY = ("domain rating", "dr", "domain ascore", "authority score", "page ascore", "ur", "url rating")
+
+
+def _source_domain(url: pl.Expr) -> pl.Expr:
+    """Lowercase host without `www.`."""
+    return url.str.to_lowercase().str.extract(r"^(?:[a-z][a-z0-9+.-]*://)?(?:www\.)?([^/:?#]+)", 1)
+
+
+def _truthy(col: pl.Expr) -> pl.Expr:
+    return col.cast(pl.Utf8).str.strip_chars().str.to_lowercase().is_in(["true", "1", "yes", "y"])
+
+
+def scan_backlinks(path: str | Path) -> pl.LazyFrame:
+    """Lazy (target_url, source_domain, anchor, links, follow_links, authority) over one backlink export.
+
+    Each row is one link: `links` is 1 and `follow_links` is 1 unless the
+    link is nofollow, sponsored or UGC.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        lf = pl.scan_parquet(path)
+    else:
+        with path.open("rb") as f:
+            head = f.read(4096)
+        if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+            raise ValueError(f"{path} is UTF-16; re-export it as UTF-8 CSV")
+        first = head.split(b"\n", 1)[0]
+        lf = pl.scan_csv(path, separator="\t" if first.count(b"\t") > first.count(b",") else ",", infer_schema=False)
+    names = {c.strip().lstrip("\ufeff").lower(): c for c in lf.collect_schema().names()}
+    cols = {}
+    for key, canon in _COLUMNS.items():
+        if key in names and canon not in cols:
+            cols[canon] = names[key]
+    missing = {"source_url", "target_url"} - set(cols)
+    if missing:
+        raise ValueError(f"Backlink export {path} is missing columns: {sorted(missing)}")
+    authority = next((names[k] for k in _AUTHORITY if k in names), None)
+
+    if "nofollow" in cols:
+        nofollow = _truthy(pl.col(cols["nofollow"]))
+    elif "link_type" in cols:
+        nofollow = pl.col(cols["link_type"]).str.to_lowercase().str.contains("nofollow").fill_null(False)
+    else:
+        nofollow = pl.lit(False)
+    for qualifier in ("sponsored", "ugc"):
+        if qualifier in cols:
+            nofollow = nofollow | _truthy(pl.col(cols[qualifier]))
+    anchor = pl.col(cols["anchor"]) if "anchor" in cols else pl.lit(None, dtype=pl.Utf8)
+    return lf.select(
+        normalize_url(pl.col(cols["target_url"]).cast(pl.Utf8)).alias("target_url"),
+        _source_domain(pl.col(cols["source_url"]).cast(pl.Utf8)).alias("source_domain"),
+        anchor.cast(pl.Utf8).str.to_lowercase().str.replace_all(r"\s+", " ").str.strip_chars().fill_null("").alias("anchor"),
+        pl.lit(1, dtype=pl.UInt32).alias("links"),
+        (~nofollow.fill_null(False)).cast(pl.UInt32).alias("follow_links"),
+        (pl.col(authority).cast(pl.Float64, strict=False) if authority else pl.lit(None, dtype=pl.Float64)).alias(
+            "authority"
+        ),
+    ).filter(pl.col("target_url").is_not_null() & pl.col("source_domain").is_not_null())
+
+
+def scan_backlink_exports(paths: Iterable[str | Path]) -> pl.LazyFrame:
+    """One lazy frame over several exports (parts of one export, or SEMrush and Ahrefs side by side)."""
+    return pl.concat([scan_backlinks(p) for p in paths], how="vertical")
+
+
+def aggregate_backlinks(lf: pl.LazyFrame) -> dict[str, pl.DataFrame]:
+    """`domains` (one row per target_url × source_domain) and `anchors` (per target_url × anchor).
+
+    Both roll-ups are lazy group-bys collected together on the streaming
+    engine, so the export is read once and only the grouped tables are
+    held in memory.
+    """
+    links = [pl.sum("links"), pl.sum("follow_links")]
+    domains, anchors = pl.collect_all(
+        [
+            lf.group_by("target_url", "source_domain").agg(*links, pl.max("authority")),
+            lf.group_by("target_url", "anchor").agg(*links),
+        ],
+        engine="streaming",
+    )
+    return {"domains": domains, "anchors": anchors}
+
+
+def anchor_type(anchor: pl.Expr, brand: str = BRAND) -> pl.Expr:
+    """empty / branded / url / generic / keyword."""
+    return (
+        pl.when(anchor == "")
+        .then(pl.lit("empty"))
+        .when(anchor.str.contains(brand, literal=True))
+        .then(pl.lit("branded"))
+        .when(anchor.str.contains(r"^(https?://|www\.)|^[\w.-]+\.(com|net|org|io|co)(/|$)"))
+        .then(pl.lit("url"))
+        .when(anchor.is_in(list(_GENERIC_ANCHORS)))
+        .then(pl.lit("generic"))
+        .otherwise(pl.lit("keyword"))
+    )
+
+
+def _ranking_pages(df: pl.DataFrame) -> pl.DataFrame:
+    return (
+        df.filter(pl.col(COL_URL).is_not_null())
+        .with_columns(normalize_url(pl.col(COL_URL)).alias("target_url"))
+        .group_by("target_url")
+        .agg(
+            _wcount(df).alias("keywords"),
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
+            _wcount_if(df, pl.col(COL_POS) <= 3).alias("top3_keywords"),
+            pl.min(COL_POS).alias("best_position"),
+            pl.col(COL_KEYWORD).sort_by(COL_TRAFFIC, descending=True).first().alias("top_keyword"),
+        )
+    )
+
+
+def top_domains(domains: pl.DataFrame, top_k: int = TOP_K) -> pl.DataFrame:
+    """The `top_k` referring domains per target by authority, then follow links."""
+    return (
+        domains.sort(
+            ["target_url", "authority", "follow_links", "links", "source_domain"],
+            descending=[False, True, True, True, False],
+            nulls_last=True,
+        )
+        .with_columns(pl.int_range(1, pl.len() + 1).over("target_url").alias("rank"))
+        .filter(pl.col("rank") <= top_k)
+        .select(pl.col("target_url").alias(COL_URL), "rank", "source_domain", "authority", "links", "follow_links")
+    )
+
+
+def anchor_ngrams(anchors: pl.DataFrame, services: pl.DataFrame, max_n: int = 2, top_n: int = 50) -> pl.DataFrame:
+    """Link-weighted anchor-text n-grams per service (top `top_n` by links per service and n)."""
+    distinct = anchors.select("anchor").unique().filter(pl.col("anchor") != "").with_row_index("anchor_id")
+    vocab = (
+        distinct.select(keyword_tokens(pl.col("anchor")).alias("token")).explode("token").drop_nulls().unique()["token"]
+    )
+    grams = _row_ngrams(distinct.select(pl.col("anchor").alias(COL_KEYWORD)), vocab, max_n)
+    return (
+        anchors.join(distinct, on="anchor")
+        .join(services, on="target_url")
+        .join(grams.rename({"row": "anchor_id"}), on="anchor_id")
+        .group_by("service", "ngram")
+        .agg(
+            pl.sum("links").alias("backlinks"),
+            pl.sum("follow_links").alias("follow_backlinks"),
+            pl.col("target_url").n_unique().alias("targets"),
+        )
+        .with_columns((pl.col("ngram").str.count_matches(" ") + 1).cast(pl.Int8).alias("n"))
+        .sort(["service", "n", "backlinks", "ngram"], descending=[False, False, True, False])
+        .filter(pl.int_range(pl.len()).over("service", "n") < top_n)
+        .select("service", "n", "ngram", "backlinks", "follow_backlinks", "targets")
+    )
+
+
+def backlink_reports(
+    df: pl.DataFrame,
+    paths: Iterable[str | Path],
+    top_k: int = TOP_K,
+    brand: str = BRAND,
+) -> dict[str, pl.DataFrame]:
+    """`backlinks_by_url`, `backlinks_by_service`, `backlink_top_domains` and `backlink_anchor_ngrams` tables."""
+    tables = aggregate_backlinks(scan_backlink_exports(paths))
+    domains, anchors = tables["domains"], tables["anchors"]
+
+    mix = (
+        anchors.with_columns(anchor_type(pl.col("anchor"), brand).alias("anchor_type"))
+        .group_by("target_url")
+        .agg(
+            *[
+                pl.col("links").filter(pl.col("anchor_type") == t).sum().alias(f"{t}_anchors")
+                for t in ("branded", "url", "generic", "keyword", "empty")
+            ],
+            pl.when(pl.col("anchor") != "")
+            .then(pl.col("anchor"))
+            .sort_by("links", descending=True)
+            .drop_nulls()
+            .first()
+            .alias("top_anchor"),
+        )
+    )
+    per_target = (
+        domains.group_by("target_url")
+        .agg(
+            pl.len().alias("referring_domains"),
+            (pl.col("follow_links") > 0).sum().alias("follow_domains"),
+            pl.sum("links").alias("backlinks"),
+            pl.sum("follow_links").alias("follow_backlinks"),
+            pl.mean("authority").alias("avg_domain_authority"),
+            pl.max("authority").alias("max_domain_authority"),
+            pl.col("source_domain").sort_by("authority", descending=True, nulls_last=True).first().alias("top_domain"),
+        )
+        .join(mix, on="target_url", how="left")
+    )
+    counts = ["referring_domains", "follow_domains", "backlinks", "follow_backlinks"]
+    by_url = (
+        per_target.join(_ranking_pages(df), on="target_url", how="full", coalesce=True)
+        .with_columns(
+            url_service(pl.col("target_url")).alias("service"),
+            pl.col(*counts).fill_null(0),
+            pl.col("keywords", "traffic", "top3_keywords").fill_null(0),
+        )
+        .with_columns(
+            pl.when(pl.col("backlinks") > 0).then(pl.col("follow_backlinks") / pl.col("backlinks")).alias("follow_share"),
+            pl.when(pl.col("referring_domains") > 0)
+            .then(pl.col("traffic") / pl.col("referring_domains"))
+            .alias("traffic_per_domain"),
+        )
+        .rename({"target_url": COL_URL})
+        .sort(["referring_domains", "traffic", COL_URL], descending=[True, True, False])
+    )
+    services = by_url.select(pl.col(COL_URL).alias("target_url"), "service")
+    by_service = (
+        domains.join(services, on="target_url")
+        .group_by("service")
+        .agg(
+            pl.col("source_domain").n_unique().alias("referring_domains"),
+            pl.col("source_domain").filter(pl.col("follow_links") > 0).n_unique().alias("follow_domains"),
+            pl.sum("links").alias("backlinks"),
+            pl.sum("follow_links").alias("follow_backlinks"),
+        )
+        .join(
+            by_url.group_by("service").agg(
+                (pl.col("referring_domains") > 0).sum().alias("linked_urls"),
+                ((pl.col("referring_domains") == 0) & (pl.col("keywords") > 0)).sum().alias("ranking_urls_without_links"),
+                pl.sum("keywords", "traffic", "top3_keywords"),
+            ),
+            on="service",
+            how="full",
+            coalesce=True,
+        )
+        .with_columns(
+            pl.col("referring_domains", "follow_domains", "backlinks", "follow_backlinks").fill_null(0),
+        )
+        .with_columns(
+            pl.when(pl.col("backlinks") > 0).then(pl.col("follow_backlinks") / pl.col("backlinks")).alias("follow_share"),
+            pl.when(pl.col("referring_domains") > 0)
+            .then(pl.col("traffic") / pl.col("referring_domains"))
+            .alias("traffic_per_domain"),
+        )
+        .sort(["referring_domains", "traffic"], descending=True)
+    )
+    return {
+        "backlinks_by_url": by_url,
+        "backlinks_by_service": by_service,
+        "backlink_top_domains": top_domains(domains, top_k),
+        "backlink_anchor_ngrams": anchor_ngrams(anchors, services),
+    }
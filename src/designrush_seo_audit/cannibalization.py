@@ -0,0 +1,261 @@
+"""Keyword cannibalization over the keyword → URL bipartite graph.
+
+Finds keywords that rank with several of our URLs and pairs/clusters of
+pages that split the same query set.
+
+The keyword × URL incidence matrix is kept sparse as an edge list. URL-pair
+overlap (AᵀA off the diagonal) is computed as a self-join on the keyword,
+restricted to keywords with more than one URL and capped at
+`max_urls_per_keyword` URLs each, so the work is linear in the number of
+edges instead of pairwise over all URLs. Conflict clusters are the connected
+components of the scored pairs, found with vectorized hook-and-compress
+rounds over integer URL ids.
+"""
+from __future__ import annotations
+
+import polars as pl
+
+from .analysis import COL_KEYWORD, COL_POS, COL_TRAFFIC, COL_URL, COL_VOLUME, _wsum
+
+
+def keyword_url_edges(df: pl.DataFrame, key: str = COL_KEYWORD) -> pl.DataFrame:
+    """One row per (keyword, URL) with summed traffic and best position.
+
+    `key` may be any keyword grouping column (e.g. a canonical keyword id).
+    Traffic is scaled by the sample weight on draft samples, so every
+    traffic total, cap and ranking below matches a full run.
+    """
+    return (
+        df.filter(pl.col(key).is_not_null() & pl.col(COL_URL).is_not_null())
+        .group_by([key, COL_URL])
+        .agg(
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
+            pl.min(COL_POS).alias("position"),
+            pl.max(COL_VOLUME).alias("volume"),
+            pl.first("service").alias("service"),
+        )
+        .rename({key: "keyword"})
+    )
+
+
+def cannibalized_keywords(df: pl.DataFrame, key: str = COL_KEYWORD) -> pl.DataFrame:
+    """Keywords ranking with more than one URL, most valuable first."""
+    return _cannibalized(keyword_url_edges(df, key))
+
+
+def _cannibalized(edges: pl.DataFrame) -> pl.DataFrame:
+    return (
+        edges.filter(pl.len().over("keyword") > 1)
+        .sort(["keyword", "traffic", "position"], descending=[False, True, False])
+        .group_by("keyword", maintain_order=True)
+        .agg(
+            pl.len().alias("urls"),
+            pl.max("volume").alias("volume"),
+            pl.sum("traffic").alias("traffic"),
+            pl.min("position").alias("best_position"),
+            pl.col(COL_URL).first().alias("primary_url"),
+            pl.col(COL_URL).str.join(" | ").alias("all_urls"),
+            pl.col("position").cast(pl.Utf8).str.join(" | ").alias("positions"),
+        )
+        .sort(["volume", "traffic", "keyword"], descending=[True, True, False])
+    )
+
+
+def _graph(df: pl.DataFrame, key: str) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Edges tagged with a dense integer URL id, plus the per-URL table.
+
+    `uid` is the row index of the URL table, so per-URL columns are gathers.
+    """
+    edges = keyword_url_edges(df, key)
+    urls = (
+        edges.group_by(COL_URL)
+        .agg(
+            pl.len().alias("page_keywords"),
+            pl.sum("traffic").alias("page_traffic"),
+            pl.first("service").alias("service"),
+        )
+        .sort(COL_URL)
+        .with_row_index("uid")
+    )
+    return edges.join(urls.select(COL_URL, "uid"), on=COL_URL), urls
+
+
+def _pair_overlap(edges: pl.DataFrame, max_urls_per_keyword: int) -> pl.DataFrame:
+    """Off-diagonal AᵀA as (uid_a, uid_b, shared_*) rows, uid_a < uid_b."""
+    multi = (
+        edges.filter(pl.len().over("keyword") > 1)
+        # Cap high-degree keywords so the self-join stays linear
+        .filter(
+            pl.col("traffic").rank("ordinal", descending=True).over("keyword") <= max_urls_per_keyword
+        )
+        .select("keyword", "uid", "traffic", "volume")
+    )
+    return (
+        multi.join(multi, on="keyword", suffix="_b")
+        .filter(pl.col("uid") < pl.col("uid_b"))
+        .group_by(["uid", "uid_b"])
+        .agg(
+            pl.len().alias("shared_keywords"),
+            (pl.col("traffic") + pl.col("traffic_b")).sum().alias("shared_traffic"),
+            pl.sum("volume").alias("shared_volume"),
+        )
+        .rename({"uid": "uid_a"})
+    )
+
+
+def _score_pairs(overlap: pl.DataFrame, urls: pl.DataFrame) -> pl.DataFrame:
+    a, b = overlap["uid_a"], overlap["uid_b"]
+    return overlap.with_columns(
+        urls[COL_URL].gather(a).alias("url_a"),
+        urls[COL_URL].gather(b).alias("url_b"),
+        urls["service"].gather(a).alias("service_a"),
+        urls["service"].gather(b).alias("service_b"),
+        (
+            overlap["shared_keywords"]
+            / pl.min_horizontal(urls["page_keywords"].gather(a), urls["page_keywords"].gather(b))
+        ).alias("overlap"),
+    ).with_columns((pl.col("overlap") * pl.col("shared_traffic")).alias("score"))
+
+
+_PAIR_COLUMNS = [
+    "url_a",
+    "url_b",
+    "service_a",
+    "service_b",
+    "shared_keywords",
+    "shared_traffic",
+    "shared_volume",
+    "overlap",
+    "score",
+]
+
+
+def _sort_pairs(pairs: pl.DataFrame) -> pl.DataFrame:
+    return pairs.sort(["score", "shared_volume", "url_a", "url_b"], descending=[True, True, False, False])
+
+
+def conflict_pairs(
+    df: pl.DataFrame,
+    key: str = COL_KEYWORD,
+    max_urls_per_keyword: int = 20,
+) -> pl.DataFrame:
+    """Score URL pairs by the keywords (and traffic) they share.
+
+    - shared_keywords: keywords both pages rank for
+    - shared_traffic: traffic both pages earn on those keywords
+    - shared_volume: search volume of the contested keywords
+    - overlap: shared_keywords / keywords of the smaller page
+    - score: overlap × shared_traffic (ranking key)
+    """
+    edges, urls = _graph(df, key)
+    pairs = _score_pairs(_pair_overlap(edges, max_urls_per_keyword), urls)
+    return _sort_pairs(pairs.select(_PAIR_COLUMNS))
+
+
+def _components(a: pl.Series, b: pl.Series, n: int) -> pl.Series:
+    """Connected-component label (smallest member id) for nodes 0..n-1.
+
+    Vectorized hook-and-compress: every edge whose endpoints have different
+    roots hooks the larger root under the smaller one (conflicting writes
+    just leave the edge for the next round), then labels are pointer-jumped
+    to their roots and settled edges are dropped. A few rounds suffice even
+    for long chains.
+    """
+    labels = pl.int_range(n, dtype=pl.UInt32, eager=True)
+    edges = pl.DataFrame({"a": a.cast(pl.UInt32), "b": b.cast(pl.UInt32)})
+    while edges.height:
+        la = labels.gather(edges["a"])
+        lb = labels.gather(edges["b"])
+        labels = labels.scatter(la.zip_with(la > lb, lb), la.zip_with(la < lb, lb))
+        while not (jumped := labels.gather(labels)).equals(labels):
+            labels = jumped
+        edges = edges.filter(labels.gather(edges["a"]) != labels.gather(edges["b"]))
+    return labels
+
+
+def conflict_clusters(
+    df: pl.DataFrame,
+    key: str = COL_KEYWORD,
+    min_shared_keywords: int = 1,
+    min_overlap: float = 0.0,
+    max_urls_per_keyword: int = 20,
+) -> pl.DataFrame:
+    """Group conflicting pages into clusters, ranked within each service.
+
+    A cluster's service is that of its highest-traffic URL. Contested
+    keywords are those ranking with two or more URLs of the cluster.
+    """
+    edges, urls = _graph(df, key)
+    pairs = _score_pairs(_pair_overlap(edges, max_urls_per_keyword), urls)
+    return _clusters(edges, urls, pairs, min_shared_keywords, min_overlap)
+
+
+def _clusters(
+    edges: pl.DataFrame,
+    urls: pl.DataFrame,
+    pairs: pl.DataFrame,
+    min_shared_keywords: int,
+    min_overlap: float,
+) -> pl.DataFrame:
+    kept = pairs.filter(
+        (pl.col("shared_keywords") >= min_shared_keywords) & (pl.col("overlap") >= min_overlap)
+    )
+    roots = _components(kept["uid_a"], kept["uid_b"], urls.height)
+    edges = edges.filter(pl.col("uid").is_in(pl.concat([kept["uid_a"], kept["uid_b"]]).unique()))
+    edges = edges.with_columns(roots.gather(edges["uid"]).alias("root"))
+    pages = (
+        edges.group_by(["root", COL_URL])
+        .agg(pl.sum("traffic").alias("traffic"), pl.first("service").alias("service"))
+        .sort(["root", "traffic", COL_URL], descending=[False, True, False])
+    )
+    contested = (
+        edges.filter(pl.len().over(["root", "keyword"]) > 1)
+        .group_by(["root", "keyword"])
+        .agg(pl.sum("traffic").alias("traffic"), pl.max("volume").alias("volume"))
+        .sort(["root", "volume", "keyword"], descending=[False, True, False])
+        .group_by("root", maintain_order=True)
+        .agg(
+            pl.len().alias("contested_keywords"),
+            pl.sum("traffic").alias("contested_traffic"),
+            pl.sum("volume").alias("contested_volume"),
+            pl.col("keyword").head(5).str.join(" | ").alias("top_contested"),
+        )
+    )
+    clusters = (
+        pages.group_by("root", maintain_order=True)
+        .agg(
+            pl.len().alias("urls"),
+            pl.sum("traffic").alias("cluster_traffic"),
+            pl.first(COL_URL).alias("dominant_url"),
+            pl.first("service").alias("service"),
+            pl.col(COL_URL).str.join(" | ").alias("all_urls"),
+        )
+        .join(contested, on="root", how="left")
+        .sort(["service", "contested_traffic", "contested_volume", "root"], descending=[False, True, True, False])
+        .with_columns(pl.int_range(1, pl.len() + 1).over("service").alias("rank"))
+        .with_columns(pl.int_range(pl.len()).alias("cluster_id"))
+    )
+    return clusters.select(
+        "service",
+        "rank",
+        "cluster_id",
+        "urls",
+        "contested_keywords",
+        "contested_traffic",
+        "contested_volume",
+        "cluster_traffic",
+        "dominant_url",
+        "top_contested",
+        "all_urls",
+    )
+
+
+def cannibalization_reports(df: pl.DataFrame, key: str = COL_KEYWORD) -> dict[str, pl.DataFrame]:
+    """All cannibalization tables from one pass over the keyword → URL edges."""
+    edges, urls = _graph(df, key)
+    pairs = _score_pairs(_pair_overlap(edges, 20), urls)
+    return {
+        "cannibalized_keywords": _cannibalized(edges),
+        "cannibalization_pairs": _sort_pairs(pairs.select(_PAIR_COLUMNS)),
+        "cannibalization_clusters": _clusters(edges, urls, pairs, 1, 0.0),
+    }
@@ -0,0 +1,146 @@
+"""Keyword variant canonicalization.
+
+"web design company", "web design companies" and "company web design" share
+one signature: lowercase, punctuation stripped, light plural folding, tokens
+de-duplicated and sorted. The signature is hashed to a `canonical_id`.
+
+Signatures are computed once per distinct keyword and joined back, and the
+collapsed views aggregate per canonical group, so downstream work shrinks by
+the duplication factor.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import polars as pl
+
+from .analysis import (
+    COL_CPC,
+    COL_INTENTS,
+    COL_KD,
+    COL_KEYWORD,
+    COL_POS,
+    COL_SERP_FEATS,
+    COL_TRAFFIC,
+    COL_TRAFFIC_COST,
+    COL_URL,
+    COL_VOLUME,
+    _wsum,
+    quick_wins,
+    top_keywords_by_traffic,
+)
+
+if TYPE_CHECKING:
+    from .search_console import CtrCurve
+
+
+CANONICAL_ID = "canonical_id"
+_HASH_SEED = 0xCA11
+
+
+def fold_plural(token: pl.Expr) -> pl.Expr:
+    """Light plural folding: companies→company, boxes→box, services→service.
+
+    Words ending in -ss, -us or -is are left alone, as are very short words.
+    """
+    return (
+        token.str.replace(r"^(\w{2,})ies$", "${1}y")
+        .str.replace(r"^(\w{2,}(?:ss|sh|ch|x|z))es$", "${1}")
+        .str.replace(r"^(\w{2,}[^sui])s$", "${1}")
+    )
+
+
+def keyword_signature(keyword: pl.Expr) -> pl.Expr:
+    """Sorted, de-duplicated, plural-folded tokens joined by single spaces."""
+    return (
+        keyword.str.to_lowercase()
+        .str.extract_all(r"\w+")
+        .list.eval(fold_plural(pl.element()))
+        .list.unique()
+        .list.sort()
+        .list.join(" ")
+    )
+
+
+def canonical_keywords(df: pl.DataFrame) -> pl.DataFrame:
+    """One row per distinct keyword: Keyword, signature, canonical_id."""
+    signature = keyword_signature(pl.col(COL_KEYWORD))
+    return df.select(pl.col(COL_KEYWORD).drop_nulls().unique()).with_columns(
+        signature.alias("signature"),
+        signature.hash(_HASH_SEED).alias(CANONICAL_ID),
+    )
+
+
+def with_canonical(df: pl.DataFrame) -> pl.DataFrame:
+    """Add `canonical_id` to a positions frame."""
+    if CANONICAL_ID in df.columns:
+        return df
+    ids = canonical_keywords(df).select(COL_KEYWORD, CANONICAL_ID)
+    return df.join(ids, on=COL_KEYWORD, how="left")
+
+
+def collapse_variants(df: pl.DataFrame) -> pl.DataFrame:
+    """Roll keyword variants up to one row per canonical group.
+
+    Keyword is the highest-volume variant; Search Volume sums each variant
+    once; Position, URL, service, Keyword Intents and SERP Features come
+    from the best-ranking row; Keyword Difficulty is the easiest variant's;
+    Traffic and Traffic Cost are summed. The output keeps the report column
+    names, so `top_keywords_by_traffic` / `quick_wins` run on it unchanged
+    and score it with the same factors as the uncollapsed rows.
+    """
+    df = with_canonical(df)
+    variants = (
+        df.group_by([CANONICAL_ID, COL_KEYWORD])
+        .agg(pl.max(COL_VOLUME).alias("_volume"))
+        .sort([CANONICAL_ID, "_volume", COL_KEYWORD], descending=[False, True, False], nulls_last=True)
+        .group_by(CANONICAL_ID, maintain_order=True)
+        .agg(
+            pl.first(COL_KEYWORD).alias(COL_KEYWORD),
+            pl.len().alias("variants"),
+            pl.col(COL_KEYWORD).str.join(" | ").alias("variant_keywords"),
+            pl.sum("_volume").alias(COL_VOLUME),
+        )
+    )
+    best = (
+        df.sort([CANONICAL_ID, COL_POS, COL_TRAFFIC, COL_URL], descending=[False, False, True, False], nulls_last=True)
+        .group_by(CANONICAL_ID, maintain_order=True)
+        .agg(
+            pl.first(COL_POS).alias(COL_POS),
+            pl.first(COL_URL).alias(COL_URL),
+            pl.first("service").alias("service"),
+            pl.first(COL_INTENTS).alias(COL_INTENTS),
+            pl.first(COL_SERP_FEATS).alias(COL_SERP_FEATS),
+            pl.min(COL_KD).alias(COL_KD),
+            pl.max(COL_CPC).alias(COL_CPC),
+            _wsum(df, COL_TRAFFIC).alias(COL_TRAFFIC),
+            _wsum(df, COL_TRAFFIC_COST).alias(COL_TRAFFIC_COST),
+            pl.col(COL_URL).n_unique().alias("urls"),
+        )
+    )
+    return variants.join(best, on=CANONICAL_ID, how="left").select(
+        CANONICAL_ID,
+        COL_KEYWORD,
+        "variants",
+        COL_VOLUME,
+        COL_KD,
+        COL_CPC,
+        COL_POS,
+        COL_TRAFFIC,
+        COL_TRAFFIC_COST,
+        COL_URL,
+        "service",
+        "urls",
+        COL_INTENTS,
+        COL_SERP_FEATS,
+        "variant_keywords",
+    )
+
+
+def top_keywords_collapsed(df: pl.DataFrame, n: int = 50) -> pl.DataFrame:
+    return top_keywords_by_traffic(collapse_variants(df), n)
+
+
+def quick_wins_collapsed(df: pl.DataFrame, n: int = 100, ctr_curve: CtrCurve | None = None) -> pl.DataFrame:
+    """Quick wins per canonical group; a group qualifies by its best position."""
+    return quick_wins(collapse_variants(df), n, ctr_curve=ctr_curve)
@@ -5,6 +5,7 @@ from typing import Dict
 
 import polars as pl
 import json
+import math
 import zlib
 from zlib import crc32
 
@@ -89,12 +90,50 @@ def _plot_bar(df: pl.DataFrame, x: str, y: str, title: str, path: Path) -> None:
     plt.close(fig)
 
 
+def _heat_levels(values: list[list[float]]) -> list[list[float]]:
+    # Log-scaled 0..1 intensities so off-diagonal cells stay visible next to the diagonal
+    vmax = max((v for row in values for v in row), default=0.0)
+    top = math.log1p(vmax) or 1.0
+    return [[math.log1p(max(0.0, v)) / top for v in row] for row in values]
+
+
+def _plot_heatmap(matrix: pl.DataFrame, index: str, title: str, path: Path) -> None:
+    rows = [str(v) for v in matrix[index].to_list()]
+    cols = [c for c in matrix.columns if c != index]
+    values = [[float(v or 0.0) for v in r] for r in matrix.select(cols).iter_rows()]
+    plt = _try_import_mpl()
+    if plt is None:
+        _simple_heatmap_png(rows, cols, values, path)
+        _save_chart_data(matrix, path.with_suffix(".csv"))
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig, ax = plt.subplots(figsize=(8, 5))
+    levels = _heat_levels(values)
+    ax.imshow(levels, cmap="Blues", vmin=0.0, vmax=1.0, aspect="auto")
+    ax.set_xticks(range(len(cols)), labels=cols)
+    ax.set_yticks(range(len(rows)), labels=rows)
+    ax.set_xlabel("current position")
+    ax.set_ylabel("previous position")
+    ax.set_title(title)
+    for i, row in enumerate(values):
+        for j, v in enumerate(row):
+            ax.text(
+                j, i, _fmt_value(v), ha="center", va="center", fontsize=9,
+                color="white" if levels[i][j] > 0.6 else "#111827",
+            )
+    fig.tight_layout()
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+
+
 def generate_all_charts(
     base_dir: Path,
     by_bucket: pl.DataFrame,
     intent: pl.DataFrame,
     categories: pl.DataFrame,
     services: pl.DataFrame,
+    transitions: pl.DataFrame | None = None,
 ) -> Dict[str, Path]:
     charts_dir = Path(base_dir) / "charts"
     charts_dir.mkdir(parents=True, exist_ok=True)
@@ -120,13 +159,21 @@ def generate_all_charts(
     svc_png = charts_dir / "services.png"
     _plot_bar(svc_df, "service", "traffic", "Traffic by Service (Top 12)", svc_png)
 
-    return {
+    out = {
         "position_buckets": buckets_png,
         "intent_mix": intent_png,
         "categories": cats_png,
         "services": svc_png,
     }
 
+    # Previous → current position bucket transitions (matrix from transitions.py)
+    if transitions is not None:
+        trans_png = charts_dir / "position_transitions.png"
+        _plot_heatmap(transitions, "from_bucket", "Position Bucket Transitions (keywords)", trans_png)
+        out["position_transitions"] = trans_png
+
+    return out
+
 
 def generate_vega_specs(
     base_dir: Path,
@@ -134,6 +181,7 @@ def generate_vega_specs(
     intent: pl.DataFrame,
     categories: pl.DataFrame,
     services: pl.DataFrame,
+    transitions: pl.DataFrame | None = None,
 ) -> Dict[str, Path]:
     vega_dir = Path(base_dir) / "charts" / "vega"
     vega_dir.mkdir(parents=True, exist_ok=True)
@@ -201,6 +249,32 @@ def generate_vega_specs(
         "traffic",
         "Traffic by Service (Top 12)",
     )
+    if transitions is not None:
+        cells = transitions.unpivot(index="from_bucket", variable_name="to_bucket", value_name="keywords")
+        spec = {
+            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+            "description": "Position Bucket Transitions (keywords)",
+            "data": {"values": cells.to_dicts()},
+            "encoding": {
+                "x": {"field": "to_bucket", "type": "ordinal", "sort": None, "title": "current position"},
+                "y": {"field": "from_bucket", "type": "ordinal", "sort": None, "title": "previous position"},
+            },
+            "layer": [
+                {
+                    "mark": {"type": "rect", "tooltip": True},
+                    "encoding": {
+                        "color": {"field": "keywords", "type": "quantitative", "scale": {"type": "symlog"}}
+                    },
+                },
+                {
+                    "mark": {"type": "text"},
+                    "encoding": {"text": {"field": "keywords", "type": "quantitative", "format": ",.0f"}},
+                },
+            ],
+            "title": "Position Bucket Transitions (keywords)",
+        }
+        out["position_transitions"] = vega_dir / "position_transitions.json"
+        out["position_transitions"].write_text(json.dumps(spec, indent=2), encoding="utf-8")
     return out
 
 
@@ -246,6 +320,39 @@ def _simple_bar_png(labels: list[str], values: list[float], path: Path, color=(5
     _write_png(path, img)
 
 
+def _simple_heatmap_png(rows: list[str], cols: list[str], values: list[list[float]], path: Path, color=(59, 130, 246)) -> None:
+    width, height = 800, 450
+    margin_left, margin_right, margin_top, margin_bottom = 80, 20, 40, 20
+    cell_w = (width - margin_left - margin_right) // max(1, len(cols))
+    cell_h = (height - margin_top - margin_bottom) // max(1, len(rows))
+
+    img = _new_img(width, height, (255, 255, 255))
+    for j, label in enumerate(cols):
+        x_center = margin_left + j * cell_w + cell_w // 2
+        _draw_text(img, x_center - _text_width(label, scale=2) // 2, margin_top - 22, label, color=(17, 24, 39), scale=2)
+    levels = _heat_levels(values)
+    for i, label in enumerate(rows):
+        y0 = margin_top + i * cell_h
+        _draw_text(img, margin_left - 8 - _text_width(label, scale=2), y0 + cell_h // 2 - 7, label, color=(17, 24, 39), scale=2)
+        for j, v in enumerate(values[i]):
+            t = levels[i][j]
+            fill = tuple(int(255 + (c - 255) * t) for c in color)
+            x0 = margin_left + j * cell_w
+            # 1px white gutter between cells
+            _draw_rect(img, x0, y0, x0 + cell_w - 1, y0 + cell_h - 1, fill)
+            text = _fmt_short(v)
+            _draw_text(
+                img,
+                x0 + (cell_w - _text_width(text, scale=2)) // 2,
+                y0 + cell_h // 2 - 7,
+                text,
+                color=(255, 255, 255) if t > 0.6 else (17, 24, 39),
+                scale=2,
+            )
+
+    _write_png(path, img)
+
+
 # --- Tiny 5x7 bitmap font for fallback labels --- #
 _FONT_5x7: Dict[str, list[str]] = {
     "0": [
@@ -304,7 +411,7 @@ _FONT_5x7: Dict[str, list[str]] = {
     ],
     "6": [
         " ### ",
-        "#   ",
+        "#    ",
         "#    ",
         "#### ",
         "#   #",
@@ -365,6 +472,51 @@ _FONT_5x7: Dict[str, list[str]] = {
         "#   #",
         "#   #",
     ],
+    "-": [
+        "     ",
+        "     ",
+        "     ",
+        "#####",
+        "     ",
+        "     ",
+        "     ",
+    ],
+    "+": [
+        "     ",
+        "  #  ",
+        "  #  ",
+        "#####",
+        "  #  ",
+        "  #  ",
+        "     ",
+    ],
+    "n": [
+        "     ",
+        "     ",
+        "#### ",
+        "#   #",
+        "#   #",
+        "#   #",
+        "#   #",
+    ],
+    "e": [
+        "     ",
+        "     ",
+        " ### ",
+        "#   #",
+        "#####",
+        "#    ",
+        " ### ",
+    ],
+    "w": [
+        "     ",
+        "     ",
+        "#   #",
+        "#   #",
+        "# # #",
+        "# # #",
+        " # # ",
+    ],
 }
 
 
@@ -421,13 +573,10 @@ def _draw_rect(img: list[bytearray], x0: int, y0: int, x1: int, y1: int, color=(
         x0, x1 = x1, x0
     if y0 > y1:
         y0, y1 = y1, y0
+    # One slice assignment per scanline instead of a write per pixel
+    fill = bytes((r, g, b)) * (x1 - x0)
     for y in range(y0, y1):
-        row = img[y]
-        for x in range(x0, x1):
-            idx = x * 3
-            row[idx] = r
-            row[idx + 1] = g
-            row[idx + 2] = b
+        img[y][x0 * 3 : x1 * 3] = fill
 
 
 def _write_png(path: Path, img: list[bytearray]) -> None:
@@ -0,0 +1,239 @@
+"""Keyword coverage of page titles, H1s, meta descriptions and H2s.
+
+For each URL, its top-traffic ranking keywords are checked against the
+page's own on-page text. Keywords and page text go through the same
+normalization as keyword_service.py (lowercase word tokens, light plural
+folding, space-padded), so a keyword is covered by a field when it occurs
+there as a whole-word phrase.
+
+Matching uses one global automaton: every URL's top keywords are the
+patterns of a single overlapping Aho–Corasick pass (`str.extract_many`)
+over all page fields stacked into one (URL, field, text) column. Matches are
+then semi-joined on (URL, keyword), so a page only gets credit for its own
+keywords. Token-level coverage (how many of a keyword's content words appear
+in title + H1) is a join of exploded token sets.
+
+Outputs are inputs to the title/header A/B tests: per-URL coverage scores,
+and the uncovered keywords and missing terms ranked by value (volume × CPC).
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import polars as pl
+
+from .analysis import COL_CPC, COL_KEYWORD, COL_POS, COL_TRAFFIC, COL_URL, COL_VOLUME, _wsum
+from .keyword_service import normalize_text
+from .paths import normalize_url
+
+
+FIELDS = ("title", "h1", "meta_description", "h2")
+TOP_N = 20
+_STOPWORDS = frozenset(
+    "a an and are at best by can do for from how i in is it me my near of on or the to top vs what who why with".split()
+)
+
+
+def pages_from_mirror(root: str | Path, scheme: str = "https") -> pl.DataFrame:
+    """Page table from a local HTML mirror laid out as `<root>/<host>/<path>[/index.html]`."""
+    from .crawler import parse_page
+
+    root = Path(root)
+    rows = []
+    for path in sorted(p for p in root.rglob("*") if p.suffix.lower() in (".html", ".htm")):
+        rel = path.relative_to(root).as_posix()
+        if path.stem == "index":
+            rel = rel.rsplit("/", 1)[0] if "/" in rel else ""
+        url = f"{scheme}://{rel}"
+        page = parse_page(path.read_text(encoding="utf-8", errors="replace"), url)
+        rows.append({COL_URL: url, **{f: page[f] for f in FIELDS}})
+    schema = {COL_URL: pl.Utf8, "title": pl.Utf8, "h1": pl.Utf8, "meta_description": pl.Utf8, "h2": pl.List(pl.Utf8)}
+    return pl.DataFrame(rows, schema=schema)
+
+
+def load_pages(path: str | Path) -> pl.DataFrame:
+    """Page table from a crawl file (pages.csv) or a local HTML mirror directory."""
+    path = Path(path)
+    if path.is_dir():
+        return pages_from_mirror(path)
+    return pl.read_csv(path, infer_schema_length=0)
+
+
+def _page_fields(pages: pl.DataFrame) -> pl.DataFrame:
+    """(_url, field, text) with each field normalized; H2s are padded one by one so phrases never span two."""
+    present = [f for f in FIELDS if f in pages.columns]
+    if "h2" in present and pages.schema["h2"] != pl.List(pl.Utf8):
+        pages = pages.with_columns(pl.col("h2").str.split(" | "))
+    return (
+        pages.select(
+            normalize_url(pl.col(COL_URL)).alias("_url"),
+            *[
+                (
+                    pl.col(f).list.eval(normalize_text(pl.element())).list.join("")
+                    if f == "h2"
+                    else normalize_text(pl.col(f))
+                ).alias(f)
+                for f in present
+            ],
+        )
+        .unique("_url", keep="first", maintain_order=True)
+        .unpivot(index="_url", on=present, variable_name="field", value_name="text")
+        .drop_nulls("text")
+    )
+
+
+def _content_tokens(normalized: pl.Expr) -> pl.Expr:
+    return normalized.str.strip_chars().str.split(" ").list.eval(
+        pl.element().filter((pl.element() != "") & ~pl.element().is_in(list(_STOPWORDS)))
+    ).list.unique()
+
+
+def _heading_tokens(text: pl.DataFrame) -> pl.DataFrame:
+    """Distinct (_url, token) over each page's title and H1."""
+    return (
+        text.filter(pl.col("field").is_in(["title", "h1"]))
+        .select("_url", pl.col("text").str.strip_chars().str.split(" ").alias("token"))
+        .explode("token")
+        .unique()
+    )
+
+
+def top_url_keywords(df: pl.DataFrame, top_n: int = TOP_N) -> pl.DataFrame:
+    """Each URL's `top_n` keywords by traffic (one row per URL × keyword)."""
+    return (
+        df.filter(pl.col(COL_URL).is_not_null() & pl.col(COL_KEYWORD).is_not_null())
+        .group_by(COL_URL, COL_KEYWORD)
+        .agg(
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
+            pl.min(COL_POS).alias("position"),
+            pl.max(COL_VOLUME).alias("volume"),
+            (pl.col(COL_VOLUME) * pl.col(COL_CPC).fill_null(0.0)).max().fill_null(0.0).alias("value"),
+        )
+        .sort([COL_URL, "traffic", "value", COL_KEYWORD], descending=[False, True, True, False])
+        .with_columns(pl.int_range(pl.len()).over(COL_URL).alias("rank"))
+        .filter(pl.col("rank") < top_n)
+        .with_columns(
+            normalize_url(pl.col(COL_URL)).alias("_url"),
+            normalize_text(pl.col(COL_KEYWORD)).alias("_kw"),
+        )
+    )
+
+
+def keyword_coverage(df: pl.DataFrame, pages: pl.DataFrame, top_n: int = TOP_N) -> pl.DataFrame:
+    """One row per (URL, top keyword) on a known page, with `in_<field>` flags and `term_share`.
+
+    `term_share` is the fraction of the keyword's content words found in
+    title or H1 (1.0 when it has none).
+    """
+    text = _page_fields(pages)
+    kws = top_url_keywords(df, top_n).join(text.select("_url").unique(), on="_url", how="semi")
+    text = text.join(kws.select("_url").unique(), on="_url", how="semi")
+
+    # One automaton over every URL's keywords; keep only hits on the URL's own keywords
+    hits = (
+        text.select("_url", "field", pl.col("text").str.extract_many(kws["_kw"].unique().to_list(), overlapping=True))
+        .explode("text")
+        .drop_nulls("text")
+        .unique()
+        .rename({"text": "_kw"})
+        .join(kws.select("_url", "_kw"), on=["_url", "_kw"], how="semi")
+        .group_by("_url", "_kw")
+        .agg(*[(pl.col("field") == f).any().alias(f"in_{f}") for f in FIELDS])
+    ) if kws.height else pl.DataFrame(schema={"_url": pl.Utf8, "_kw": pl.Utf8, **{f"in_{f}": pl.Boolean for f in FIELDS}})
+
+    term_share = (
+        kws.select("_url", "_kw", _content_tokens(pl.col("_kw")).alias("token"))
+        .explode("token")
+        .drop_nulls("token")
+        .join(_heading_tokens(text).with_columns(pl.lit(True).alias("_in")), on=["_url", "token"], how="left")
+        .group_by("_url", "_kw")
+        .agg(pl.col("_in").fill_null(False).mean().alias("term_share"))
+    )
+    return (
+        kws.join(hits, on=["_url", "_kw"], how="left")
+        .join(term_share, on=["_url", "_kw"], how="left")
+        .with_columns(pl.col(f"in_{f}").fill_null(False) for f in FIELDS)
+        .with_columns(
+            (pl.col("in_title") | pl.col("in_h1")).alias("in_title_or_h1"),
+            pl.col("term_share").fill_null(1.0),
+        )
+        .select(
+            COL_URL,
+            COL_KEYWORD,
+            "rank",
+            "traffic",
+            "position",
+            "volume",
+            "value",
+            *[f"in_{f}" for f in FIELDS],
+            "in_title_or_h1",
+            "term_share",
+        )
+        .sort([COL_URL, "rank"])
+    )
+
+
+def url_coverage(coverage: pl.DataFrame, n_missing: int = 5) -> pl.DataFrame:
+    """Per-URL traffic-weighted coverage by field, plus the top uncovered keywords by value."""
+    def share(flag: str) -> pl.Expr:
+        return (
+            pl.when(pl.col("traffic").sum() > 0)
+            .then((pl.col("traffic") * pl.col(flag)).sum() / pl.col("traffic").sum())
+            .otherwise(pl.col(flag).mean())
+            .alias(flag.removeprefix("in_") + "_coverage")
+        )
+
+    missing = (
+        pl.col(COL_KEYWORD)
+        .sort_by("value", descending=True)
+        .filter(~pl.col("in_title_or_h1").sort_by("value", descending=True))
+        .head(n_missing)
+        .str.join("; ")
+        .alias("missing_keywords")
+    )
+    return (
+        coverage.group_by(COL_URL)
+        .agg(
+            pl.len().alias("keywords"),
+            pl.sum("traffic").alias("traffic"),
+            *[share(f"in_{f}") for f in FIELDS],
+            share("in_title_or_h1"),
+            (pl.col("traffic") * pl.col("term_share")).sum().truediv(pl.col("traffic").sum()).alias("term_coverage"),
+            pl.col("value").filter(~pl.col("in_title_or_h1")).sum().alias("missing_value"),
+            missing,
+        )
+        .with_columns(pl.col("term_coverage").fill_nan(None))
+        .sort(["missing_value", "traffic", COL_URL], descending=[True, True, False])
+    )
+
+
+def missing_terms(coverage: pl.DataFrame, pages: pl.DataFrame, top: int = 10) -> pl.DataFrame:
+    """Content words of each URL's top keywords that are absent from its title and H1, ranked by value."""
+    return (
+        coverage.select(
+            COL_URL,
+            normalize_url(pl.col(COL_URL)).alias("_url"),
+            _content_tokens(normalize_text(pl.col(COL_KEYWORD))).alias("term"),
+            "traffic",
+            "value",
+        )
+        .explode("term")
+        .drop_nulls("term")
+        .join(_heading_tokens(_page_fields(pages)).rename({"token": "term"}), on=["_url", "term"], how="anti")
+        .group_by(COL_URL, "term")
+        .agg(pl.len().alias("keywords"), pl.sum("traffic").alias("traffic"), pl.sum("value").alias("value"))
+        .sort([COL_URL, "value", "traffic", "term"], descending=[False, True, True, False])
+        .with_columns(pl.int_range(pl.len()).over(COL_URL).alias("_rank"))
+        .filter(pl.col("_rank") < top)
+        .drop("_rank")
+    )
+
+
+def coverage_reports(df: pl.DataFrame, pages: pl.DataFrame, top_n: int = TOP_N) -> dict[str, pl.DataFrame]:
+    """`keyword_coverage`, `url_coverage` and `missing_terms` tables."""
+    coverage = keyword_coverage(df, pages, top_n)
+    return {
+        "keyword_coverage": coverage,
+        "url_coverage": url_coverage(coverage),
+        "missing_terms": missing_terms(coverage, pages),
+    }
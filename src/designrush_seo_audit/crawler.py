@@ -0,0 +1,488 @@
+"""Asynchronous on-page crawler for the ranking URLs.
+
+Fetches every unique URL with a small HTTP/1.1 client on asyncio streams
+(standard library only) and extracts the on-page elements our title/H1 and
+internal-linking recommendations talk about:
+
+- keep-alive connection pool per host, a global concurrency bound
+  (`concurrency` workers) and a per-host bound on open connections
+  (`per_host`) plus a per-host request rate (`rate`, requests/second)
+- retries with exponential backoff and jitter on network errors, timeouts,
+  429 and 5xx (a numeric `Retry-After` is honoured); redirects are followed
+- an on-disk response cache under `artifacts/cache/crawl/`: cached URLs are
+  re-fetched with `If-None-Match` / `If-Modified-Since` (sent to the final
+  URL of the cached redirect chain), and a 304 reuses the cached body
+- `html.parser` extraction of title, meta description, H1 (first + count),
+  H2s, canonical and same-host links
+
+`crawl` returns one row per URL (the page table); `join_pages` adds it to
+the keyword frame and `link_edges` turns it into the source,target edges
+that link_equity.py takes.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import json
+import random
+import ssl
+import time
+import zlib
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Iterable
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+import polars as pl
+
+from .analysis import COL_URL
+from .paths import normalize_url
+
+
+CACHE_DIR = Path("artifacts") / "cache" / "crawl"
+USER_AGENT = "designrush-seo-audit/0.1 (+on-page crawler)"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+REDIRECT_STATUS = {301, 302, 303, 307, 308}
+MAX_RETRY_AFTER = 60.0
+
+PAGE_SCHEMA = {
+    COL_URL: pl.Utf8,
+    "final_url": pl.Utf8,
+    "status": pl.Int32,
+    "content_type": pl.Utf8,
+    "title": pl.Utf8,
+    "meta_description": pl.Utf8,
+    "h1": pl.Utf8,
+    "h1_count": pl.UInt32,
+    "h2": pl.List(pl.Utf8),
+    "canonical": pl.Utf8,
+    "internal_links": pl.List(pl.Utf8),
+    "n_internal_links": pl.UInt32,
+    "from_cache": pl.Boolean,
+    "fetch_ms": pl.Float64,
+    "error": pl.Utf8,
+}
+
+
+@dataclass
+class CrawlConfig:
+    concurrency: int = 100
+    per_host: int = 16
+    rate: float = 20.0  # requests/second per host; 0 = unlimited
+    timeout: float = 20.0
+    retries: int = 3
+    backoff: float = 0.5
+    max_redirects: int = 5
+    max_bytes: int = 5_000_000
+    user_agent: str = USER_AGENT
+    cache_dir: Path | None = CACHE_DIR
+
+
+@dataclass
+class Response:
+    url: str
+    status: int
+    headers: dict[str, str]
+    body: bytes
+    from_cache: bool = False
+
+
+class ResponseCache:
+    """One `<sha1>.json` (status, validators, headers) + `<sha1>.body.gz` per URL."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        d = self.root / key[:2]
+        return d / f"{key}.json", d / f"{key}.body.gz"
+
+    def get(self, url: str) -> Response | None:
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = gzip.decompress(body_path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        return Response(meta["url"], meta["status"], meta["headers"], body, from_cache=True)
+
+    def put(self, url: str, resp: Response) -> None:
+        meta_path, body_path = self._paths(url)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        for path, data in (
+            (body_path, gzip.compress(resp.body, compresslevel=1)),
+            (meta_path, json.dumps({"url": resp.url, "status": resp.status, "headers": resp.headers}).encode("utf-8")),
+        ):
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+
+
+class _StaleConnection(Exception):
+    """A pooled keep-alive connection was closed by the server before replying."""
+
+
+class _HostPool:
+    """Idle keep-alive connections, an open-connection bound and a request pacer for one origin."""
+
+    def __init__(self, scheme: str, host: str, port: int, limit: int, rate: float):
+        self.scheme, self.host, self.port = scheme, host, port
+        self.slots = asyncio.Semaphore(limit)
+        self.idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def pace(self) -> None:
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        at = max(now, self._next)
+        self._next = at + self.interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+    async def connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        ctx = ssl.create_default_context() if self.scheme == "https" else None
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=ctx, limit=1 << 18)
+        return reader, writer, False
+
+    def release(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, keep: bool) -> None:
+        if keep and not writer.is_closing():
+            self.idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self) -> None:
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+def _decode_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+async def _read_response(reader: asyncio.StreamReader, max_bytes: int) -> tuple[int, dict[str, str], bytes, bool]:
+    """Read one HTTP/1.1 response: (status, lower-cased headers, body, connection reusable)."""
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    version, status = head[0].split(" ", 2)[:2]
+    headers: dict[str, str] = {}
+    for line in head[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            k = k.strip().lower()
+            headers[k] = f"{headers[k]}, {v.strip()}" if k in headers else v.strip()
+    status_code = int(status)
+    keep = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    if status_code in (204, 304) or status_code < 200:
+        body = b""
+    elif "chunked" in headers.get("transfer-encoding", "").lower():
+        chunks, size_total = [], 0
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                while (await reader.readuntil(b"\r\n")) != b"\r\n":
+                    pass
+                break
+            chunks.append((await reader.readexactly(size + 2))[:-2])
+            size_total += size
+            if size_total > max_bytes:
+                keep = False
+                break
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        n = int(headers["content-length"])
+        body = await reader.readexactly(min(n, max_bytes))
+        keep = keep and n <= max_bytes
+    else:
+        # Delimited by the connection closing: read to EOF
+        chunks, size_total = [], 0
+        while size_total < max_bytes and (chunk := await reader.read(max_bytes - size_total)):
+            chunks.append(chunk)
+            size_total += len(chunk)
+        body = b"".join(chunks)
+        keep = False
+    return status_code, headers, _decode_body(body, headers.get("content-encoding", "").lower()), keep
+
+
+class Crawler:
+    """Pooled, rate-limited, retrying GET client with a conditional-request cache."""
+
+    def __init__(self, config: CrawlConfig | None = None):
+        self.config = config or CrawlConfig()
+        self.cache = ResponseCache(self.config.cache_dir) if self.config.cache_dir else None
+        self._pools: dict[tuple[str, str, int], _HostPool] = {}
+
+    def _pool(self, url: str) -> _HostPool:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        if key not in self._pools:
+            self._pools[key] = _HostPool(*key, limit=self.config.per_host, rate=self.config.rate)
+        return self._pools[key]
+
+    async def _exchange(self, url: str, headers: dict[str, str]) -> Response:
+        pool = self._pool(url)
+        parts = urlsplit(url)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        host = parts.netloc.rsplit("@", 1)[-1]
+        lines = [
+            f"GET {target} HTTP/1.1",
+            f"Host: {host}",
+            f"User-Agent: {self.config.user_agent}",
+            "Accept: text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+            "Accept-Encoding: gzip, deflate",
+            "Connection: keep-alive",
+            *(f"{k}: {v}" for k, v in headers.items()),
+        ]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        await pool.pace()
+        async with pool.slots, asyncio.timeout(self.config.timeout):
+            reader, writer, reused = await pool.connect()
+            keep = False
+            try:
+                writer.write(request)
+                await writer.drain()
+                try:
+                    status, resp_headers, body, keep = await _read_response(reader, self.config.max_bytes)
+                except (asyncio.IncompleteReadError, ConnectionResetError) as e:
+                    if reused and not getattr(e, "partial", b""):
+                        raise _StaleConnection from e
+                    raise
+            finally:
+                pool.release(reader, writer, keep)
+        return Response(url, status, resp_headers, body)
+
+    async def _get_once(self, url: str, headers: dict[str, str]) -> Response:
+        try:
+            return await self._exchange(url, headers)
+        except _StaleConnection:
+            return await self._exchange(url, headers)
+
+    async def get(self, url: str) -> Response:
+        """GET with redirects, retries and cache revalidation. Network failures raise after the last retry."""
+        cached = self.cache.get(url) if self.cache else None
+        conditional: dict[str, str] = {}
+        if cached is not None:
+            if "etag" in cached.headers:
+                conditional["If-None-Match"] = cached.headers["etag"]
+            if "last-modified" in cached.headers:
+                conditional["If-Modified-Since"] = cached.headers["last-modified"]
+
+        current = url
+        for _ in range(self.config.max_redirects + 1):
+            self._pool(current)  # unsupported URLs fail here, without retries
+            # The validators belong to the page the cached body came from: the final hop
+            final_hop = cached is not None and current == cached.url
+            resp = await self._get_with_retries(current, conditional if final_hop else {})
+            if resp.status in REDIRECT_STATUS and "location" in resp.headers:
+                current = urljoin(current, resp.headers["location"])
+                continue
+            break
+        resp.url = current
+        if resp.status == 304 and cached is not None:
+            return cached
+        if self.cache and resp.status == 200:
+            self.cache.put(url, resp)
+        return resp
+
+    async def _get_with_retries(self, url: str, headers: dict[str, str]) -> Response:
+        cfg = self.config
+        for attempt in range(cfg.retries + 1):
+            delay = cfg.backoff * 2**attempt * (0.5 + random.random())
+            try:
+                resp = await self._get_once(url, headers)
+            except (OSError, TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                if attempt == cfg.retries:
+                    raise
+            else:
+                if resp.status not in RETRY_STATUS or attempt == cfg.retries:
+                    return resp
+                retry_after = resp.headers.get("retry-after", "")
+                if retry_after.isdigit():
+                    delay = min(float(retry_after), MAX_RETRY_AFTER)
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def close(self) -> None:
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+
+
+class _PageParser(HTMLParser):
+    """Collects title, meta description, H1/H2 text, canonical and hrefs."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title: str | None = None
+        self.meta_description: str | None = None
+        self.h1: list[str] = []
+        self.h2: list[str] = []
+        self.canonical: str | None = None
+        self.base: str | None = None
+        self.hrefs: list[str] = []
+        self._capture: str | None = None
+        self._text: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in ("title", "h1", "h2") and self._capture is None:
+            self._capture, self._text = tag, []
+            return
+        a = {k: v for k, v in attrs if v is not None}
+        if tag == "a" and "href" in a:
+            self.hrefs.append(a["href"])
+        elif tag == "meta" and a.get("name", "").lower() == "description" and self.meta_description is None:
+            self.meta_description = " ".join(a.get("content", "").split())
+        elif tag == "link" and "canonical" in a.get("rel", "").lower().split() and self.canonical is None:
+            self.canonical = a.get("href")
+        elif tag == "base" and "href" in a and self.base is None:
+            self.base = a["href"]
+
+    def handle_data(self, data: str) -> None:
+        if self._capture is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag != self._capture:
+            return
+        text = " ".join("".join(self._text).split())
+        if tag == "title":
+            if self.title is None:
+                self.title = text
+        else:
+            getattr(self, tag).append(text)
+        self._capture = None
+
+
+def _same_site(a: str, b: str) -> bool:
+    return a.lower().removeprefix("www.") == b.lower().removeprefix("www.")
+
+
+def parse_page(html: str, url: str) -> dict:
+    """On-page fields for one HTML document fetched from `url`."""
+    parser = _PageParser()
+    parser.feed(html)
+    parser.close()
+    base = urljoin(url, parser.base) if parser.base else url
+    host = urlsplit(url).hostname or ""
+    links: dict[str, None] = {}
+    for href in parser.hrefs:
+        target = urldefrag(urljoin(base, href.strip()))[0]
+        parts = urlsplit(target)
+        if parts.scheme in ("http", "https") and _same_site(parts.hostname or "", host) and target != url:
+            links[target] = None
+    return {
+        "title": parser.title,
+        "meta_description": parser.meta_description,
+        "h1": parser.h1[0] if parser.h1 else None,
+        "h1_count": len(parser.h1),
+        "h2": parser.h2,
+        "canonical": urljoin(base, parser.canonical) if parser.canonical else None,
+        "internal_links": list(links),
+        "n_internal_links": len(links),
+    }
+
+
+def _charset(content_type: str) -> str:
+    for part in content_type.split(";")[1:]:
+        k, _, v = part.strip().partition("=")
+        if k.lower() == "charset" and v:
+            return v.strip("\"'")
+    return "utf-8"
+
+
+async def crawl_async(
+    urls: Iterable[str],
+    config: CrawlConfig | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> list[dict]:
+    """Page records for the unique `urls`, fetched by `config.concurrency` workers."""
+    crawler = Crawler(config)
+    todo = list(dict.fromkeys(u for u in urls if u))
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for u in todo:
+        queue.put_nowait(u)
+    records: list[dict] = []
+
+    async def worker() -> None:
+        while True:
+            try:
+                url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            rec: dict = {COL_URL: url, "from_cache": False}
+            try:
+                resp = await crawler.get(url)
+                content_type = resp.headers.get("content-type", "")
+                rec.update(final_url=resp.url, status=resp.status, content_type=content_type, from_cache=resp.from_cache)
+                if resp.status == 200 and "html" in content_type.lower():
+                    html = resp.body.decode(_charset(content_type), errors="replace")
+                    rec.update(parse_page(html, resp.url))
+            except Exception as e:  # noqa: BLE001 - one bad URL must not stop the crawl
+                rec["error"] = f"{type(e).__name__}: {e}"
+            rec["fetch_ms"] = (time.perf_counter() - start) * 1000
+            records.append(rec)
+            if progress:
+                progress(len(records), len(todo))
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, min(crawler.config.concurrency, len(todo))))))
+    finally:
+        crawler.close()
+    return records
+
+
+def crawl(
+    urls: Iterable[str],
+    config: CrawlConfig | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> pl.DataFrame:
+    """The page table: one row per unique URL (see `PAGE_SCHEMA`), in input order."""
+    urls = list(dict.fromkeys(u for u in urls if u))
+    records = asyncio.run(crawl_async(urls, config, progress))
+    order = {u: i for i, u in enumerate(urls)}
+    records.sort(key=lambda r: order[r[COL_URL]])
+    return pl.DataFrame(records, schema=PAGE_SCHEMA) if records else pl.DataFrame(schema=PAGE_SCHEMA)
+
+
+def join_pages(df: pl.DataFrame, pages: pl.DataFrame) -> pl.DataFrame:
+    """Add the page table's on-page columns to each keyword row (left join on URL, H2s flattened)."""
+    cols = [c for c in pages_for_csv(pages).columns if c not in ("fetch_ms", "from_cache") and c not in df.columns]
+    return df.join(pages_for_csv(pages).select(COL_URL, *cols), on=COL_URL, how="left", maintain_order="left")
+
+
+def link_edges(pages: pl.DataFrame) -> pl.DataFrame:
+    """(source, target) internal links, normalized like `load_link_edges`."""
+    return (
+        pages.select(pl.col("final_url").fill_null(pl.col(COL_URL)).alias("source"), pl.col("internal_links").alias("target"))
+        .explode("target")
+        .drop_nulls()
+        .select(normalize_url(pl.col("source")), normalize_url(pl.col("target")))
+        .filter(pl.col("source") != pl.col("target"))
+        .unique(maintain_order=True)
+    )
+
+
+def pages_for_csv(pages: pl.DataFrame) -> pl.DataFrame:
+    """Page table with list columns flattened for CSV (H2s joined with ' | ', links counted only)."""
+    return pages.with_columns(pl.col("h2").list.join(" | ")).drop("internal_links")
@@ -19,6 +19,7 @@ def write_deck(
     geo: Dict[str, pl.DataFrame] | None = None,
     forecast_summary: dict | None = None,
     forecast_by_service: pl.DataFrame | None = None,
+    transitions: pl.DataFrame | None = None,
 ) -> Path:
     deck_path = Path(base_dir) / "deck.md"
 
@@ -86,6 +87,42 @@ def write_deck(
         except Exception:
             pass
 
+        # Ranking Movement (previous → current bucket)
+        if transitions is not None:
+            f.write("## Ranking Movement\n")
+            f.write("- Keywords by previous (rows) and current (columns) position bucket:\n\n")
+            f.write(_img("position_transitions") + "\n\n")
+            try:
+                overall = (
+                    transitions.filter(pl.col("dimension") == "all")
+                    .group_by("movement")
+                    .agg(pl.sum("keywords"), pl.sum("share"))
+                )
+                moved = {m: (k, s) for m, k, s in overall.iter_rows()}
+                parts = [
+                    f"{label} {moved[m][0]:,.0f} (~{moved[m][1]:.1%})"
+                    for m, label in (("up", "moved up"), ("down", "dropped"), ("new", "new"))
+                    if m in moved
+                ]
+                if parts:
+                    f.write("- Bucket changes: " + ", ".join(parts) + ".\n")
+                drops = (
+                    transitions.filter((pl.col("dimension") == "service") & (pl.col("movement") == "down"))
+                    .group_by("segment")
+                    .agg(pl.sum("keywords"), pl.sum("traffic"))
+                    .sort(["keywords", "traffic", "segment"], descending=[True, True, False])
+                    .head(3)
+                )
+                if drops.height:
+                    names = [f"{svc} ({kw:,.0f})" for svc, kw, _ in drops.iter_rows()]
+                    f.write("- Most keywords dropping a bucket: " + ", ".join(names) + ".\n")
+            except Exception:
+                pass
+            f.write(
+                "- Why included: separates stable rankings from churn at the bucket edges.\n"
+                "- Story: the diagonal is the base to protect; drops out of top‑3/top‑10 are the first rescues, and new entries show where content is gaining.\n\n"
+            )
+
         # Intent Mix
         f.write("## Intent Mix\n")
         f.write(_img("intent_mix") + "\n")
@@ -0,0 +1,330 @@
+"""Durable, file-backed job queue for recurring audit runs.
+
+Each job is one `run_full_analysis` invocation. The queue is a single SQLite
+file, so any machine that can open it (local disk or a shared filesystem)
+can submit jobs or run workers; no external broker is needed.
+
+- Claims are atomic: a worker takes the oldest runnable job inside a
+  `BEGIN IMMEDIATE` transaction, so two workers never run the same job.
+- Running jobs heartbeat. A job whose worker stops heartbeating for longer
+  than the lease (crash, killed box) is re-queued and retried up to
+  `max_attempts`, then marked failed.
+- Jobs without an explicit output directory write to `artifacts/jobs/<id>/`,
+  so audits of exports with the same date never share a directory.
+- Finished jobs keep the per-stage timings reported by `run_full_analysis`.
+
+The rollback journal is used instead of WAL because WAL does not work on
+network filesystems.
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+
+DEFAULT_QUEUE_PATH = Path("artifacts") / "audit_queue.sqlite3"
+# Jobs submitted without an out_dir write to <DEFAULT_JOBS_DIR>/<job id>/, resolved at submit time
+DEFAULT_JOBS_DIR = Path("artifacts") / "jobs"
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    csv_path TEXT NOT NULL,
+    out_dir TEXT,
+    options TEXT NOT NULL DEFAULT '{}',
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker TEXT,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL,
+    result_dir TEXT,
+    timings TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state_idx ON jobs (state, id);
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    csv_path: str
+    out_dir: str | None
+    options: dict
+    state: str
+    attempts: int
+    max_attempts: int
+    worker: str | None
+    submitted_at: float
+    started_at: float | None
+    heartbeat_at: float | None
+    finished_at: float | None
+    result_dir: str | None
+    timings: dict[str, float] | None
+    error: str | None
+
+    @classmethod
+    def _from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row["id"],
+            csv_path=row["csv_path"],
+            out_dir=row["out_dir"],
+            options=json.loads(row["options"] or "{}"),
+            state=row["state"],
+            attempts=row["attempts"],
+            max_attempts=row["max_attempts"],
+            worker=row["worker"],
+            submitted_at=row["submitted_at"],
+            started_at=row["started_at"],
+            heartbeat_at=row["heartbeat_at"],
+            finished_at=row["finished_at"],
+            result_dir=row["result_dir"],
+            timings=json.loads(row["timings"]) if row["timings"] else None,
+            error=row["error"],
+        )
+
+
+def default_worker_id() -> str:
+    """Identify a worker as `<host>:<pid>` so claims are traceable across machines."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """SQLite-backed queue of `run_full_analysis` jobs.
+
+    `lease_seconds` is how long a running job may go without a heartbeat
+    before another worker is allowed to reclaim it.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_QUEUE_PATH, lease_seconds: float = 120.0) -> None:
+        self.path = Path(path)
+        self.lease_seconds = float(lease_seconds)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as con:
+            con.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; transactions are opened explicitly where needed
+        con = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def submit(
+        self,
+        csv_path: str | Path,
+        out_dir: str | Path | None = None,
+        max_attempts: int = 3,
+        **options: object,
+    ) -> int:
+        """Queue a job; `options` are passed through to `run_full_analysis`.
+
+        Paths are stored absolute, so workers started from any directory read
+        the same CSV and write to the same place.
+        """
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            cur = con.execute(
+                "INSERT INTO jobs (csv_path, out_dir, options, max_attempts, submitted_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    str(Path(csv_path).resolve()),
+                    str(Path(out_dir).resolve()) if out_dir is not None else None,
+                    json.dumps(options),
+                    int(max_attempts),
+                    time.time(),
+                ),
+            )
+            job_id = int(cur.lastrowid)
+            if out_dir is None:
+                con.execute(
+                    "UPDATE jobs SET out_dir = ? WHERE id = ?", (str((DEFAULT_JOBS_DIR / str(job_id)).resolve()), job_id)
+                )
+            con.execute("COMMIT")
+            return job_id
+        except BaseException:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def claim(self, worker: str) -> Job | None:
+        """Atomically claim the oldest runnable job, reclaiming expired leases first."""
+        now = time.time()
+        stale = now - self.lease_seconds
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            # Workers that stopped heartbeating: retry or give up
+            con.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, error = 'lease expired' "
+                "WHERE state = ? AND heartbeat_at < ? AND attempts >= max_attempts",
+                (FAILED, now, RUNNING, stale),
+            )
+            con.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, error = 'lease expired' "
+                "WHERE state = ? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, stale),
+            )
+            row = con.execute(
+                "SELECT id FROM jobs WHERE state = ? ORDER BY id LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                con.execute("COMMIT")
+                return None
+            con.execute(
+                "UPDATE jobs SET state = ?, worker = ?, attempts = attempts + 1, "
+                "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (RUNNING, worker, now, now, row["id"]),
+            )
+            job = con.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            con.execute("COMMIT")
+            return Job._from_row(job)
+        except BaseException:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """Extend the lease; returns False if the job was reclaimed by someone else."""
+        with closing(self._connect()) as con:
+            cur = con.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND state = ?",
+                (time.time(), job_id, worker, RUNNING),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id: int, worker: str, result_dir: str | Path, timings: dict[str, float] | None) -> bool:
+        """Mark the job done; returns False if the worker no longer holds it (lease expired)."""
+        with closing(self._connect()) as con:
+            cur = con.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, result_dir = ?, timings = ?, error = NULL "
+                "WHERE id = ? AND worker = ? AND state = ?",
+                (DONE, time.time(), str(result_dir), json.dumps(timings or {}), job_id, worker, RUNNING),
+            )
+            return cur.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str) -> bool:
+        """Record a failed attempt; the job is re-queued while attempts remain.
+
+        Returns False if the worker no longer holds the job (lease expired).
+        """
+        with closing(self._connect()) as con:
+            cur = con.execute(
+                "UPDATE jobs SET "
+                "state = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+                "finished_at = CASE WHEN attempts >= max_attempts THEN ? ELSE NULL END, "
+                "worker = CASE WHEN attempts >= max_attempts THEN worker ELSE NULL END, "
+                "error = ? WHERE id = ? AND worker = ? AND state = ?",
+                (FAILED, QUEUED, time.time(), error, job_id, worker, RUNNING),
+            )
+            return cur.rowcount == 1
+
+    def get(self, job_id: int) -> Job | None:
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job._from_row(row) if row is not None else None
+
+    def jobs(self, state: str | None = None) -> list[Job]:
+        with closing(self._connect()) as con:
+            if state is None:
+                rows = con.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+            else:
+                rows = con.execute("SELECT * FROM jobs WHERE state = ? ORDER BY id", (state,)).fetchall()
+        return [Job._from_row(r) for r in rows]
+
+    def counts(self) -> dict[str, int]:
+        with closing(self._connect()) as con:
+            rows = con.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        return {r["state"]: int(r["n"]) for r in rows}
+
+
+class _Heartbeat(threading.Thread):
+    """Background thread that keeps a claimed job's lease alive."""
+
+    def __init__(self, queue: JobQueue, job_id: int, worker: str, interval: float) -> None:
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job_id = job_id
+        self.worker = worker
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.job_id, self.worker):
+                    return
+            except sqlite3.Error:
+                # Transient lock contention; try again next tick
+                continue
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def _run_analysis_job(job: Job):
+    from .analysis import run_full_analysis
+
+    return run_full_analysis(job.csv_path, job.out_dir or DEFAULT_JOBS_DIR / str(job.id), **job.options)
+
+
+def run_worker(
+    queue: JobQueue,
+    worker: str | None = None,
+    poll_interval: float = 2.0,
+    heartbeat_interval: float | None = None,
+    max_jobs: int | None = None,
+    exit_when_idle: bool = False,
+    runner: Callable[[Job], object] | None = None,
+) -> int:
+    """Claim and run jobs until stopped; returns the number of jobs processed.
+
+    `runner` defaults to `run_full_analysis`; it receives the claimed `Job`
+    and may return an object with `base_dir` and `stage_timings` attributes.
+    """
+    worker = worker or default_worker_id()
+    runner = runner or _run_analysis_job
+    beat_every = heartbeat_interval or max(1.0, queue.lease_seconds / 4)
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = queue.claim(worker)
+        if job is None:
+            if exit_when_idle:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        beat = _Heartbeat(queue, job.id, worker, beat_every)
+        beat.start()
+        try:
+            result = runner(job)
+        except Exception as e:
+            beat.stop()
+            queue.fail(job.id, worker, f"{type(e).__name__}: {e}")
+        else:
+            beat.stop()
+            result_dir = getattr(result, "base_dir", None) or job.out_dir or ""
+            queue.complete(job.id, worker, result_dir, getattr(result, "stage_timings", None))
+        processed += 1
+    return processed
@@ -0,0 +1,323 @@
+"""Persisted inverted keyword index with AND/OR/prefix search.
+
+An index directory sits next to a cached copy of the dataset:
+
+- dataset.arrow: the `load_positions` frame as uncompressed Arrow IPC, so
+  it can be memory-mapped and top rows gathered without a full read
+- vocab.parquet: sorted tokens (position i owns postings i)
+- postings.npz: every token's sorted row ids, delta-encoded and compressed,
+  with per-token offsets
+- columns/*.npy: the filter and aggregate columns, memory-mapped on open
+- meta.json: source path/size/mtime (staleness check), service and intent names
+
+Queries decode only the postings they touch, intersect/union them with
+NumPy, filter and aggregate on the mapped column arrays and gather just the
+top rows, so they stay in the milliseconds on multi-million-row histories.
+
+Query syntax: whitespace-separated terms are ANDed, `OR` separates
+alternatives, and a trailing `*` makes a prefix term (of the last token
+of a hyphenated word), e.g. `shopify`, `web design OR webdesign`,
+`seo agen*`, `e-com*`.
+"""
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from .analysis import (
+    COL_INTENTS,
+    COL_KEYWORD,
+    COL_POS,
+    COL_TRAFFIC,
+    COL_TRAFFIC_COST,
+    COL_URL,
+    COL_VOLUME,
+    load_positions,
+)
+from .ngrams import keyword_tokens
+
+
+DEFAULT_INDEX_ROOT = Path("artifacts") / "index"
+_TOKEN = re.compile(r"[\w']+")
+
+
+@dataclass
+class KeywordIndex:
+    path: Path
+    meta: dict
+    vocab: pl.Series  # sorted tokens
+    offsets: np.ndarray  # len(vocab) + 1
+    deltas: np.ndarray  # delta-encoded row ids, first id of each token absolute
+    dataset: pl.DataFrame  # memory-mapped
+    position: np.ndarray  # int32, -1 when missing
+    traffic: np.ndarray
+    traffic_cost: np.ndarray
+    volume: np.ndarray
+    service: np.ndarray  # codes into meta["services"]
+    intents: np.ndarray  # bitmask over meta["intents"]
+
+    @property
+    def rows(self) -> int:
+        return int(self.meta["rows"])
+
+
+@dataclass
+class SearchResult:
+    query: str
+    row_ids: np.ndarray
+    aggregates: dict
+    by_service: pl.DataFrame
+    top_rows: pl.DataFrame = field(default_factory=pl.DataFrame)
+
+
+def default_index_dir(csv_path: str | Path) -> Path:
+    return DEFAULT_INDEX_ROOT / Path(csv_path).stem
+
+
+def _source_fingerprint(csv_path: str | Path) -> dict:
+    st = Path(csv_path).stat()
+    return {"source": str(csv_path), "source_size": st.st_size, "source_mtime": st.st_mtime}
+
+
+def build_index(df: pl.DataFrame, index_dir: str | Path, source: dict | None = None) -> Path:
+    """Write the cached dataset and its inverted index to `index_dir`."""
+    out = Path(index_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    df.write_ipc(out / "dataset.arrow", compression="uncompressed")
+
+    pairs = (
+        df.select(keyword_tokens(pl.col(COL_KEYWORD)).alias("token"))
+        .with_row_index("row")
+        .explode("token")
+        .drop_nulls("token")
+        .unique()
+        .sort(["token", "row"])
+    )
+    vocab = pairs.group_by("token", maintain_order=True).len()
+    offsets = np.zeros(vocab.height + 1, dtype=np.int64)
+    np.cumsum(vocab["len"].to_numpy(), out=offsets[1:])
+    rows = pairs["row"].to_numpy().astype(np.uint32)
+    deltas = rows.copy()
+    deltas[1:] -= rows[:-1]
+    deltas[offsets[:-1]] = rows[offsets[:-1]]
+    vocab.select("token").write_parquet(out / "vocab.parquet", compression="zstd")
+    np.savez_compressed(out / "postings.npz", offsets=offsets, deltas=deltas)
+
+    services = df["service"].fill_null("other").unique().sort()
+    intent_names = (
+        df.select(pl.col(COL_INTENTS).str.split(",").list.eval(pl.element().str.strip_chars()))
+        .explode(COL_INTENTS)
+        .filter(pl.col(COL_INTENTS).is_not_null() & (pl.col(COL_INTENTS) != ""))
+        .get_column(COL_INTENTS)
+        .unique()
+        .sort()
+        .to_list()
+    )
+    # Smallest unsigned width with a bit per intent (SEMrush has four)
+    widths = {8: pl.UInt8, 16: pl.UInt16, 32: pl.UInt32, 64: pl.UInt64}
+    mask_type = next((t for bits, t in widths.items() if len(intent_names) <= bits), None)
+    if mask_type is None:
+        raise ValueError(f"{len(intent_names)} distinct intents; the intent bitmask holds at most 64")
+    intent_mask = pl.lit(0, dtype=mask_type)
+    for bit, name in enumerate(intent_names):
+        intent_mask = intent_mask | pl.when(pl.col(COL_INTENTS).str.contains(name, literal=True)).then(
+            pl.lit(1 << bit, dtype=mask_type)
+        ).otherwise(pl.lit(0, dtype=mask_type))
+    cols = df.select(
+        pl.col(COL_POS).fill_null(-1).cast(pl.Int32).alias("position"),
+        pl.col(COL_TRAFFIC).fill_null(0.0).cast(pl.Float64).alias("traffic"),
+        pl.col(COL_TRAFFIC_COST).fill_null(0.0).cast(pl.Float64).alias("traffic_cost"),
+        pl.col(COL_VOLUME).fill_null(0).cast(pl.Int64).alias("volume"),
+        pl.col("service")
+        .fill_null("other")
+        .replace_strict(services, pl.int_range(len(services), dtype=pl.UInt16, eager=True))
+        .alias("service"),
+        intent_mask.fill_null(0).alias("intents"),
+    )
+    (out / "columns").mkdir(exist_ok=True)
+    for name in cols.columns:
+        np.save(out / "columns" / f"{name}.npy", cols[name].to_numpy())
+
+    meta = {
+        "rows": df.height,
+        "tokens": vocab.height,
+        "services": services.to_list(),
+        "intents": intent_names,
+        **(source or {}),
+    }
+    (out / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return out
+
+
+def ensure_index(csv_path: str | Path, index_dir: str | Path | None = None, rebuild: bool = False) -> Path:
+    """Build the index for `csv_path` unless an up-to-date one exists."""
+    out = Path(index_dir) if index_dir else default_index_dir(csv_path)
+    source = _source_fingerprint(csv_path)
+    meta_path = out / "meta.json"
+    if not rebuild and meta_path.exists():
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if all(meta.get(k) == v for k, v in source.items()):
+            return out
+    return build_index(load_positions(csv_path), out, source)
+
+
+def open_index(index_dir: str | Path) -> KeywordIndex:
+    src = Path(index_dir)
+    postings = np.load(src / "postings.npz")
+
+    def column(name: str) -> np.ndarray:
+        return np.load(src / "columns" / f"{name}.npy", mmap_mode="r")
+
+    return KeywordIndex(
+        path=src,
+        meta=json.loads((src / "meta.json").read_text(encoding="utf-8")),
+        vocab=pl.read_parquet(src / "vocab.parquet")["token"],
+        offsets=postings["offsets"],
+        deltas=postings["deltas"],
+        dataset=pl.read_ipc(src / "dataset.arrow", memory_map=True),
+        position=column("position"),
+        traffic=column("traffic"),
+        traffic_cost=column("traffic_cost"),
+        volume=column("volume"),
+        service=column("service"),
+        intents=column("intents"),
+    )
+
+
+def _postings(index: KeywordIndex, i: int) -> np.ndarray:
+    lo, hi = index.offsets[i], index.offsets[i + 1]
+    return np.cumsum(index.deltas[lo:hi], dtype=np.int64)
+
+
+def _term_rows(index: KeywordIndex, term: str) -> np.ndarray:
+    if term.endswith("*"):
+        prefix = term[:-1]
+        lo = index.vocab.search_sorted(prefix, side="left")
+        hi = index.vocab.search_sorted(prefix + "\U0010ffff", side="left")
+        if hi <= lo:
+            return np.empty(0, dtype=np.int64)
+        return _union([_postings(index, i) for i in range(lo, hi)])
+    i = index.vocab.search_sorted(term, side="left")
+    if i < len(index.vocab) and index.vocab[i] == term:
+        return _postings(index, i)
+    return np.empty(0, dtype=np.int64)
+
+
+def _union(arrays: list[np.ndarray]) -> np.ndarray:
+    if len(arrays) == 1:
+        return arrays[0]
+    rows = np.sort(np.concatenate(arrays))
+    return rows[np.r_[True, rows[1:] != rows[:-1]]] if rows.size else rows
+
+
+def parse_query(query: str) -> list[list[str]]:
+    """`a b OR c*` -> [["a", "b"], ["c*"]] (OR of ANDs).
+
+    A word that splits into several tokens (`e-com*`) ANDs them; only the
+    last one keeps the prefix `*` (["e", "com*"]).
+    """
+    clauses = []
+    for part in re.split(r"\s+OR\s+", query.strip()):
+        terms = []
+        for raw in part.split():
+            tokens = [t.lower() for t in _TOKEN.findall(raw)]
+            if tokens and raw.endswith("*"):
+                tokens[-1] += "*"
+            terms.extend(tokens)
+        if terms:
+            clauses.append(terms)
+    return clauses
+
+
+def match_rows(index: KeywordIndex, query: str) -> np.ndarray:
+    """Sorted row ids matching `query`."""
+    matched = []
+    for terms in parse_query(query):
+        # Intersect the rarest postings first
+        postings = sorted((_term_rows(index, t) for t in terms), key=len)
+        rows = postings[0]
+        for other in postings[1:]:
+            if rows.size == 0:
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        matched.append(rows)
+    if not matched:
+        return np.empty(0, dtype=np.int64)
+    return _union(matched)
+
+
+def _filter_rows(
+    index: KeywordIndex,
+    rows: np.ndarray,
+    service: list[str] | None,
+    pos_min: int | None,
+    pos_max: int | None,
+    intent: str | None,
+) -> np.ndarray:
+    keep = np.ones(rows.size, dtype=bool)
+    if service:
+        codes = [index.meta["services"].index(s) for s in service if s in index.meta["services"]]
+        keep &= np.isin(index.service[rows], codes)
+    pos = index.position[rows]
+    if pos_min is not None:
+        keep &= pos >= pos_min
+    if pos_max is not None:
+        keep &= (pos >= 0) & (pos <= pos_max)
+    if intent:
+        names = index.meta["intents"]
+        bit = names.index(intent) if intent in names else None
+        keep &= (index.intents[rows] & (1 << bit)) > 0 if bit is not None else False
+    return rows[keep]
+
+
+def search(
+    index: KeywordIndex,
+    query: str,
+    service: list[str] | None = None,
+    pos_min: int | None = None,
+    pos_max: int | None = None,
+    intent: str | None = None,
+    top: int = 20,
+) -> SearchResult:
+    """Aggregates, per-service breakdown and top rows (by traffic) for a query."""
+    rows = _filter_rows(index, match_rows(index, query), service, pos_min, pos_max, intent)
+    pos = index.position[rows]
+    ranked = pos >= 0
+    traffic = index.traffic[rows]
+    aggregates = {
+        "rows": int(rows.size),
+        "traffic": float(traffic.sum()),
+        "traffic_cost": float(index.traffic_cost[rows].sum()),
+        "volume": int(index.volume[rows].sum()),
+        "avg_position": float(pos[ranked].mean()) if ranked.any() else None,
+        "top3_share": float((pos[ranked] <= 3).mean()) if ranked.any() else None,
+    }
+    codes = index.service[rows]
+    names = index.meta["services"]
+    by_service = (
+        pl.DataFrame(
+            {
+                "service": [names[c] for c in codes] if codes.size < 1000 else pl.Series(names)[codes],
+                "traffic": traffic,
+                "position": np.where(ranked, pos, np.nan),
+            },
+            schema={"service": pl.Utf8, "traffic": pl.Float64, "position": pl.Float64},
+        )
+        .group_by("service")
+        .agg(
+            pl.len().alias("rows"),
+            pl.sum("traffic").alias("traffic"),
+            pl.col("position").fill_nan(None).mean().alias("avg_position"),
+        )
+        .sort(["traffic", "service"], descending=[True, False])
+    )
+    order = np.lexsort((rows, -traffic))[:top]
+    top_rows = index.dataset[rows[order]].select(
+        COL_KEYWORD, COL_POS, COL_TRAFFIC, COL_VOLUME, "service", COL_INTENTS, COL_URL
+    )
+    return SearchResult(query=query, row_ids=rows, aggregates=aggregates, by_service=by_service, top_rows=top_rows)
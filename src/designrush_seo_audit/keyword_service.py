@@ -0,0 +1,197 @@
+"""Service classification from keyword text.
+
+`url_service` only sees the URL, so profile pages, trends articles and
+services missing from the taxonomy land in 'other'. This classifier reads
+the keyword instead:
+
+- a term → service dictionary: built-in seed phrases for the taxonomy's
+  services, plus unigrams/bigrams learned from keywords whose URL service is
+  known (a term is learned when at least `min_support` distinct keywords use
+  it and `min_share` of them belong to one service)
+- keywords and terms are normalized the same way (lowercase, word tokens,
+  light plural folding) and space-padded, so one overlapping Aho–Corasick
+  pass (`str.extract_many`) over the distinct keywords finds every
+  whole-word term
+- each matched term votes for its service with weight = tokens in the term
+  × (1 for seeds, the learned share otherwise); `service_kw` is the top
+  service and `service_confidence` its share of all votes
+
+`resolved_service` falls back to `service_kw` where the URL gives 'other'.
+"""
+from __future__ import annotations
+
+import polars as pl
+
+from .analysis import (
+    COL_KEYWORD,
+    COL_POS,
+    COL_TRAFFIC,
+    COL_TRAFFIC_COST,
+    _wcount,
+    _wcount_if,
+    _wmean,
+    _wsum,
+)
+from .canonical import fold_plural
+from .taxonomy import OTHER, load_taxonomy
+
+
+MIN_SUPPORT = 5
+MIN_SHARE = 0.8
+MIN_CONFIDENCE = 0.6
+
+
+def _default_service_terms() -> dict[str, list[str]]:
+    return {
+        "web_design": ["web design", "website design", "web designer", "website designer", "webdesign"],
+        "web_dev": ["web development", "website development", "web developer", "website developer"],
+        "seo": ["seo", "search engine optimization", "search engine optimisation", "link building"],
+        "ppc": ["ppc", "pay per click", "google ads", "adwords", "paid search", "paid media", "sem"],
+        "social": ["social media", "instagram", "tiktok", "smm"],
+        "branding": ["branding", "brand identity", "brand strategy", "rebranding", "brand management"],
+        "logo": ["logo", "logo design"],
+        "mobile_app": ["app development", "app developer", "mobile app", "ios app", "android app", "app design"],
+        "software_dev": ["software development", "software developer", "custom software", "software house"],
+        "ecommerce": ["ecommerce", "e commerce", "online store"],
+        "video": ["video production", "video marketing", "explainer video", "video agency", "animation"],
+        "pr": ["public relations", "pr agency", "pr firm", "pr company", "publicist"],
+        "it_services": ["it services", "managed it", "it support", "it consulting", "managed service provider", "msp"],
+        "cybersecurity": ["cybersecurity", "cyber security", "penetration testing", "pentest"],
+        "hr_outsourcing": ["hr outsourcing", "peo", "payroll outsourcing"],
+        "influencer": ["influencer", "influencer marketing"],
+        "content": ["content marketing", "content writing", "copywriting", "content creation"],
+        "email": ["email marketing", "newsletter"],
+        "lead_gen": ["lead generation", "lead gen", "appointment setting"],
+        "ai": ["ai", "artificial intelligence", "machine learning", "chatbot"],
+        "data_analytics": ["data analytics", "big data", "data science", "business intelligence"],
+        "cms_platform": ["wordpress", "shopify", "magento", "drupal", "joomla"],
+        "digital_marketing": ["digital marketing", "online marketing", "internet marketing"],
+        "advertising": ["advertising", "ad agency", "advertising agency"],
+    }
+
+
+def normalize_text(text: pl.Expr) -> pl.Expr:
+    """Space-padded, lowercased, plural-folded word tokens: ' web design company '."""
+    return " " + text.str.to_lowercase().str.extract_all(r"\w+").list.eval(fold_plural(pl.element())).list.join(" ") + " "
+
+
+def learned_terms(df: pl.DataFrame, min_support: int = MIN_SUPPORT, min_share: float = MIN_SHARE) -> pl.DataFrame:
+    """(term, service, weight) for unigrams/bigrams concentrated in one URL service."""
+    labelled = (
+        df.filter(pl.col("service") != OTHER)
+        .select(COL_KEYWORD, "service")
+        .unique()
+        .with_columns(normalize_text(pl.col(COL_KEYWORD)).str.strip_chars().str.split(" ").alias("_tokens"))
+    )
+    bigrams = labelled.with_columns(
+        pl.concat_list(
+            pl.col("_tokens"),
+            pl.col("_tokens").list.eval(pl.element() + " " + pl.element().shift(-1)).list.drop_nulls(),
+        ).list.unique().alias("term")
+    )
+    return (
+        bigrams.explode("term")
+        .filter(pl.col("term").is_not_null() & (pl.col("term") != ""))
+        .group_by(["term", "service"])
+        .len()
+        .with_columns(pl.col("len").sum().over("term").alias("_total"))
+        .filter((pl.col("_total") >= min_support) & (pl.col("len") >= min_share * pl.col("_total")))
+        .select(
+            "term",
+            "service",
+            ((pl.col("term").str.count_matches(" ") + 1) * pl.col("len") / pl.col("_total")).alias("weight"),
+        )
+    )
+
+
+def service_terms(df: pl.DataFrame | None = None, learn: bool = True) -> pl.DataFrame:
+    """The term dictionary: seed phrases for known services, plus learned terms.
+
+    Seeds win when a term is both seeded and learned.
+    """
+    known = set(load_taxonomy().services)
+    seeds = pl.DataFrame(
+        [(term, svc) for svc, terms in _default_service_terms().items() if svc in known for term in terms],
+        schema={"term": pl.Utf8, "service": pl.Utf8},
+        orient="row",
+    ).select(
+        normalize_text(pl.col("term")).str.strip_chars().alias("term"),
+        "service",
+        (pl.col("term").str.count_matches(" ") + 1).cast(pl.Float64).alias("weight"),
+    )
+    if df is None or not learn:
+        return seeds.unique("term", keep="first", maintain_order=True)
+    learned = learned_terms(df).join(seeds, on="term", how="anti")
+    return pl.concat([seeds, learned]).unique("term", keep="first", maintain_order=True)
+
+
+def classify_keywords(keywords: pl.Series, terms: pl.DataFrame) -> pl.DataFrame:
+    """(Keyword, service_kw, service_confidence) for each distinct keyword."""
+    uniq = keywords.drop_nulls().unique().to_frame(COL_KEYWORD).with_row_index("kid")
+    schema = {COL_KEYWORD: pl.Utf8, "service_kw": pl.Utf8, "service_confidence": pl.Float64}
+    if not terms.height or not uniq.height:
+        return uniq.select(COL_KEYWORD).with_columns(
+            pl.lit(None, dtype=pl.Utf8).alias("service_kw"), pl.lit(0.0).alias("service_confidence")
+        ).select(list(schema))
+    padded = (" " + terms["term"] + " ").to_list()
+    votes = (
+        uniq.select("kid", normalize_text(pl.col(COL_KEYWORD)).str.extract_many(padded, overlapping=True).alias("term"))
+        .explode("term")
+        .drop_nulls("term")
+        .with_columns(pl.col("term").str.strip_chars())
+        .unique()
+        .join(terms, on="term")
+        .group_by(["kid", "service"])
+        .agg(pl.sum("weight").alias("score"))
+        .with_columns((pl.col("score") / pl.col("score").sum().over("kid")).alias("service_confidence"))
+        .sort(["kid", "score", "service"], descending=[False, True, False])
+        .unique("kid", keep="first")
+        .select("kid", pl.col("service").alias("service_kw"), "service_confidence")
+    )
+    return (
+        uniq.join(votes, on="kid", how="left")
+        .with_columns(pl.col("service_confidence").fill_null(0.0))
+        .select(list(schema))
+    )
+
+
+def add_keyword_service(df: pl.DataFrame, learn: bool = True) -> pl.DataFrame:
+    """Add `service_kw` and `service_confidence`, computed once per distinct keyword."""
+    labels = classify_keywords(df[COL_KEYWORD], service_terms(df, learn=learn))
+    return df.join(labels, on=COL_KEYWORD, how="left", maintain_order="left").with_columns(
+        pl.col("service_confidence").fill_null(0.0)
+    )
+
+
+def resolved_service(min_confidence: float = MIN_CONFIDENCE) -> pl.Expr:
+    """URL service, or the keyword-text service where the URL says 'other'."""
+    return (
+        pl.when(
+            (pl.col("service") == OTHER)
+            & pl.col("service_kw").is_not_null()
+            & (pl.col("service_confidence") >= min_confidence)
+        )
+        .then(pl.col("service_kw"))
+        .otherwise(pl.col("service"))
+    )
+
+
+def services_breakdown_resolved(df: pl.DataFrame, min_confidence: float = MIN_CONFIDENCE) -> pl.DataFrame:
+    """`services_breakdown` over the resolved service, with keywords per label source."""
+    from_text = (pl.col("service") == OTHER) & (pl.col("service_resolved") != OTHER)
+    return (
+        df.with_columns(resolved_service(min_confidence).alias("service_resolved"))
+        .group_by("service_resolved")
+        .agg(
+            _wcount(df).alias("keywords"),
+            _wcount_if(df, ~from_text).alias("keywords_from_url"),
+            _wcount_if(df, from_text).alias("keywords_from_text"),
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
+            _wsum(df, COL_TRAFFIC_COST).alias("traffic_cost"),
+            _wmean(df, COL_POS).alias("avg_position"),
+            _wcount_if(df, pl.col("pos_change") > 0).alias("improving"),
+            _wcount_if(df, pl.col("pos_change") < 0).alias("declining"),
+        )
+        .rename({"service_resolved": "service"})
+        .sort(["traffic", "service"], descending=[True, False])
+    )
@@ -0,0 +1,275 @@
+"""Internal link recommendations from keyword-token similarity.
+
+Each URL is a sparse TF-IDF vector over the tokens of the keywords it ranks
+for (sublinear term frequency, L2-normalized), stored as (uid, token, weight)
+rows. Tokens are pruned hard before any pairing: those present on more than
+`max_df` of the URLs carry almost no IDF weight, and each URL keeps only its
+`top_tokens` heaviest tokens.
+
+Cosine similarity is a sparse matrix product: one block of query URLs at a
+time, each query token is expanded over that token's postings (the
+candidate pages carrying it), the products are summed per (query,
+candidate) cell that actually occurs, and only the top k per query are kept.
+Tokens on more than `max_postings` candidate pages are skipped, so a block
+costs O(block tokens × max_postings) whatever the number of URLs, and no
+URL × URL matrix is ever built. The anchor-text hints are joined only for
+the pairs kept.
+
+Link suggestions point from a similar page to a target with quick-win
+keywords (positions 4–10), scored by similarity × the target's click uplift
+if those keywords reached position 3.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+import polars as pl
+
+from .analysis import (
+    COL_CPC,
+    COL_KEYWORD,
+    COL_POS,
+    COL_TRAFFIC,
+    COL_URL,
+    COL_VOLUME,
+    SAMPLE_WEIGHT,
+    _is_weighted,
+    _wsum,
+    position_ctr,
+    position_ctr_expr,
+)
+from .ngrams import keyword_tokens
+
+if TYPE_CHECKING:
+    from .search_console import CtrCurve
+
+
+MAX_DF = 0.05
+TOP_TOKENS = 10
+MAX_POSTINGS = 1_000
+
+
+def url_token_matrix(
+    df: pl.DataFrame, max_df: float = MAX_DF, top_tokens: int = TOP_TOKENS
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Sparse URL × token TF-IDF matrix.
+
+    Returns (matrix, urls): matrix rows are (uid, token, weight) with at most
+    `top_tokens` rows per uid, urls is the per-URL table (uid, URL, service,
+    traffic, keywords) indexed by uid.
+    """
+    ranked = df.filter(pl.col(COL_URL).is_not_null() & pl.col(COL_KEYWORD).is_not_null())
+    urls = (
+        ranked.group_by(COL_URL)
+        .agg(
+            pl.first("service").alias("service"),
+            _wsum(ranked, COL_TRAFFIC).alias("traffic"),
+            pl.col(COL_KEYWORD).n_unique().alias("keywords"),
+        )
+        .sort(COL_URL)
+        .with_row_index("uid")
+    )
+    tf = (
+        ranked.select(COL_URL, keyword_tokens(pl.col(COL_KEYWORD)).alias("token"))
+        .join(urls.select(COL_URL, "uid"), on=COL_URL)
+        .drop(COL_URL)
+        .explode("token")
+        .drop_nulls("token")
+        .group_by(["uid", "token"])
+        .len()
+    )
+    n_urls = urls.height
+    matrix = (
+        tf.with_columns(pl.len().over("token").alias("df"))
+        .filter(pl.col("df") <= max(1.0, max_df * n_urls))
+        .with_columns(
+            ((1 + pl.col("len").cast(pl.Float64).log()) * (n_urls / pl.col("df")).log()).alias("weight")
+        )
+        .filter(pl.col("weight") > 0)
+        .sort(["uid", "weight", "token"], descending=[False, True, False])
+        .filter(pl.int_range(pl.len()).over("uid") < top_tokens)
+        .with_columns((pl.col("weight") / (pl.col("weight") ** 2).sum().sqrt().over("uid")).alias("weight"))
+        .select("uid", "token", "weight")
+    )
+    return matrix, urls
+
+
+def _shared_tokens(matrix: pl.DataFrame, pairs: pl.DataFrame) -> pl.DataFrame:
+    """The three tokens contributing most to each kept pair's similarity."""
+    right = matrix.rename({"uid": "uid_b", "weight": "weight_b"})
+    return (
+        pairs.select("uid", "uid_b")
+        .join(matrix, on="uid")
+        .join(right, on=["uid_b", "token"])
+        .with_columns((pl.col("weight") * pl.col("weight_b")).alias("dot"))
+        .group_by(["uid", "uid_b"])
+        .agg(pl.col("token").sort_by(["dot", "token"], descending=[True, False]).head(3).str.join(" ").alias("shared_tokens"))
+    )
+
+
+def similar_pages(
+    matrix: pl.DataFrame,
+    k: int = 10,
+    pages: pl.Series | None = None,
+    min_similarity: float = 0.05,
+    block_size: int = 2_000,
+    max_postings: int = MAX_POSTINGS,
+) -> pl.DataFrame:
+    """Top-k most similar pages per page: (uid, uid_b, similarity, shared_tokens).
+
+    `pages` restricts which pages get neighbours (all by default); candidates
+    are always every page. Tokens carried by more than `max_postings`
+    candidates are ignored. `shared_tokens` lists the three tokens
+    contributing most to the similarity (anchor-text hints).
+    """
+    schema = {"uid": pl.UInt32, "uid_b": pl.UInt32, "similarity": pl.Float64}
+    ids = matrix.select(
+        (pl.col("uid").rank("dense") - 1).cast(pl.Int64).alias("cand"),
+        (pl.col("token").rank("dense") - 1).cast(pl.Int64).alias("tid"),
+    )
+    uids = np.unique(matrix["uid"].to_numpy())
+    cand, tid = ids["cand"].to_numpy(), ids["tid"].to_numpy()
+    weight = matrix["weight"].to_numpy()
+    n, n_tokens = uids.size, int(tid.max(initial=-1)) + 1
+    queries = np.unique((matrix["uid"] if pages is None else pages).to_numpy())
+    queries = queries[np.isin(queries, uids)]
+    if k <= 0 or queries.size == 0:
+        return pl.DataFrame(schema={**schema, "shared_tokens": pl.Utf8})
+
+    # Postings (CSC): the candidates carrying each token
+    by_token = np.argsort(tid, kind="stable")
+    indptr = np.r_[0, np.cumsum(np.bincount(tid, minlength=n_tokens))]
+    post_cand, post_w = cand[by_token], weight[by_token]
+    df_tok = np.diff(indptr)
+    # Query rows (CSR): each query's (token, weight) entries
+    by_uid = np.argsort(cand, kind="stable")
+    row_ptr = np.r_[0, np.cumsum(np.bincount(cand, minlength=n))]
+    row_tid, row_w = tid[by_uid], weight[by_uid]
+
+    q_local = np.searchsorted(uids, queries)
+    parts = []
+    for lo in range(0, q_local.size, block_size):
+        qs = q_local[lo : lo + block_size]
+        lens_q = row_ptr[qs + 1] - row_ptr[qs]
+        entry = np.repeat(row_ptr[qs] - np.cumsum(lens_q) + lens_q, lens_q) + np.arange(lens_q.sum())
+        row = np.repeat(np.arange(qs.size), lens_q)
+        t, w = row_tid[entry], row_w[entry]
+        keep = df_tok[t] <= max_postings
+        row, t, w = row[keep], t[keep], w[keep]
+        lens = df_tok[t]
+        pos = np.repeat(indptr[t] - np.cumsum(lens) + lens, lens) + np.arange(lens.sum())
+        # Sum the products per (query, candidate) cell present, then keep the top k per query
+        cells, inv = np.unique(np.repeat(row, lens) * n + post_cand[pos], return_inverse=True)
+        sim = np.bincount(inv, weights=np.repeat(w, lens) * post_w[pos])
+        r, c = cells // n, cells % n
+        hit = (c != qs[r]) & (sim >= min_similarity) & (sim > 0)
+        r, c, sim = r[hit], c[hit], sim[hit]
+        # One stable integer sort by (query, descending similarity); cells arrive
+        # ordered by candidate, which breaks exact ties
+        sim_bits = 63 - qs.size.bit_length()
+        desc = ((1.0 - np.clip(sim, 0.0, 1.0)) * float((1 << sim_bits) - 1)).astype(np.uint64)
+        order = np.argsort((r.astype(np.uint64) << np.uint64(sim_bits)) | desc, kind="stable")
+        r, c, sim = r[order], c[order], sim[order]
+        starts = np.flatnonzero(np.r_[True, r[1:] != r[:-1]])
+        top = np.arange(r.size) - np.repeat(starts, np.diff(np.r_[starts, r.size])) < k
+        parts.append(pl.DataFrame({"uid": uids[qs[r[top]]], "uid_b": uids[c[top]], "similarity": sim[top]}, schema=schema))
+    pairs = pl.concat(parts, how="vertical") if parts else pl.DataFrame(schema=schema)
+    return pairs.join(_shared_tokens(matrix, pairs), on=["uid", "uid_b"], how="left", maintain_order="left")
+
+
+def quick_win_uplift(df: pl.DataFrame, target_pos: int = 3, ctr_curve: CtrCurve | None = None) -> pl.DataFrame:
+    """Per-URL click/value uplift if its position 4–10 keywords reached `target_pos`.
+
+    Uses the calibrated `ctr_curve` when given, else `position_ctr`.
+    """
+    weight = pl.col(SAMPLE_WEIGHT) if _is_weighted(df) else pl.lit(1.0)
+    if ctr_curve is not None:
+        gain = ctr_curve.expr(pl.lit(target_pos), pl.col("service")) - ctr_curve.expr(pl.col(COL_POS), pl.col("service"))
+    else:
+        gain = position_ctr(target_pos) - position_ctr_expr(pl.col(COL_POS))
+    clicks = pl.col(COL_VOLUME) * gain * weight
+    return (
+        df.filter((pl.col(COL_POS) >= 4) & (pl.col(COL_POS) <= 10) & pl.col(COL_URL).is_not_null())
+        .with_columns(clicks.alias("_clicks"), (pl.col(COL_VOLUME) * pl.col(COL_CPC).fill_null(0.0)).alias("_priority"))
+        .sort([COL_URL, "_priority", COL_KEYWORD], descending=[False, True, False])
+        .group_by(COL_URL, maintain_order=True)
+        .agg(
+            pl.len().alias("quick_wins"),
+            pl.sum("_clicks").alias("uplift_clicks"),
+            (pl.col("_clicks") * pl.col(COL_CPC).fill_null(0.0)).sum().alias("uplift_value"),
+            pl.first(COL_KEYWORD).alias("top_quick_win"),
+        )
+        .filter(pl.col("uplift_clicks") > 0)
+    )
+
+
+def internal_link_suggestions(
+    df: pl.DataFrame,
+    links_per_target: int = 5,
+    same_service: bool = True,
+    max_df: float = MAX_DF,
+    min_similarity: float = 0.05,
+    block_size: int = 2_000,
+    ctr_curve: CtrCurve | None = None,
+) -> pl.DataFrame:
+    """Source → target link proposals, ranked per source service.
+
+    For each quick-win target, the `links_per_target` most similar pages are
+    proposed as link sources (within the target's service unless
+    `same_service` is False). score = similarity × target uplift_clicks.
+    """
+    matrix, urls = url_token_matrix(df, max_df=max_df)
+    uplift = quick_win_uplift(df, ctr_curve=ctr_curve).join(urls.select(COL_URL, "uid", "service"), on=COL_URL)
+    # Similarity is symmetric: each target's nearest pages are its sources
+    if same_service:
+        service = urls["service"].gather(matrix["uid"])
+        similar = pl.concat(
+            [
+                similar_pages(
+                    matrix.filter(service == svc),
+                    k=links_per_target,
+                    pages=targets["uid"],
+                    min_similarity=min_similarity,
+                    block_size=block_size,
+                )
+                for (svc,), targets in uplift.group_by("service")
+            ]
+            or [similar_pages(matrix.clear())],
+            how="vertical",
+        )
+    else:
+        similar = similar_pages(
+            matrix, k=links_per_target, pages=uplift["uid"], min_similarity=min_similarity, block_size=block_size
+        )
+    src = urls.select(
+        pl.col("uid").alias("uid_b"),
+        pl.col(COL_URL).alias("source_url"),
+        pl.col("service").alias("service"),
+        pl.col("traffic").alias("source_traffic"),
+    )
+    tgt = urls.select(
+        "uid", pl.col(COL_URL).alias("target_url"), pl.col("service").alias("target_service")
+    ).join(uplift.drop(COL_URL, "service"), on="uid")
+    return (
+        similar.join(src, on="uid_b")
+        .join(tgt, on="uid")
+        .with_columns((pl.col("similarity") * pl.col("uplift_clicks")).alias("score"))
+        .sort(["service", "score", "source_url", "target_url"], descending=[False, True, False, False])
+        .with_columns(pl.int_range(1, pl.len() + 1).over("service").alias("rank"))
+        .select(
+            "service",
+            "rank",
+            "source_url",
+            "target_url",
+            "target_service",
+            "similarity",
+            "shared_tokens",
+            pl.col("top_quick_win").alias("anchor_keyword"),
+            "quick_wins",
+            "uplift_clicks",
+            "uplift_value",
+            "source_traffic",
+            "score",
+        )
+    )
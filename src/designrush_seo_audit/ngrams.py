@@ -0,0 +1,159 @@
+"""Keyword n-gram and modifier analysis.
+
+Keywords are tokenized with Polars string ops and exploded once; bigrams
+and trigrams are shifted concatenations over the exploded tokens (masked to
+stay within a keyword), and one group-by over (ngram, service, pos_bucket)
+aggregates them. The overall, per-service and per-bucket tables are
+roll-ups of that group-by.
+
+Vocabulary pruning is Apriori-style: an n-gram never occurs in more rows
+than any of its tokens, so tokens below `min_count` are nulled out before
+the n-grams are formed, and n-grams containing them are never materialized.
+Rows are processed in chunks whose partial sums are merged, bounding peak
+memory on million-keyword exports.
+"""
+from __future__ import annotations
+
+import polars as pl
+
+from .analysis import COL_CPC, COL_KEYWORD, COL_POS, COL_TRAFFIC, COL_VOLUME, SAMPLE_WEIGHT, _is_weighted
+
+
+_SUMS = ["rows", "traffic", "volume", "value", "pos_sum", "pos_count", "top3"]
+
+
+def keyword_tokens(keyword: pl.Expr) -> pl.Expr:
+    return keyword.str.to_lowercase().str.extract_all(r"[\w']+")
+
+
+def _token_vocab(df: pl.DataFrame, min_count: int) -> pl.Series:
+    return (
+        df.select(keyword_tokens(pl.col(COL_KEYWORD)).list.unique().alias("token"))
+        .explode("token")
+        .group_by("token")
+        .len()
+        .filter(pl.col("token").is_not_null() & (pl.col("len") >= min_count))
+        .get_column("token")
+    )
+
+
+def _row_ngrams(df: pl.DataFrame, vocab: pl.Series, max_n: int) -> pl.DataFrame:
+    """Distinct (row, ngram) pairs; n-grams over pruned tokens drop out as nulls."""
+    tokens = (
+        df.select(keyword_tokens(pl.col(COL_KEYWORD)).alias("token"))
+        .with_row_index("row")
+        .explode("token")
+        .with_columns(pl.when(pl.col("token").is_in(vocab.implode())).then(pl.col("token")).alias("token"))
+    )
+    # Tokens are contiguous per row after the explode, so n-grams are shifts
+    # that stay within the same row
+    grams = [
+        tokens.select(
+            "row",
+            pl.when(pl.col("row").shift(-(n - 1)) == pl.col("row"))
+            .then(pl.concat_str([pl.col("token").shift(-i) for i in range(n)], separator=" "))
+            .alias("ngram"),
+        )
+        for n in range(1, max_n + 1)
+    ]
+    return pl.concat(grams, how="vertical").drop_nulls("ngram").unique()
+
+
+def _partial_counts(df: pl.DataFrame, vocab: pl.Series, max_n: int) -> pl.DataFrame:
+    weight = pl.col(SAMPLE_WEIGHT) if _is_weighted(df) else pl.lit(1)
+    metrics = df.select(
+        "service",
+        "pos_bucket",
+        weight.alias("_w"),
+        pl.col(COL_TRAFFIC).fill_null(0.0),
+        pl.col(COL_VOLUME).fill_null(0),
+        (pl.col(COL_VOLUME) * pl.col(COL_CPC).fill_null(0.0)).fill_null(0.0).alias("_value"),
+        COL_POS,
+    )
+    grams = _row_ngrams(df, vocab, max_n)
+    return (
+        metrics[grams["row"]]
+        .with_columns(grams["ngram"])
+        .group_by(["ngram", "service", "pos_bucket"])
+        .agg(
+            pl.sum("_w").alias("rows"),
+            (pl.col(COL_TRAFFIC) * pl.col("_w")).sum().alias("traffic"),
+            (pl.col(COL_VOLUME) * pl.col("_w")).sum().alias("volume"),
+            (pl.col("_value") * pl.col("_w")).sum().alias("value"),
+            (pl.col(COL_POS) * pl.col("_w")).sum().alias("pos_sum"),
+            pl.when(pl.col(COL_POS).is_not_null()).then(pl.col("_w")).otherwise(0).sum().alias("pos_count"),
+            pl.when(pl.col(COL_POS) <= 3).then(pl.col("_w")).otherwise(0).sum().alias("top3"),
+        )
+    )
+
+
+def ngram_counts(
+    df: pl.DataFrame,
+    max_n: int = 3,
+    min_count: int = 3,
+    chunk_rows: int = 250_000,
+) -> pl.DataFrame:
+    """Weighted n-gram sums per (ngram, service, pos_bucket).
+
+    `min_count` prunes tokens (and hence n-grams) seen in fewer rows.
+    """
+    vocab = _token_vocab(df, min_count)
+    parts = [
+        _partial_counts(df.slice(offset, chunk_rows), vocab, max_n)
+        for offset in range(0, max(df.height, 1), chunk_rows)
+    ]
+    return (
+        pl.concat(parts, how="vertical")
+        .group_by(["ngram", "service", "pos_bucket"])
+        .agg([pl.sum(c) for c in _SUMS])
+        .with_columns((pl.col("ngram").str.count_matches(" ") + 1).cast(pl.Int8).alias("n"))
+    )
+
+
+def _finish(counts: pl.DataFrame, keys: list[str], min_count: int, top_n: int | None) -> pl.DataFrame:
+    out = (
+        counts.group_by([*keys, "n", "ngram"])
+        .agg([pl.sum(c) for c in _SUMS])
+        .filter(pl.col("rows") >= min_count)
+        .with_columns(
+            (pl.col("pos_sum") / pl.col("pos_count")).alias("avg_position"),
+            (pl.col("top3") / pl.col("rows")).alias("top3_share"),
+            (pl.col("traffic") / pl.col("rows")).alias("traffic_per_keyword"),
+        )
+        .sort([*keys, "n", "traffic", "volume", "ngram"], descending=[*([False] * len(keys)), False, True, True, False])
+    )
+    if top_n is not None:
+        out = out.filter(pl.int_range(pl.len()).over([*keys, "n"]) < top_n)
+    return out.select(
+        *keys,
+        "n",
+        "ngram",
+        pl.col("rows").alias("keywords"),
+        "traffic",
+        "volume",
+        "value",
+        "avg_position",
+        "top3_share",
+        "traffic_per_keyword",
+    )
+
+
+def ngram_tables(
+    df: pl.DataFrame,
+    max_n: int = 3,
+    min_count: int = 3,
+    top_n: int | None = 200,
+    top_n_per_group: int | None = 50,
+) -> dict[str, pl.DataFrame]:
+    """keyword_ngrams (overall), keyword_ngrams_by_service, keyword_ngrams_by_bucket.
+
+    Metrics per n-gram: keywords (rows), traffic, volume, value (volume×CPC),
+    avg_position, top3_share and traffic_per_keyword; weighted on samples.
+    Each table keeps the top n-grams by traffic per n (and per group).
+    """
+    counts = ngram_counts(df, max_n=max_n, min_count=min_count)
+    return {
+        "keyword_ngrams": _finish(counts, [], min_count, top_n),
+        "keyword_ngrams_by_service": _finish(counts, ["service"], min_count, top_n_per_group),
+        "keyword_ngrams_by_bucket": _finish(counts, ["pos_bucket"], min_count, top_n_per_group),
+    }
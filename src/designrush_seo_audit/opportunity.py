@@ -0,0 +1,188 @@
+"""Multi-factor opportunity scores and partition-wise top-k selection.
+
+A keyword's opportunity score is one vectorized expression over the row:
+
+    score = volume × CPC
+            × ctr_gain ** ctr_weight            (clicks gained at the target position)
+            × (1 − KD / 100) ** difficulty_weight
+            × Π serp_penalties[feature]         (click-stealing SERP features present)
+            × max intent_weights[intent]
+            × exp(−distance_weight × (position − target))
+
+With every weight at zero and no penalties this is the plain
+`Search Volume × CPC` priority, which is kept alongside as `priority`.
+Missing KD or intents are neutral (factor 1). The CTR gain comes from
+`position_ctr` or from a calibrated `CtrCurve` (see search_console.py).
+
+Rankings never sort the scored frame: each partition (a shard, or the
+whole frame) is cut to its top `n` — overall or per segment — with a
+partial selection (`top_k` / `top_k_by`), and the top `n` of the union of
+those cuts is the exact answer, so shards can be selected independently
+and merged in any order. Only the final `n` rows (per segment) are sorted.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable
+
+import polars as pl
+
+from .analysis import COL_CPC, COL_INTENTS, COL_KD, COL_KEYWORD, COL_POS, COL_SERP_FEATS, COL_VOLUME
+from .analysis import position_ctr, position_ctr_expr
+
+if TYPE_CHECKING:
+    from .search_console import CtrCurve
+
+
+# Multipliers for SERP features that take clicks from the organic results
+SERP_PENALTIES = {
+    "AI overview": 0.7,
+    "Featured snippet": 0.85,
+    "Instant answer": 0.7,
+    "Knowledge panel": 0.9,
+    "Local pack": 0.85,
+    "Local services ads": 0.9,
+    "Ads top": 0.9,
+    "Shopping ads": 0.9,
+    "Popular products": 0.95,
+    "Top stories": 0.95,
+    "Video Carousel": 0.95,
+}
+INTENT_WEIGHTS = {
+    "commercial": 1.0,
+    "transactional": 1.0,
+    "informational": 0.7,
+    "navigational": 0.5,
+}
+# Ranking order (highest first); the keyword breaks remaining ties alphabetically
+ORDER = (["score", COL_VOLUME, COL_CPC, COL_KEYWORD], [True, True, True, False])
+
+
+@dataclass
+class OpportunityWeights:
+    """Position band, target position and the weights of each score factor."""
+
+    min_position: int = 4
+    max_position: int = 10
+    target_position: int = 3
+    ctr_weight: float = 1.0
+    difficulty_weight: float = 1.0
+    distance_weight: float = 0.05
+    serp_penalties: dict[str, float] = field(default_factory=lambda: dict(SERP_PENALTIES))
+    intent_weights: dict[str, float] = field(default_factory=lambda: dict(INTENT_WEIGHTS))
+
+
+QUICK_WINS = OpportunityWeights()
+STRIKING_DISTANCE = OpportunityWeights(max_position=50)
+
+
+def _listed(col: str) -> pl.Expr:
+    return pl.col(col).str.split(",").list.eval(pl.element().str.strip_chars())
+
+
+def ctr_gain_expr(
+    weights: OpportunityWeights, ctr_curve: CtrCurve | None = None, service: pl.Expr | None = None
+) -> pl.Expr:
+    """CTR at the target position minus CTR at the current one (never negative)."""
+    if ctr_curve is not None:
+        target = ctr_curve.expr(pl.lit(weights.target_position), service)
+        gain = target - ctr_curve.expr(pl.col(COL_POS), service)
+    else:
+        gain = position_ctr(weights.target_position) - position_ctr_expr(pl.col(COL_POS))
+    return gain.clip(lower_bound=0.0)
+
+
+def serp_factor_expr(penalties: dict[str, float]) -> pl.Expr:
+    """Product of the penalties of the keyword's SERP features, as exp(Σ log penalty)."""
+    if not penalties:
+        return pl.lit(1.0)
+    logs = {name: math.log(p) for name, p in penalties.items()}
+    return (
+        _listed(COL_SERP_FEATS)
+        .list.eval(pl.element().replace_strict(logs, default=0.0, return_dtype=pl.Float64))
+        .list.sum()
+        .exp()
+        .fill_null(1.0)
+    )
+
+
+def intent_factor_expr(intent_weights: dict[str, float]) -> pl.Expr:
+    """Weight of the keyword's best-valued intent (1.0 when none is known)."""
+    if not intent_weights:
+        return pl.lit(1.0)
+    return (
+        _listed(COL_INTENTS)
+        .list.eval(pl.element().str.to_lowercase().replace_strict(intent_weights, default=None, return_dtype=pl.Float64))
+        .list.max()
+        .fill_null(1.0)
+    )
+
+
+def score_opportunities(
+    df: pl.DataFrame,
+    weights: OpportunityWeights = QUICK_WINS,
+    ctr_curve: CtrCurve | None = None,
+) -> pl.DataFrame:
+    """Rows in the weights' position band with `priority`, each score factor and `score`.
+
+    Factors whose input column is missing (e.g. on collapsed variants) are 1.
+    """
+    w = weights
+    cols = set(df.columns)
+    service = pl.col("service") if "service" in cols else None
+    ease = (1.0 - pl.col(COL_KD).clip(0.0, 100.0) / 100.0).fill_null(1.0) if COL_KD in cols else pl.lit(1.0)
+    serp = serp_factor_expr(w.serp_penalties) if COL_SERP_FEATS in cols else pl.lit(1.0)
+    intent = intent_factor_expr(w.intent_weights) if COL_INTENTS in cols else pl.lit(1.0)
+    return (
+        df.filter((pl.col(COL_POS) >= w.min_position) & (pl.col(COL_POS) <= w.max_position))
+        .with_columns(
+            (pl.col(COL_VOLUME) * pl.col(COL_CPC).fill_null(0.0)).alias("priority"),
+            ctr_gain_expr(w, ctr_curve, service).alias("ctr_gain"),
+            ease.alias("ease"),
+            serp.alias("serp_factor"),
+            intent.alias("intent_factor"),
+            (-w.distance_weight * (pl.col(COL_POS) - w.target_position).clip(lower_bound=0)).exp().alias("reach"),
+        )
+        .with_columns(
+            (
+                pl.col("priority")
+                * pl.col("ctr_gain").pow(w.ctr_weight)
+                * pl.col("ease").pow(w.difficulty_weight)
+                * pl.col("serp_factor")
+                * pl.col("intent_factor")
+                * pl.col("reach")
+            ).alias("score")
+        )
+    )
+
+
+def _select(df: pl.DataFrame, n: int, by: str | None) -> pl.DataFrame:
+    cols, descending = ORDER
+    reverse = [not d for d in descending]
+    if by is None:
+        return df.top_k(n, by=cols, reverse=reverse)
+    rows = (
+        df.select(by, *cols)
+        .with_row_index("_row")
+        .group_by(by)
+        .agg(pl.col("_row").top_k_by(cols, n, reverse=reverse))
+        .get_column("_row")
+        .explode()
+    )
+    return df[rows]
+
+
+def top_opportunities(
+    parts: pl.DataFrame | Iterable[pl.DataFrame],
+    n: int,
+    by: str | None = None,
+) -> pl.DataFrame:
+    """Top `n` scored rows overall, or per `by` segment, across one frame or several partitions."""
+    frames = [parts] if isinstance(parts, pl.DataFrame) else list(parts)
+    cut = [_select(f, n, by) for f in frames]
+    best = cut[0] if len(cut) == 1 else _select(pl.concat(cut, how="diagonal_relaxed"), n, by)
+    cols, descending = ORDER
+    if by is None:
+        return best.sort(cols, descending=descending)
+    return best.sort([by, *cols], descending=[False, *descending])
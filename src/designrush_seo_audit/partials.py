@@ -0,0 +1,213 @@
+"""Mergeable partial aggregates for sharded exports (map-reduce).
+
+`overview`, `categories_breakdown`, `services_breakdown`, `intent_mix`,
+`top_pages_by_traffic` and `top_keywords_by_traffic` are re-expressed as
+partial states that can be computed per shard and merged:
+
+- counts and sums are summed,
+- means are carried as (position sum, position count),
+- row-level rankings keep a bounded top-k per shard (top-k of the union is
+  the top-k of the per-shard top-ks).
+
+Shards can be slices of one export or whole exports, processed on different
+workers/machines (`save_partial` / `load_partial`) and merged in any order.
+`finalize` returns frames identical to the single-frame functions in
+`analysis`. Sums are exact because SEMrush exports whole-number Traffic and
+Traffic Cost; fractional inputs would agree up to float rounding.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Iterable
+
+import polars as pl
+
+from .analysis import (
+    COL_INTENTS,
+    COL_KEYWORD,
+    COL_POS,
+    COL_TRAFFIC,
+    COL_TRAFFIC_COST,
+    COL_URL,
+    _explode_list_column_from_str,
+)
+
+
+# Sort keys shared with the single-frame functions in analysis.py
+_TOP_KEYWORDS_SORT = ([COL_TRAFFIC, COL_KEYWORD, COL_URL], [True, False, False])
+
+
+@dataclass
+class PartialAggregates:
+    """Merge-ready state for one shard (or for several already merged)."""
+
+    rows: int
+    top_k: int
+    totals: pl.DataFrame
+    by_bucket: pl.DataFrame
+    categories: pl.DataFrame
+    services: pl.DataFrame
+    intents: pl.DataFrame
+    pages: pl.DataFrame
+    top_keywords: pl.DataFrame
+
+
+def _group_state(df: pl.DataFrame, key: str | None, *extra: pl.Expr) -> pl.DataFrame:
+    aggs = [
+        pl.len().alias("keywords"),
+        pl.sum(COL_TRAFFIC).alias("traffic"),
+        pl.sum(COL_TRAFFIC_COST).alias("traffic_cost"),
+        pl.sum(COL_POS).alias("pos_sum"),
+        pl.col(COL_POS).count().alias("pos_count"),
+        *extra,
+    ]
+    if key is None:
+        return df.select(aggs)
+    return df.group_by(key).agg(aggs)
+
+
+def _merge_groups(frames: list[pl.DataFrame], key: str | None) -> pl.DataFrame:
+    stacked = pl.concat(frames, how="vertical")
+    if key is None:
+        return stacked.select(pl.all().sum())
+    return stacked.group_by(key).agg(pl.all().sum())
+
+
+def _avg_position() -> pl.Expr:
+    return (
+        pl.when(pl.col("pos_count") > 0)
+        .then(pl.col("pos_sum") / pl.col("pos_count"))
+        .otherwise(None)
+        .alias("avg_position")
+    )
+
+
+def partial_aggregates(df: pl.DataFrame, top_k: int = 100) -> PartialAggregates:
+    """Map step: compute the partial state of one shard of a `load_positions` frame."""
+    intents = _explode_list_column_from_str(df.select([COL_INTENTS, COL_TRAFFIC]), COL_INTENTS)
+    return PartialAggregates(
+        rows=df.height,
+        top_k=top_k,
+        totals=_group_state(df, None),
+        by_bucket=df.group_by("pos_bucket").agg(
+            pl.len().alias("keywords"),
+            pl.sum(COL_TRAFFIC).alias("traffic"),
+        ),
+        categories=_group_state(df, "url_category"),
+        services=_group_state(
+            df,
+            "service",
+            (pl.when(pl.col("pos_change") > 0).then(1).otherwise(0)).sum().alias("improving"),
+            (pl.when(pl.col("pos_change") < 0).then(1).otherwise(0)).sum().alias("declining"),
+        ),
+        intents=intents.group_by(COL_INTENTS).agg(
+            pl.len().alias("keywords"),
+            pl.sum(COL_TRAFFIC).alias("traffic"),
+        ),
+        pages=_group_state(df, COL_URL),
+        top_keywords=df.sort(_TOP_KEYWORDS_SORT[0], descending=_TOP_KEYWORDS_SORT[1]).head(top_k),
+    )
+
+
+def merge_partials(parts: Iterable[PartialAggregates]) -> PartialAggregates:
+    """Reduce step: merge partial states. Associative and order-independent."""
+    parts = list(parts)
+    if not parts:
+        raise ValueError("merge_partials() needs at least one partial state")
+    top_k = min(p.top_k for p in parts)
+    return PartialAggregates(
+        rows=sum(p.rows for p in parts),
+        top_k=top_k,
+        totals=_merge_groups([p.totals for p in parts], None),
+        by_bucket=_merge_groups([p.by_bucket for p in parts], "pos_bucket"),
+        categories=_merge_groups([p.categories for p in parts], "url_category"),
+        services=_merge_groups([p.services for p in parts], "service"),
+        intents=_merge_groups([p.intents for p in parts], COL_INTENTS),
+        pages=_merge_groups([p.pages for p in parts], COL_URL),
+        top_keywords=(
+            pl.concat([p.top_keywords for p in parts], how="vertical")
+            .sort(_TOP_KEYWORDS_SORT[0], descending=_TOP_KEYWORDS_SORT[1])
+            .head(top_k)
+        ),
+    )
+
+
+def finalize(part: PartialAggregates, top_pages_n: int = 100, top_keywords_n: int | None = None) -> dict:
+    """Turn a (merged) partial state into the single-frame report shapes.
+
+    Keys: overview (same dict as `analysis.overview`), categories, services,
+    intents, top_pages, top_keywords.
+    """
+    total = part.rows
+    tot = part.totals.row(0, named=True)
+    by_bucket = (
+        part.by_bucket.with_columns((pl.col("keywords") / total).alias("share"))
+        .sort("pos_bucket")
+    )
+    avg_pos = tot["pos_sum"] / tot["pos_count"] if tot["pos_count"] else None
+    ov = {
+        "total_keywords": int(total),
+        "traffic": float(tot["traffic"]),
+        "traffic_cost": float(tot["traffic_cost"]),
+        "avg_position": float(avg_pos) if avg_pos is not None else None,
+        "by_bucket": by_bucket,
+    }
+
+    categories = part.categories.select(
+        "url_category", "keywords", "traffic", "traffic_cost", _avg_position()
+    ).sort(["traffic", "url_category"], descending=[True, False])
+    services = part.services.select(
+        "service", "keywords", "traffic", "traffic_cost", _avg_position(), "improving", "declining"
+    ).sort(["traffic", "service"], descending=[True, False])
+    intents = (
+        part.intents.with_columns((pl.col("keywords") / total).alias("share"))
+        .sort(["traffic", COL_INTENTS], descending=[True, False])
+    )
+    top_pages = (
+        part.pages.select(COL_URL, "traffic", "traffic_cost", _avg_position(), "keywords")
+        .sort(["traffic", "traffic_cost", COL_URL], descending=[True, True, False])
+        .head(top_pages_n)
+    )
+    top_keywords = part.top_keywords.head(min(top_keywords_n or part.top_k, part.top_k))
+
+    return {
+        "overview": ov,
+        "categories": categories,
+        "services": services,
+        "intents": intents,
+        "top_pages": top_pages,
+        "top_keywords": top_keywords,
+    }
+
+
+def split_frame(df: pl.DataFrame, n_shards: int) -> list[pl.DataFrame]:
+    """Split a frame into `n_shards` contiguous row slices (some may be empty)."""
+    size = -(-df.height // max(1, n_shards))
+    return [df.slice(i * size, size) for i in range(max(1, n_shards))]
+
+
+def aggregate_sharded(shards: Iterable[pl.DataFrame], top_k: int = 100) -> PartialAggregates:
+    """Map every shard and merge the results."""
+    return merge_partials(partial_aggregates(s, top_k=top_k) for s in shards)
+
+
+_FRAME_FIELDS = [f.name for f in fields(PartialAggregates) if f.name not in ("rows", "top_k")]
+
+
+def save_partial(part: PartialAggregates, out_dir: str | Path) -> Path:
+    """Persist a partial state (Parquet per table + meta.json) for merging elsewhere."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    for name in _FRAME_FIELDS:
+        getattr(part, name).write_parquet(out / f"{name}.parquet")
+    (out / "meta.json").write_text(json.dumps({"rows": part.rows, "top_k": part.top_k}), encoding="utf-8")
+    return out
+
+
+def load_partial(path: str | Path) -> PartialAggregates:
+    src = Path(path)
+    meta = json.loads((src / "meta.json").read_text(encoding="utf-8"))
+    frames = {name: pl.read_parquet(src / f"{name}.parquet") for name in _FRAME_FIELDS}
+    return PartialAggregates(rows=int(meta["rows"]), top_k=int(meta["top_k"]), **frames)
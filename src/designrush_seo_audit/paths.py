@@ -0,0 +1,182 @@
+"""Path-prefix rollups: keyword metrics at every directory depth.
+
+The prefix trie is stored as a parent-pointer table: one row per distinct
+path prefix with its parent prefix, built from the unique URLs one level at
+a time by stripping the last segment. Keyword rows are first reduced to one
+row per URL, and the per-URL sums are then added into every ancestor level
+by level (deepest first) with `np.add.at`, so after the initial group-by the
+work is proportional to the number of distinct prefixes, not keyword rows.
+
+`path_rollup` is the flat table (one row per prefix); `path_tree` nests it
+for collapsible views.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from .analysis import COL_POS, COL_TRAFFIC, COL_TRAFFIC_COST, COL_URL, _wcount, _wcount_if, _wsum
+
+
+def normalize_url(url: pl.Expr) -> pl.Expr:
+    """Drop query string, fragment and trailing slash so hierarchy paths line up."""
+    return url.str.replace(r"[?#].*$", "").str.replace(r"/+$", "")
+
+
+def url_tree(urls: pl.Series) -> pl.DataFrame:
+    """(URL, parent, depth) for every URL and all of its directory ancestors.
+
+    Parents are found one level at a time by stripping the last path
+    segment, so the work is proportional to the number of distinct nodes.
+    `depth` is the number of path segments (0 = site root, whose parent
+    is null).
+    """
+    frontier = (
+        pl.DataFrame({COL_URL: urls})
+        .select(normalize_url(pl.col(COL_URL)).alias(COL_URL))
+        .filter(pl.col(COL_URL).str.contains(r"^[a-z]+://[^/]+"))
+        .unique()
+    )
+    levels = []
+    while frontier.height:
+        level = frontier.with_columns(
+            pl.when(pl.col(COL_URL).str.contains(r"^[a-z]+://[^/]+$"))
+            .then(None)
+            .otherwise(pl.col(COL_URL).str.replace(r"/[^/]*$", ""))
+            .alias("parent")
+        )
+        levels.append(level)
+        seen = pl.concat([lv.select(COL_URL) for lv in levels])
+        frontier = (
+            level.select(pl.col("parent").alias(COL_URL)).drop_nulls().unique().join(seen, on=COL_URL, how="anti")
+        )
+    if not levels:
+        return pl.DataFrame(schema={COL_URL: pl.Utf8, "parent": pl.Utf8, "depth": pl.UInt32})
+    return pl.concat(levels).with_columns(
+        (pl.col(COL_URL).str.count_matches("/") - 2).cast(pl.UInt32).alias("depth")
+    )
+
+
+def subtree_sums(pid: np.ndarray, depth: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Add each node's values into all of its ancestors.
+
+    `pid` is the parent row (-1 for roots), `values` is (n,) or (n, k).
+    Levels are folded deepest first, so each node is visited once.
+    """
+    out = values.copy()
+    for d in range(int(depth.max(initial=0)), 0, -1):
+        at = np.flatnonzero((depth == d) & (pid >= 0))
+        np.add.at(out, pid[at], out[at])
+    return out
+
+
+def path_rollup(df: pl.DataFrame) -> pl.DataFrame:
+    """Keywords, traffic, traffic cost and average position for every path prefix.
+
+    One row per prefix (`/`, `/agency`, `/agency/<service>`, …) with its
+    `parent` prefix, `depth`, number of ranking `pages` below it and the
+    `own_*` share that ranks on the prefix URL itself. Sorted by prefix.
+    """
+    pages = (
+        df.filter(pl.col(COL_URL).is_not_null())
+        .with_columns(normalize_url(pl.col(COL_URL)).alias(COL_URL))
+        .group_by(COL_URL)
+        .agg(
+            _wcount(df).cast(pl.Float64).alias("keywords"),
+            _wsum(df, COL_TRAFFIC).alias("traffic"),
+            _wsum(df, COL_TRAFFIC_COST).alias("traffic_cost"),
+            _wsum(df, COL_POS).cast(pl.Float64).alias("_pos_sum"),
+            _wcount_if(df, pl.col(COL_POS).is_not_null()).cast(pl.Float64).alias("_pos_n"),
+        )
+    )
+    tree = url_tree(pages[COL_URL]).with_row_index("nid")
+    nodes = (
+        tree.join(tree.select(pl.col(COL_URL).alias("parent"), pl.col("nid").alias("pid")), on="parent", how="left")
+        .join(pages, on=COL_URL, how="left")
+        .sort("nid")
+    )
+    metrics = ["keywords", "traffic", "traffic_cost", "_pos_sum", "_pos_n"]
+    own = nodes.select(pl.col(metrics).fill_null(0.0)).to_numpy().astype(np.float64)
+    ranked = nodes["keywords"].is_not_null().to_numpy().astype(np.float64)[:, None]
+    totals = subtree_sums(
+        nodes["pid"].cast(pl.Int64).fill_null(-1).to_numpy(),
+        nodes["depth"].to_numpy(),
+        np.hstack([own, ranked]),
+    )
+    avg_position = np.divide(totals[:, 3], totals[:, 4], out=np.full(len(nodes), np.nan), where=totals[:, 4] > 0)
+    prefix = pl.col(COL_URL).str.replace(r"^[a-z]+://[^/]+", "")
+    total_traffic = float(totals[nodes["parent"].is_null().to_numpy(), 1].sum())
+    return (
+        nodes.with_columns(
+            pl.when(prefix == "").then(pl.lit("/")).otherwise(prefix).alias("prefix"),
+            pl.when(pl.col("parent").is_null())
+            .then(None)
+            .otherwise(pl.col("parent").str.replace(r"^[a-z]+://[^/]+", ""))
+            .alias("parent"),
+            pl.Series("pages", totals[:, 5].astype(np.uint32)),
+            pl.Series("keywords", totals[:, 0]),
+            pl.Series("traffic", totals[:, 1]),
+            pl.Series("traffic_cost", totals[:, 2]),
+            pl.Series("avg_position", avg_position),
+            pl.Series("own_keywords", own[:, 0]),
+            pl.Series("own_traffic", own[:, 1]),
+        )
+        .with_columns(
+            pl.col("parent").replace("", "/"),
+            pl.col("avg_position").fill_nan(None),
+            (pl.col("traffic") / total_traffic if total_traffic else pl.lit(0.0)).alias("traffic_share"),
+        )
+        .sort("prefix")
+        .select(
+            "prefix",
+            "parent",
+            "depth",
+            "pages",
+            "keywords",
+            "traffic",
+            "traffic_share",
+            "traffic_cost",
+            "avg_position",
+            "own_keywords",
+            "own_traffic",
+        )
+    )
+
+
+def path_tree(rollup: pl.DataFrame, max_depth: int | None = None, min_traffic: float = 0.0) -> list[dict]:
+    """Nest `path_rollup` rows into {prefix, …metrics, children} dicts.
+
+    Children are ordered by traffic. Prefixes deeper than `max_depth` or
+    with less than `min_traffic` are dropped (with their subtrees).
+    """
+    rows = rollup
+    if max_depth is not None:
+        rows = rows.filter(pl.col("depth") <= max_depth)
+    if min_traffic:
+        rows = rows.filter(pl.col("traffic") >= min_traffic)
+    nodes: dict[str, dict] = {}
+    parents: list[tuple[str | None, dict]] = []
+    for r in rows.sort(["traffic", "prefix"], descending=[True, False]).iter_rows(named=True):
+        node = {k: v for k, v in r.items() if k != "parent"}
+        node["children"] = []
+        nodes[r["prefix"]] = node
+        parents.append((r["parent"], node))
+    roots = []
+    for parent, node in parents:
+        if parent is None:
+            roots.append(node)
+        elif parent in nodes:
+            nodes[parent]["children"].append(node)
+    return roots
+
+
+def write_path_tree(rollup: pl.DataFrame, path: str | Path, max_depth: int | None = None, min_traffic: float = 0.0) -> Path:
+    """Write `path_tree` as JSON and return the path."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tree = path_tree(rollup, max_depth=max_depth, min_traffic=min_traffic)
+    path.write_text(json.dumps(tree), encoding="utf-8")
+    return path
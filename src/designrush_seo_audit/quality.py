@@ -0,0 +1,439 @@
+"""Rule-based data-quality checks for positions exports.
+
+Every rule is a Polars expression over the prepared (typed) positions
+frame. A row rule has a `mask` flagging offending rows and passes while
+the share of flagged rows stays within its bounds; a frame rule has a
+scalar `metric` (a sum, a span, a share) that must lie within them. The
+whole suite — counts, metrics and the first few offending rows of every
+rule — is one `select`, so a lazy scan of the export is read exactly once.
+
+Values that fail the type casts in `prepare_positions` arrive as nulls
+and are caught by the null-rate rules. Fatal rules make `check_positions`
+raise `DataQualityError` after the pass; the others are reported as
+warnings.
+
+`load_positions_quarantined` is the row-level ingestion mode: the export
+is read once as raw lines and stray quotes are found with vectorized quote
+counts (a line leaving a quote open continues on the next, so quoted line
+breaks stay in one record). Well-quoted records are parsed with every
+field as text (so a bad value or an extra field cannot abort the parse);
+only the broken lines are split by hand. Each row gets the reason codes it
+fails — broken quoting, a value that does not parse as its column type,
+extra fields, or a fatal row rule — and only clean rows go on to
+`prepare_positions`. Rejects keep their raw text, CSV line number and reasons
+for `quarantine.parquet`.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Sequence
+
+import polars as pl
+
+from .analysis import (
+    COL_COMPETITION,
+    COL_CPC,
+    COL_INTENTS,
+    COL_KD,
+    COL_KEYWORD,
+    COL_POS,
+    COL_POSITION_TYPE,
+    COL_PREV_POS,
+    COL_SERP_FEATS,
+    COL_TIMESTAMP,
+    COL_TRAFFIC,
+    COL_TRAFFIC_PCT,
+    COL_URL,
+    COL_VOLUME,
+    NUMERIC_TYPES,
+    REQUIRED_COLUMNS,
+    prepare_positions,
+    scan_positions_csv,
+)
+
+
+# 0-based data row of the export (CSV line = row + 2, after the header)
+ROW = "row"
+SAMPLE_SIZE = 5
+# Always shown next to the rule's own columns in sample rows
+_SAMPLE_KEYS = (COL_KEYWORD, COL_URL, COL_POS)
+# Spare column catching fields beyond the header in quarantine mode
+_EXTRA = "extra_fields"
+# A CSV line whose fields are each bare (no quotes) or fully quoted with "" escapes
+_QUOTED = r'"(?:[^"]|"")*"'
+_FIELD = rf'(?:{_QUOTED}|[^",\r\n]*)'
+_WELL_QUOTED = rf"^{_FIELD}(?:,{_FIELD})*\r?$"
+# Longest record a quoted line break may stretch over
+_MAX_RECORD_LINES = 100
+
+
+@dataclass(frozen=True)
+class Rule:
+    """One check: a row `mask` (True = offending) or a scalar `metric`, within [lower, upper].
+
+    For row rules the bounded value is the share of flagged rows; a frame
+    rule may still carry a `mask` to sample the rows behind its metric.
+    """
+
+    name: str
+    description: str
+    mask: pl.Expr | None = None
+    metric: pl.Expr | None = None
+    lower: float | None = None
+    upper: float | None = 0.0
+    fatal: bool = False
+
+
+def null_rule(column: str, max_rate: float = 0.0, fatal: bool = False) -> Rule:
+    return Rule(
+        f"null_{column.lower().replace(' ', '_')}",
+        f"{column} is missing or not parseable",
+        mask=pl.col(column).is_null(),
+        upper=max_rate,
+        fatal=fatal,
+    )
+
+
+def range_rule(column: str, lower: float | None, upper: float | None, fatal: bool = False) -> Rule:
+    """Non-null values of `column` outside [lower, upper]."""
+    value = pl.col(column)
+    outside = pl.lit(False)
+    if lower is not None:
+        outside = outside | (value < lower)
+    if upper is not None:
+        outside = outside | (value > upper)
+    bounds = f"[{'' if lower is None else lower}, {'' if upper is None else upper}]"
+    return Rule(
+        f"range_{column.lower().replace(' ', '_').replace('(%)', 'pct')}",
+        f"{column} outside {bounds}",
+        mask=outside.fill_null(False),
+        fatal=fatal,
+    )
+
+
+DEFAULT_RULES: tuple[Rule, ...] = (
+    Rule("empty", "the export has no rows", metric=pl.len(), lower=1, upper=None, fatal=True),
+    null_rule(COL_KEYWORD, fatal=True),
+    null_rule(COL_URL, fatal=True),
+    null_rule(COL_POS, fatal=True),
+    null_rule(COL_VOLUME, 0.01),
+    null_rule(COL_CPC, 0.01),
+    null_rule(COL_KD, 0.01),
+    null_rule(COL_TRAFFIC, 0.01),
+    null_rule(COL_INTENTS, 0.05),
+    null_rule(COL_SERP_FEATS, 0.05),
+    range_rule(COL_POS, 1, 100, fatal=True),
+    range_rule(COL_PREV_POS, 0, 100),
+    range_rule(COL_VOLUME, 0, None),
+    range_rule(COL_KD, 0, 100),
+    range_rule(COL_CPC, 0, None),
+    range_rule(COL_TRAFFIC, 0, None),
+    range_rule(COL_TRAFFIC_PCT, 0, 100),
+    range_rule(COL_COMPETITION, 0, 1),
+    Rule(
+        "duplicate_keyword_url",
+        "Keyword + URL listed twice for the same Position Type",
+        mask=pl.struct(COL_KEYWORD, COL_URL, COL_POSITION_TYPE).is_duplicated(),
+    ),
+    Rule(
+        "traffic_pct_total",
+        "Traffic (%) over all rows above ~100 (a full-domain export sums to ~100, a section export to its share)",
+        metric=pl.sum(COL_TRAFFIC_PCT),
+        upper=101.0,
+    ),
+    Rule(
+        "timestamp_unparsed",
+        "Timestamp is missing or not a date",
+        mask=pl.col(COL_TIMESTAMP).is_null(),
+    ),
+    Rule(
+        "timestamp_future",
+        "Timestamp after today",
+        mask=(pl.col(COL_TIMESTAMP) > date.today()).fill_null(False),
+    ),
+    Rule(
+        "timestamp_span_days",
+        "days between the oldest and newest Timestamp (one export spans about a month)",
+        metric=(pl.max(COL_TIMESTAMP) - pl.min(COL_TIMESTAMP)).dt.total_days(),
+        upper=45,
+    ),
+    Rule(
+        "unclassified_url_share",
+        "share of rows whose URL the service taxonomy labels 'other'",
+        mask=pl.col("service") == "other",
+        upper=0.25,
+    ),
+)
+
+
+@dataclass
+class RuleResult:
+    rule: Rule
+    violations: int | None
+    value: float | None
+    samples: pl.DataFrame
+
+    @property
+    def passed(self) -> bool:
+        if self.value is None:  # metric undefined (e.g. no parseable dates): nothing to flag
+            return True
+        lo, hi = self.rule.lower, self.rule.upper
+        return (lo is None or self.value >= lo) and (hi is None or self.value <= hi)
+
+
+@dataclass
+class QualityReport:
+    rows: int
+    results: list[RuleResult] = field(default_factory=list)
+
+    @property
+    def failures(self) -> list[RuleResult]:
+        return [r for r in self.results if not r.passed]
+
+    @property
+    def fatal(self) -> list[RuleResult]:
+        return [r for r in self.failures if r.rule.fatal]
+
+    def table(self) -> pl.DataFrame:
+        """One row per rule: severity, pass/fail, violating rows, checked value and bounds."""
+        return pl.DataFrame(
+            {
+                "rule": [r.rule.name for r in self.results],
+                "severity": ["fatal" if r.rule.fatal else "warning" for r in self.results],
+                "passed": [r.passed for r in self.results],
+                "violations": [r.violations for r in self.results],
+                "value": [r.value for r in self.results],
+                "lower": [r.rule.lower for r in self.results],
+                "upper": [r.rule.upper for r in self.results],
+                "description": [r.rule.description for r in self.results],
+            },
+            schema_overrides={"violations": pl.Int64, "value": pl.Float64, "lower": pl.Float64, "upper": pl.Float64},
+        )
+
+    def samples(self) -> pl.DataFrame:
+        """Sample offending rows of the failed rules, tagged with the rule name."""
+        parts = [
+            r.samples.select(pl.lit(r.rule.name).alias("rule"), pl.all().cast(pl.Utf8))
+            for r in self.failures
+            if r.samples.height
+        ]
+        if not parts:
+            return pl.DataFrame(schema={"rule": pl.Utf8, ROW: pl.Utf8})
+        return pl.concat(parts, how="diagonal")
+
+
+class DataQualityError(ValueError):
+    """Raised when fatal rules fail; the full report is on `.report`."""
+
+    def __init__(self, report: QualityReport) -> None:
+        self.report = report
+        names = ", ".join(r.rule.name for r in report.fatal)
+        super().__init__(f"Fatal data-quality rules failed: {names}")
+
+
+def evaluate_rules(
+    source: pl.DataFrame | pl.LazyFrame,
+    rules: Sequence[Rule] = DEFAULT_RULES,
+    sample_size: int = SAMPLE_SIZE,
+) -> QualityReport:
+    """Evaluate every rule on a prepared positions frame in one `select` pass."""
+    lf = source.lazy().with_row_index(ROW)
+    names = set(lf.collect_schema().names())
+    exprs = [pl.len().alias("_rows")]
+    sample_cols: list[list[str]] = []
+    for i, rule in enumerate(rules):
+        if rule.metric is not None:
+            exprs.append(rule.metric.cast(pl.Float64).alias(f"_v{i}"))
+        cols: list[str] = []
+        if rule.mask is not None:
+            mask = rule.mask.fill_null(False)
+            own = [c for c in rule.mask.meta.root_names() if c in names]
+            cols = list(dict.fromkeys([ROW, *(c for c in _SAMPLE_KEYS if c in names), *own]))
+            exprs.append(mask.sum().alias(f"_n{i}"))
+            exprs.append(pl.struct(cols).filter(mask).head(sample_size).implode().alias(f"_s{i}"))
+        sample_cols.append(cols)
+    out = lf.select(exprs).collect().row(0, named=True)
+
+    rows = int(out["_rows"])
+    report = QualityReport(rows=rows)
+    for i, rule in enumerate(rules):
+        violations = int(out[f"_n{i}"]) if rule.mask is not None else None
+        if rule.metric is not None:
+            value = out[f"_v{i}"]
+        else:
+            value = violations / rows if rows else 0.0
+        sampled = out.get(f"_s{i}")
+        samples = pl.DataFrame(sampled) if sampled else pl.DataFrame(schema=sample_cols[i])
+        report.results.append(RuleResult(rule, violations, value, samples))
+    return report
+
+
+def check_positions(
+    source: str | Path | pl.DataFrame | pl.LazyFrame,
+    rules: Sequence[Rule] = DEFAULT_RULES,
+    sample_size: int = SAMPLE_SIZE,
+    fail_fast: bool = True,
+) -> QualityReport:
+    """Run the rule suite on an export path (scanned lazily) or a prepared frame.
+
+    With `fail_fast`, raises `DataQualityError` when any fatal rule fails;
+    warnings never raise.
+    """
+    if isinstance(source, (str, Path)):
+        source = prepare_positions(scan_positions_csv(source))
+    report = evaluate_rules(source, rules, sample_size)
+    if fail_fast and report.fatal:
+        raise DataQualityError(report)
+    return report
+
+
+def _slug(column: str) -> str:
+    return column.lower().replace("(%)", "pct").strip().replace(" ", "_")
+
+
+def _read_raw(csv_path: str | Path, header: list[str]) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Every data record as text fields with its CSV `line`, and the lines whose quoting is broken.
+
+    The file is read once as raw lines. A line leaving a quote open continues
+    on the next (a quoted line break) until the quotes balance; a joined
+    record is kept when it is well quoted with one field per column, else its
+    lines are judged one by one. Lines with an odd number of quotes, or
+    quotes around part of a field, are broken and come back split on every
+    comma, quotes kept.
+    """
+    width = len(header)
+    lines = (
+        pl.read_csv(
+            csv_path,
+            has_header=False,
+            separator="\x00",
+            quote_char=None,
+            schema={"text": pl.Utf8},
+            truncate_ragged_lines=True,
+        )
+        .with_row_index("line", offset=1)
+        .slice(1)
+        .with_columns(pl.col("text").fill_null(""))
+        .with_columns(pl.col("text").str.count_matches('"', literal=True).alias("quotes"))
+    )
+    records = lines
+    if (lines["quotes"] % 2 == 1).any():
+        # A record starts wherever every quote before it is closed; only the
+        # lines of records spanning several lines are grouped
+        open_after = ((pl.col("quotes") % 2).cum_sum() % 2).cast(pl.Boolean)
+        open_before = open_after.shift(1, fill_value=False)
+        lines = lines.with_columns((~open_before).cum_sum().alias("record"), open_after.alias("open")).with_columns(
+            (pl.col("open") | open_before).alias("spans")
+        )
+        spanning = (
+            lines.filter(pl.col("spans"))
+            # Quotes still open at the end of the file, or over too many lines, are broken
+            .filter(~pl.col("open").last().over("record") & (pl.len().over("record") <= _MAX_RECORD_LINES))
+            .group_by("record", maintain_order=True)
+            .agg(pl.first("line"), pl.col("text").str.join("\n"), pl.sum("quotes"))
+            .filter(
+                pl.col("text").str.contains(_WELL_QUOTED)
+                & (pl.col("text").str.replace_all(_QUOTED, "").str.count_matches(",", literal=True) + 1 == width)
+            )
+        )
+        # Lines of records that never close properly are judged one by one
+        records = pl.concat(
+            [
+                lines.filter(~pl.col("spans") | ~pl.col("record").is_in(spanning["record"].implode())).select(
+                    "line", "text", "quotes"
+                ),
+                spanning.select("line", "text", "quotes"),
+            ]
+        ).sort("line")
+    records = records.filter(pl.col("text").str.strip_chars() != "").with_columns(
+        ((pl.col("quotes") == 0) | ((pl.col("quotes") % 2 == 0) & pl.col("text").str.contains(_WELL_QUOTED))).alias("ok")
+    )
+    schema = {**{c: pl.Utf8 for c in header}, _EXTRA: pl.Utf8}
+    good = records.filter(pl.col("ok"))
+    fields = (
+        pl.read_csv(
+            good.select(pl.col("text").str.join("\n")).item().encode("utf-8"),
+            has_header=False,
+            schema=schema,
+            truncate_ragged_lines=True,
+        )
+        if good.height
+        else pl.DataFrame(schema=schema)
+    )
+    # Broken lines only: split on every comma, quotes kept
+    split = pl.col("text").str.split(",")
+    malformed = records.filter(~pl.col("ok")).select(
+        "line", *(split.list.get(i, null_on_oob=True).replace("", None).alias(c) for i, c in enumerate(schema))
+    )
+    return good.select("line").hstack(fields), malformed
+
+
+def load_positions_quarantined(
+    csv_path: str | Path,
+    rules: Sequence[Rule] = DEFAULT_RULES,
+) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Parse the export once, split it into clean prepared rows and quarantined raw rows.
+
+    Reason codes: `unparsed_<column>` (a non-empty value that is not a
+    number or date), `extra_fields` (more fields than the header),
+    `malformed_quotes` (a stray or unbalanced quote; the fields are split
+    on every comma) and the names of the fatal row `rules` (e.g.
+    null_position, range_position). Returns (clean, quarantine);
+    quarantine has `line` (1-based CSV line where the record starts), `reason` (comma-separated codes) and the raw
+    text columns.
+    """
+    header = pl.scan_csv(csv_path, infer_schema=False).collect_schema().names()
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    raw, malformed = _read_raw(csv_path, header)
+    typed = {c: pl.col(c).cast(dtype, strict=False) for c, dtype in NUMERIC_TYPES.items()}
+    typed[COL_TIMESTAMP] = pl.col(COL_TIMESTAMP).str.to_date(strict=False)
+    # One boolean column per reason code; text checks run before the typed values replace the text
+    text_checks = {
+        f"unparsed_{_slug(c)}": (pl.col(c).str.strip_chars() != "") & value.is_null() for c, value in typed.items()
+    }
+    text_checks["extra_fields"] = pl.col(_EXTRA).is_not_null()
+    # Fatal row rules see typed values, as they do after prepare_positions
+    rule_checks = {r.name: r.mask for r in rules if r.fatal and r.mask is not None}
+    codes = [*text_checks, *rule_checks]
+    frame = (
+        raw.with_columns(cond.fill_null(False).alias(f"_{code}") for code, cond in text_checks.items())
+        .with_columns(value.alias(c) for c, value in typed.items())
+        .with_columns(
+            pl.col(COL_KEYWORD).str.strip_chars().replace("", None),
+            pl.col(COL_URL).str.strip_chars().replace("", None),
+        )
+        .with_columns(cond.fill_null(False).alias(f"_{code}") for code, cond in rule_checks.items())
+    )
+    flags = [f"_{code}" for code in codes]
+    bad = frame.select(pl.any_horizontal(flags)).to_series()
+    # Reason strings are built for the rejected rows only
+    reasons = frame.filter(bad).select(
+        pl.concat_list(pl.when(pl.col(f"_{code}")).then(pl.lit(code)) for code in codes)
+        .list.drop_nulls()
+        .list.join(",")
+        .alias("reason")
+    )
+    quarantine = pl.concat(
+        [
+            raw.filter(bad).with_columns(reasons["reason"]).select("line", "reason", *header, _EXTRA),
+            malformed.select("line", pl.lit("malformed_quotes").alias("reason"), *header, _EXTRA),
+        ]
+    ).sort("line")
+    clean = prepare_positions(frame.filter(~bad).drop("line", *flags, _EXTRA))
+    return clean, quarantine
+
+
+def quarantine_summary(quarantine: pl.DataFrame, rows: int) -> pl.DataFrame:
+    """Quarantined rows per reason code (a row counts once for each of its codes)."""
+    return (
+        quarantine.select(pl.col("reason").str.split(","))
+        .explode("reason")
+        .group_by("reason")
+        .agg(pl.len().alias("rows"))
+        .with_columns((pl.col("rows") / max(rows, 1)).alias("share"))
+        .sort(["rows", "reason"], descending=[True, False])
+    )
@@ -0,0 +1,188 @@
+"""Stratified-sample draft mode for quick previews of huge exports.
+
+Rows are stratified by service × pos_bucket. High-value rows (top traffic or
+top volume×CPC) are always kept; the long tail of each stratum is sampled
+without replacement at `fraction` (at least `min_per_stratum` rows). Every
+kept row carries `sample_weight` = N_h / n_h, which the aggregate functions
+in `analysis` use to scale counts and sums back up to full-export estimates.
+
+Keyword counts per service and per position bucket are exact (they are the
+strata); traffic and traffic cost are estimates, with standard errors from
+`sample_error_bars`.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import polars as pl
+
+from .analysis import (
+    COL_CPC,
+    COL_POS,
+    COL_TRAFFIC,
+    COL_TRAFFIC_COST,
+    COL_URL,
+    COL_VOLUME,
+    SAMPLE_WEIGHT,
+    bucket_position,
+    prepare_positions,
+    read_positions_csv,
+    url_service,
+)
+
+
+STRATA = ("service", "pos_bucket")
+
+
+def _sample_plan(
+    keys: pl.DataFrame,
+    fraction: float,
+    keep_quantile: float,
+    min_per_stratum: int,
+    seed: int,
+) -> pl.DataFrame:
+    """Return `keys` with a boolean `keep` and the per-row `sample_weight`.
+
+    `keys` needs Traffic, priority (volume×CPC) and the strata columns.
+    """
+    t_cut = keys[COL_TRAFFIC].quantile(keep_quantile) or 0.0
+    p_cut = keys["priority"].quantile(keep_quantile) or 0.0
+    high = ((pl.col(COL_TRAFFIC) > 0) & (pl.col(COL_TRAFFIC) >= t_cut)) | (
+        (pl.col("priority") > 0) & (pl.col("priority") >= p_cut)
+    )
+    group = [*STRATA, "_high"]
+    return (
+        keys.with_columns(
+            high.fill_null(False).alias("_high"),
+            # Seeded hash of the global row index: the order must not depend on
+            # a row's position inside its stratum, or every stratum keeps the
+            # same positions (and the export is sorted by traffic)
+            pl.int_range(pl.len()).hash(seed).alias("_hash"),
+        )
+        .with_columns(
+            pl.len().over(group).alias("_N"),
+            # Deterministic pseudo-random order within each stratum
+            pl.col("_hash").rank("ordinal").over(group).alias("_rank"),
+        )
+        .with_columns(
+            pl.min_horizontal(
+                pl.col("_N"),
+                pl.max_horizontal(
+                    pl.lit(min_per_stratum), (pl.col("_N") * fraction).ceil().cast(pl.Int64)
+                ),
+            ).alias("_n")
+        )
+        .select(
+            (pl.col("_high") | (pl.col("_rank") <= pl.col("_n"))).alias("keep"),
+            pl.when(pl.col("_high"))
+            .then(1.0)
+            .otherwise(pl.col("_N") / pl.col("_n"))
+            .alias(SAMPLE_WEIGHT),
+        )
+    )
+
+
+def stratified_sample(
+    df: pl.DataFrame,
+    fraction: float = 0.05,
+    keep_quantile: float = 0.99,
+    min_per_stratum: int = 5,
+    seed: int = 0,
+) -> pl.DataFrame:
+    """Draw a weighted stratified sample from a `load_positions` frame."""
+    keys = df.select(
+        COL_TRAFFIC,
+        (pl.col(COL_VOLUME) * pl.col(COL_CPC).fill_null(0.0)).alias("priority"),
+        *STRATA,
+    )
+    plan = _sample_plan(keys, fraction, keep_quantile, min_per_stratum, seed)
+    return df.with_columns(plan[SAMPLE_WEIGHT]).filter(plan["keep"])
+
+
+def load_positions_sample(
+    csv_path: str | Path,
+    fraction: float = 0.05,
+    keep_quantile: float = 0.99,
+    min_per_stratum: int = 5,
+    seed: int = 0,
+) -> pl.DataFrame:
+    """Like `load_positions`, but only the sampled rows are normalized and enriched.
+
+    The strata are derived from cheap casts plus `url_service` over unique
+    URLs, so the full-size work is one CSV parse and a few vectorized passes.
+    """
+    raw = read_positions_csv(csv_path)
+    urls = raw.select(pl.col(COL_URL).cast(pl.Utf8).str.strip_chars())
+    uniq = urls.unique().with_columns(url_service(pl.col(COL_URL)).alias("service"))
+    keys = raw.select(
+        pl.col(COL_TRAFFIC).cast(pl.Float64, strict=False),
+        (
+            pl.col(COL_VOLUME).cast(pl.Int64, strict=False)
+            * pl.col(COL_CPC).cast(pl.Float64, strict=False).fill_null(0.0)
+        ).alias("priority"),
+        urls[COL_URL]
+        .replace_strict(uniq[COL_URL], uniq["service"], default="other")
+        .alias("service"),
+        bucket_position(pl.col(COL_POS).cast(pl.Int64, strict=False)).alias("pos_bucket"),
+    )
+    plan = _sample_plan(keys, fraction, keep_quantile, min_per_stratum, seed)
+    sampled = raw.filter(plan["keep"])
+    weights = plan.filter(pl.col("keep"))[SAMPLE_WEIGHT]
+    return prepare_positions(sampled).with_columns(weights)
+
+
+def sample_error_bars(df: pl.DataFrame, columns: tuple[str, ...] = (COL_TRAFFIC, COL_TRAFFIC_COST)) -> pl.DataFrame:
+    """Estimates and standard errors for sums, overall and per service.
+
+    Uses the stratified estimator variance
+    sum_h N_h^2 (1 - n_h/N_h) s_h^2 / n_h over the sampled tail strata; rows
+    kept with certainty contribute no variance.
+    """
+    tail = (
+        df.filter(pl.col(SAMPLE_WEIGHT) > 1)
+        .group_by(list(STRATA))
+        .agg(
+            pl.len().alias("n"),
+            pl.first(SAMPLE_WEIGHT).alias("w"),
+            *[pl.col(c).var().fill_null(0.0).alias(f"var_{c}") for c in columns],
+        )
+        .with_columns((pl.col("w") * pl.col("n")).alias("N"))
+        .select(
+            "service",
+            *[
+                (
+                    pl.col("N") ** 2 * (1 - pl.col("n") / pl.col("N")) * pl.col(f"var_{c}") / pl.col("n")
+                ).alias(c)
+                for c in columns
+            ],
+        )
+    )
+    estimates = df.group_by("service").agg(
+        [(pl.col(c) * pl.col(SAMPLE_WEIGHT)).sum().alias(c) for c in columns]
+    )
+    variances = tail.group_by("service").agg([pl.sum(c) for c in columns])
+    per_service = (
+        estimates.unpivot(index="service", variable_name="metric", value_name="estimate")
+        .join(
+            variances.unpivot(index="service", variable_name="metric", value_name="variance"),
+            on=["service", "metric"],
+            how="left",
+        )
+        .with_columns(pl.col("variance").fill_null(0.0))
+    )
+    overall = (
+        per_service.group_by("metric")
+        .agg(pl.sum("estimate"), pl.sum("variance"))
+        .with_columns(pl.lit("(all)").alias("service"))
+        .select(per_service.columns)
+        .sort("metric")
+    )
+    return (
+        pl.concat([overall, per_service.sort(["metric", "estimate"], descending=[False, True])], how="vertical")
+        .with_columns(pl.col("variance").sqrt().alias("std_error"))
+        .with_columns(
+            (pl.col("estimate") - 1.96 * pl.col("std_error")).alias("ci95_low"),
+            (pl.col("estimate") + 1.96 * pl.col("std_error")).alias("ci95_high"),
+        )
+        .drop("variance")
+    )
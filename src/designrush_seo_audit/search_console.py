@@ -0,0 +1,219 @@
+"""Google Search Console performance exports and a calibrated CTR curve.
+
+`position_ctr` is a hand-tuned table. With a GSC export (query, page,
+clicks, impressions, position) the curve can be measured instead:
+
+- the export is scanned lazily (CSV or Parquet) and reduced with a streaming
+  group-by to one row per (normalized query, normalized page) and one row
+  per (page, position bin), so tens of millions of rows never sit in memory
+- the per-pair table is hash-joined to the SEMrush frame on normalized
+  keyword and URL
+- CTR per position bin is clicks / impressions, shrunk toward a prior
+  (the hand-tuned table for the global curve, the global curve for each
+  service) with `prior_impressions` pseudo-impressions, then made
+  non-increasing in position by weighted isotonic regression
+
+`CtrCurve` plugs into `forecast_quick_wins_uplift` and `quick_win_uplift`.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from .analysis import COL_KEYWORD, COL_POS, COL_URL, position_ctr, position_ctr_expr, url_service
+from .paths import normalize_url
+
+
+MAX_POSITION = 20  # positions above this share one tail bin (MAX_POSITION + 1)
+PRIOR_IMPRESSIONS = 500.0
+
+# GSC column names (UI, API and bulk-export spellings) → canonical names
+_COLUMNS = {
+    "query": "query",
+    "top queries": "query",
+    "queries": "query",
+    "page": "page",
+    "url": "page",
+    "top pages": "page",
+    "landing page": "page",
+    "clicks": "clicks",
+    "impressions": "impressions",
+    "position": "position",
+    "average position": "position",
+}
+
+
+def normalize_query(q: pl.Expr) -> pl.Expr:
+    """Lowercase, trimmed, single-spaced query text."""
+    return q.str.to_lowercase().str.replace_all(r"\s+", " ").str.strip_chars()
+
+
+def position_bin(pos: pl.Expr) -> pl.Expr:
+    """Rounded position, clipped to 1..MAX_POSITION + 1."""
+    return pos.round(0).clip(1, MAX_POSITION + 1).cast(pl.Int32)
+
+
+def scan_gsc(path: str | Path) -> pl.LazyFrame:
+    """Lazy (query, page, clicks, impressions, position) over a GSC export (CSV or Parquet)."""
+    path = Path(path)
+    lf = pl.scan_parquet(path) if path.suffix == ".parquet" else pl.scan_csv(path, infer_schema=False)
+    names = lf.collect_schema().names()
+    rename = {c: _COLUMNS[c.strip().lower()] for c in names if c.strip().lower() in _COLUMNS}
+    missing = {"query", "page", "clicks", "impressions", "position"} - set(rename.values())
+    if missing:
+        raise ValueError(f"GSC export {path} is missing columns: {sorted(missing)}")
+    return lf.rename(rename).select(
+        normalize_query(pl.col("query").cast(pl.Utf8)).alias("query"),
+        normalize_url(pl.col("page").cast(pl.Utf8)).alias("page"),
+        pl.col("clicks").cast(pl.Float64, strict=False).fill_null(0.0),
+        pl.col("impressions").cast(pl.Float64, strict=False).fill_null(0.0),
+        pl.col("position").cast(pl.Float64, strict=False),
+    ).filter((pl.col("impressions") > 0) & pl.col("position").is_not_null())
+
+
+def gsc_pairs(lf: pl.LazyFrame) -> pl.DataFrame:
+    """One row per (query, page): summed clicks/impressions, impression-weighted position."""
+    return (
+        lf.group_by("query", "page")
+        .agg(
+            pl.sum("clicks").alias("gsc_clicks"),
+            pl.sum("impressions").alias("gsc_impressions"),
+            ((pl.col("position") * pl.col("impressions")).sum() / pl.sum("impressions")).alias("gsc_position"),
+        )
+        .with_columns((pl.col("gsc_clicks") / pl.col("gsc_impressions")).alias("gsc_ctr"))
+        .collect(engine="streaming")
+    )
+
+
+def join_gsc(df: pl.DataFrame, pairs: pl.DataFrame) -> pl.DataFrame:
+    """SEMrush rows with the matching GSC (query, page) metrics, nulls where unmatched."""
+    return (
+        df.with_columns(
+            normalize_query(pl.col(COL_KEYWORD)).alias("query"),
+            normalize_url(pl.col(COL_URL)).alias("page"),
+        )
+        .join(pairs, on=["query", "page"], how="left", maintain_order="left")
+        .drop("query", "page")
+    )
+
+
+def _isotonic_decreasing(y: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """Weighted least-squares fit of a non-increasing sequence (pool adjacent violators)."""
+    vals, wts, sizes = [], [], []
+    for v, wt in zip(y, np.maximum(w, 1e-9)):
+        vals.append(v)
+        wts.append(wt)
+        sizes.append(1)
+        while len(vals) > 1 and vals[-2] < vals[-1]:
+            wt = wts[-2] + wts[-1]
+            vals[-2] = (vals[-2] * wts[-2] + vals[-1] * wts[-1]) / wt
+            wts[-2] = wt
+            sizes[-2] += sizes[-1]
+            del vals[-1], wts[-1], sizes[-1]
+    return np.repeat(vals, sizes)
+
+
+@dataclass
+class CtrCurve:
+    """CTR by position bin, globally and per service.
+
+    `table` has columns service (null = global), position (1..MAX_POSITION + 1),
+    clicks, impressions, ctr_raw and ctr.
+    """
+
+    table: pl.DataFrame
+
+    def __post_init__(self) -> None:
+        glob = self.table.filter(pl.col("service").is_null())
+        svc = self.table.filter(pl.col("service").is_not_null())
+        self._global = dict(zip(glob["position"].to_list(), glob["ctr"].to_list()))
+        self._service = dict(
+            zip((svc["service"] + "|" + svc["position"].cast(pl.Utf8)).to_list(), svc["ctr"].to_list())
+        )
+
+    def ctr(self, pos: float, service: str | None = None) -> float:
+        b = int(min(max(round(pos), 1), MAX_POSITION + 1))
+        return self._service.get(f"{service}|{b}", self._global[b])
+
+    def expr(self, pos: pl.Expr, service: pl.Expr | None = None) -> pl.Expr:
+        """CTR for a position expression, per service when given (falling back to the global curve)."""
+        b = position_bin(pos)
+        global_ctr = b.replace_strict(self._global, default=None, return_dtype=pl.Float64)
+        if service is None or not self._service:
+            return global_ctr
+        return (
+            pl.concat_str([service, pl.lit("|"), b.cast(pl.Utf8)])
+            .replace_strict(self._service, default=None, return_dtype=pl.Float64)
+            .fill_null(global_ctr)
+        )
+
+
+def _smooth(bins: pl.DataFrame, prior: np.ndarray, prior_impressions: float) -> np.ndarray:
+    """Shrink bin CTRs toward `prior`, then force them non-increasing in position."""
+    clicks = bins["clicks"].to_numpy()
+    impressions = bins["impressions"].to_numpy()
+    shrunk = (clicks + prior_impressions * prior) / (impressions + prior_impressions)
+    return _isotonic_decreasing(shrunk, impressions + prior_impressions)
+
+
+def fit_ctr_curve(
+    lf: pl.LazyFrame,
+    by_service: bool = True,
+    prior_impressions: float = PRIOR_IMPRESSIONS,
+) -> CtrCurve:
+    """Fit the global (and per-service) CTR curve from a scanned GSC export."""
+    positions = np.arange(1, MAX_POSITION + 2)
+    grid = pl.DataFrame({"position": positions.astype(np.int32)})
+    by_page = (
+        lf.group_by("page", position_bin(pl.col("position")).alias("position"))
+        .agg(pl.sum("clicks"), pl.sum("impressions"))
+        .collect(engine="streaming")
+    )
+
+    def binned(frame: pl.DataFrame) -> pl.DataFrame:
+        sums = frame.group_by("position").agg(pl.sum("clicks"), pl.sum("impressions"))
+        return grid.join(sums, on="position", how="left").with_columns(pl.col("clicks", "impressions").fill_null(0.0))
+
+    base = np.array([position_ctr(int(p)) for p in positions])
+    glob = binned(by_page)
+    glob_ctr = _smooth(glob, base, prior_impressions)
+    parts = [glob.with_columns(pl.lit(None, dtype=pl.Utf8).alias("service"), pl.Series("ctr", glob_ctr))]
+    if by_service and by_page.height:
+        pages = by_page.select("page").unique().with_columns(url_service(pl.col("page")).alias("service"))
+        with_svc = by_page.join(pages, on="page")
+        for (svc,), part in with_svc.group_by("service", maintain_order=True):
+            bins = binned(part)
+            ctr = _smooth(bins, glob_ctr, prior_impressions)
+            parts.append(bins.with_columns(pl.lit(svc).alias("service"), pl.Series("ctr", ctr)))
+    table = (
+        pl.concat(parts)
+        .with_columns(
+            pl.when(pl.col("impressions") > 0).then(pl.col("clicks") / pl.col("impressions")).alias("ctr_raw")
+        )
+        .select("service", "position", "clicks", "impressions", "ctr_raw", "ctr")
+        .sort("service", "position", nulls_last=False)
+    )
+    return CtrCurve(table)
+
+
+def gsc_reports(df: pl.DataFrame, path: str | Path) -> tuple[CtrCurve, dict[str, pl.DataFrame]]:
+    """Calibrated curve plus `ctr_curve` and `gsc_keywords` (SEMrush rows matched to GSC) tables."""
+    lf = scan_gsc(path)
+    curve = fit_ctr_curve(lf)
+    joined = join_gsc(df, gsc_pairs(lf)).filter(pl.col("gsc_impressions").is_not_null())
+    keywords = joined.select(
+        COL_KEYWORD,
+        COL_URL,
+        "service",
+        COL_POS,
+        "gsc_position",
+        "gsc_clicks",
+        "gsc_impressions",
+        "gsc_ctr",
+        curve.expr(pl.col(COL_POS), pl.col("service")).alias("ctr_curve"),
+        position_ctr_expr(pl.col(COL_POS)).alias("ctr_table"),
+    )
+    return curve, {"ctr_curve": curve.table, "gsc_keywords": keywords}
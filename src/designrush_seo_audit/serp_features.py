@@ -0,0 +1,211 @@
+"""SERP-feature co-occurrence: which feature combinations our rankings sit under.
+
+`serp_features_presence` looks at features one at a time. Here every
+keyword's feature list is encoded as a bitmask over the features seen in
+the export, most frequent first (past 64, the rarest share one `(other)`
+bit), and rows are reduced in one group-by to one row per distinct mask with
+keyword, traffic and top-3 traffic totals. Everything else works on those
+few hundred masks:
+
+- `feature_pairs`: the feature × feature co-occurrence matrix as
+  `Xᵀ · diag(w) · X` over the mask indicator matrix, weighted by keywords,
+  traffic and top-3 traffic (the diagonal is the single-feature total)
+- `feature_combos`: exact feature sets ranked by keywords
+- `traffic_under`: keywords/traffic whose SERP contains a given feature set
+  (`mask & m == m`), e.g. AI overview + People also ask + Local pack
+"""
+from __future__ import annotations
+
+import warnings
+from typing import Iterable
+
+import numpy as np
+import polars as pl
+
+from .analysis import COL_POS, COL_SERP_FEATS, COL_TRAFFIC, _wcount, _wcount_if, _wsum
+
+
+MASK = "serp_mask"
+# Bit shared by the rarest features once more than 64 are seen
+OTHER = "(other)"
+MAX_FEATURES = 64
+
+
+def _feature_lists(col: str = COL_SERP_FEATS) -> pl.Expr:
+    return (
+        pl.col(col)
+        .str.split(",")
+        .list.eval(pl.element().str.strip_chars().filter(pl.element() != ""))
+        .list.unique()
+    )
+
+
+def feature_vocabulary(feature_strings: pl.Series, keywords: pl.Series | None = None) -> list[str]:
+    """Every feature seen in `feature_strings`, most frequent first.
+
+    Frequency is the summed `keywords` of the strings listing a feature (one
+    per string by default). Past `MAX_FEATURES`, the rarest features share
+    a final `OTHER` bit, with a warning.
+    """
+    weight = keywords if keywords is not None else pl.Series(np.ones(len(feature_strings)))
+    seen = (
+        pl.DataFrame({COL_SERP_FEATS: feature_strings, "keywords": weight})
+        .select(_feature_lists(), "keywords")
+        .explode(COL_SERP_FEATS)
+        .drop_nulls(COL_SERP_FEATS)
+        .group_by(COL_SERP_FEATS)
+        .agg(pl.sum("keywords"))
+        .sort(["keywords", COL_SERP_FEATS], descending=[True, False])
+    )
+    vocab = seen[COL_SERP_FEATS].to_list()
+    if len(vocab) > MAX_FEATURES:
+        warnings.warn(
+            f"{len(vocab)} distinct SERP features do not fit a {MAX_FEATURES}-bit mask; "
+            f"the {len(vocab) - MAX_FEATURES + 1} rarest are counted as {OTHER!r}",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+        vocab = vocab[: MAX_FEATURES - 1] + [OTHER]
+    return vocab
+
+
+def feature_mask(vocab: list[str]) -> pl.Expr:
+    """UInt64 bitmask of the row's SERP features (bit i = `vocab[i]`).
+
+    Features missing from `vocab` set the `OTHER` bit when it has one.
+    """
+    bits = {f: 1 << i for i, f in enumerate(vocab)}
+    other = bits.get(OTHER, 0) if vocab and vocab[-1] == OTHER else 0
+    return (
+        _feature_lists()
+        .list.eval(pl.element().replace_strict(bits, default=other, return_dtype=pl.UInt64))
+        .list.unique()
+        .list.sum()
+        .fill_null(0)
+        .cast(pl.UInt64)
+        .alias(MASK)
+    )
+
+
+def mask_groups(df: pl.DataFrame) -> tuple[pl.DataFrame, list[str]]:
+    """One row per distinct feature mask with keyword, traffic and position totals, plus the vocabulary.
+
+    Rows are grouped once by the raw feature string; the vocabulary and masks
+    are then built from the distinct strings only.
+    """
+    top3 = df.with_columns(
+        pl.when(pl.col("is_top3")).then(pl.col(COL_TRAFFIC)).otherwise(0.0).alias("_top3_traffic")
+    )
+    by_string = top3.group_by(COL_SERP_FEATS).agg(
+        _wcount(df).cast(pl.Float64).alias("keywords"),
+        _wsum(df, COL_TRAFFIC).fill_null(0.0).alias("traffic"),
+        _wsum(df, "_top3_traffic").fill_null(0.0).alias("top3_traffic"),
+        _wsum(df, COL_POS).cast(pl.Float64).alias("_pos_sum"),
+        _wcount_if(df, pl.col(COL_POS).is_not_null()).cast(pl.Float64).alias("_pos_n"),
+    )
+    vocab = feature_vocabulary(by_string[COL_SERP_FEATS], by_string["keywords"])
+    groups = (
+        by_string.with_columns(feature_mask(vocab))
+        .group_by(MASK)
+        .agg(pl.col("keywords", "traffic", "top3_traffic", "_pos_sum", "_pos_n").sum())
+        .sort(MASK)
+    )
+    return groups, vocab
+
+
+def _indicators(masks: pl.Series, n: int) -> np.ndarray:
+    m = masks.to_numpy().astype(np.uint64)
+    return ((m[:, None] >> np.arange(n, dtype=np.uint64)) & np.uint64(1)).astype(np.float64)
+
+
+def _names(masks: pl.Series, vocab: list[str]) -> list[str]:
+    return [" + ".join(f for i, f in enumerate(vocab) if m >> i & 1) or "(none)" for m in masks.to_list()]
+
+
+def feature_pairs(groups: pl.DataFrame, vocab: list[str]) -> pl.DataFrame:
+    """Co-occurrence of every feature pair present in the data (upper triangle, diagonal included).
+
+    Diagonal rows are the single-feature totals (top-3 traffic there is the
+    traffic at risk if that feature pushes organic results down). `share_of_a` is the fraction of feature_a's keywords that also show
+    feature_b; `lift` compares the pair's keyword share with independence.
+    """
+    x = _indicators(groups[MASK], len(vocab))
+    w = groups.select("keywords", "traffic", "top3_traffic").to_numpy()
+    mats = [x.T @ (x * w[:, [j]]) for j in range(w.shape[1])]
+    a, b = np.triu_indices(len(vocab))
+    keep = mats[0][a, b] > 0
+    a, b = a[keep], b[keep]
+    total = float(w[:, 0].sum())
+    diag = np.diag(mats[0])
+    return (
+        pl.DataFrame(
+            {
+                "feature_a": [vocab[i] for i in a],
+                "feature_b": [vocab[i] for i in b],
+                "keywords": mats[0][a, b],
+                "traffic": mats[1][a, b],
+                "top3_traffic": mats[2][a, b],
+                "share_of_a": mats[0][a, b] / diag[a],
+                "lift": np.where(a == b, np.nan, mats[0][a, b] * total / (diag[a] * diag[b])),
+            }
+        )
+        .with_columns(pl.col("lift").fill_nan(None))
+        .sort(["keywords", "feature_a", "feature_b"], descending=[True, False, False])
+    )
+
+
+def feature_combos(groups: pl.DataFrame, vocab: list[str], top: int | None = None) -> pl.DataFrame:
+    """Exact feature sets ranked by keywords, with traffic shares and average position."""
+    total_kw = float(groups["keywords"].sum()) or 1.0
+    total_traffic = float(groups["traffic"].sum()) or 1.0
+    out = (
+        groups.with_columns(
+            pl.Series("features", _names(groups[MASK], vocab)),
+            pl.Series("n_features", _indicators(groups[MASK], len(vocab)).sum(axis=1).astype(np.uint32)),
+            (pl.col("keywords") / total_kw).alias("keyword_share"),
+            (pl.col("traffic") / total_traffic).alias("traffic_share"),
+            (pl.col("_pos_sum") / pl.col("_pos_n")).alias("avg_position"),
+        )
+        .sort(["keywords", "traffic", MASK], descending=[True, True, False])
+        .select(
+            "features",
+            "n_features",
+            "keywords",
+            "keyword_share",
+            "traffic",
+            "traffic_share",
+            "top3_traffic",
+            "avg_position",
+            MASK,
+        )
+    )
+    return out.head(top) if top else out
+
+
+def traffic_under(groups: pl.DataFrame, vocab: list[str], features: Iterable[str]) -> dict:
+    """Keywords and traffic whose SERP shows every feature in `features`."""
+    features = list(features)
+    unknown = sorted(set(features) - set(vocab))
+    if unknown:
+        raise ValueError(f"Unknown SERP features: {unknown}")
+    m = sum(1 << vocab.index(f) for f in features)
+    sub = groups.filter((pl.col(MASK) & m) == m)
+    top3_total = float(groups["top3_traffic"].sum())
+    pos_n = float(sub["_pos_n"].sum())
+    return {
+        "features": " + ".join(features),
+        "keywords": float(sub["keywords"].sum()),
+        "traffic": float(sub["traffic"].sum()),
+        "top3_traffic": float(sub["top3_traffic"].sum()),
+        "top3_traffic_share": float(sub["top3_traffic"].sum()) / top3_total if top3_total else 0.0,
+        "avg_position": float(sub["_pos_sum"].sum()) / pos_n if pos_n else None,
+    }
+
+
+def serp_cooccurrence(df: pl.DataFrame, top_combos: int = 200) -> dict[str, pl.DataFrame]:
+    """`pairs` and `combos` tables from a single pass over the rows."""
+    groups, vocab = mask_groups(df)
+    return {
+        "pairs": feature_pairs(groups, vocab),
+        "combos": feature_combos(groups, vocab, top=top_combos),
+    }
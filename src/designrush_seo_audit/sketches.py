@@ -0,0 +1,255 @@
+"""Approximate, mergeable sketch statistics for unbounded-size exports.
+
+- Distinct counts use HyperLogLog: each value is hashed, the top `precision`
+  bits pick a register and the register keeps the max leading-zero run of
+  the remaining bits. At most 2**precision registers per segment.
+- Quantiles use a log-bucketed histogram with relative accuracy `rel_acc`
+  (the DDSketch construction). Adopted over t-digest/KLL because bucketing
+  is a pure vectorized expression and merging is just adding counts; memory
+  per segment is bounded by the value range, not the row count.
+
+All sketches are built from a `LazyFrame` in one streaming pass (they share
+the scan via `pl.collect_all`); raw scans first read the URL column once to
+classify unique URLs. States are long-format frames, so shards merge with a
+single group-by (max of registers / sum of counts).
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import polars as pl
+
+from .analysis import (
+    COL_CPC,
+    COL_KEYWORD,
+    COL_POS,
+    COL_URL,
+    geo_location,
+    url_category,
+    url_service,
+)
+
+
+DEFAULT_PRECISION = 12  # 4096 registers, ~1.6% standard error
+DEFAULT_REL_ACC = 0.01
+_ZERO_BIN = -(2**31)  # bucket for values <= 0 (e.g. CPC 0.00)
+_HASH_SEED = 0x5EED
+
+# name -> (segment column, value column, kind)
+SKETCHES: dict[str, tuple[str, str, str]] = {
+    "distinct_urls_by_service": ("service", COL_URL, "hll"),
+    "distinct_keywords_by_location": ("location", COL_KEYWORD, "hll"),
+    "pos_by_service": ("service", COL_POS, "quantile"),
+    "cpc_by_service": ("service", COL_CPC, "quantile"),
+}
+
+
+@dataclass
+class SketchState:
+    """Mergeable sketch state: HLL registers and quantile-bucket counts."""
+
+    precision: int
+    rel_acc: float
+    registers: pl.DataFrame  # sketch, segment, register, rho
+    buckets: pl.DataFrame  # sketch, segment, bin, count
+
+
+def _hll_registers(lf: pl.LazyFrame, name: str, segment: str, value: str, precision: int) -> pl.LazyFrame:
+    tail_bits = 64 - precision
+    h = pl.col(value).hash(_HASH_SEED)
+    # Leading zeros of the low (64 - precision) bits, plus one
+    rest = h % (2**tail_bits)
+    rho = (rest.bitwise_leading_zeros() - precision + 1).cast(pl.UInt8)
+    return (
+        lf.filter(pl.col(segment).is_not_null() & pl.col(value).is_not_null())
+        .select(
+            pl.lit(name).alias("sketch"),
+            pl.col(segment).cast(pl.Utf8).alias("segment"),
+            (h // (2**tail_bits)).cast(pl.UInt32).alias("register"),
+            rho.alias("rho"),
+        )
+        .group_by(["sketch", "segment", "register"])
+        .agg(pl.max("rho"))
+    )
+
+
+def _quantile_buckets(lf: pl.LazyFrame, name: str, segment: str, value: str, rel_acc: float) -> pl.LazyFrame:
+    log_gamma = math.log((1 + rel_acc) / (1 - rel_acc))
+    v = pl.col(value).cast(pl.Float64)
+    return (
+        lf.filter(pl.col(segment).is_not_null() & pl.col(value).is_not_null())
+        .select(
+            pl.lit(name).alias("sketch"),
+            pl.col(segment).cast(pl.Utf8).alias("segment"),
+            pl.when(v > 0)
+            .then((v.log() / log_gamma).ceil())
+            .otherwise(_ZERO_BIN)
+            .cast(pl.Int32)
+            .alias("bin"),
+        )
+        .group_by(["sketch", "segment", "bin"])
+        .agg(pl.len().alias("count"))
+    )
+
+
+def with_sketch_segments(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """Add the segment columns the sketches need (service, geo location).
+
+    `load_positions` frames already carry them. For raw scans the URL
+    taxonomy is evaluated once per unique URL and joined back, which is far
+    cheaper than running the regex chain on every row.
+    """
+    cols = lf.collect_schema().names()
+    if "service" in cols and "location" in cols:
+        return lf
+    if "service" in cols and "url_category" in cols:
+        return lf.with_columns(
+            pl.when(pl.col("url_category") == "geo").then(geo_location(pl.col(COL_URL))).alias("location")
+        )
+    urls = lf.select(pl.col(COL_URL).unique()).collect(engine="streaming")
+    lookup = urls.select(
+        COL_URL,
+        url_service(pl.col(COL_URL)).alias("service"),
+        pl.when(url_category(pl.col(COL_URL)) == "geo").then(geo_location(pl.col(COL_URL))).alias("location"),
+    )
+    return lf.drop([c for c in ("service", "location") if c in cols]).join(
+        lookup.lazy(), on=COL_URL, how="left"
+    )
+
+
+def partial_sketches(
+    source: pl.DataFrame | pl.LazyFrame,
+    precision: int = DEFAULT_PRECISION,
+    rel_acc: float = DEFAULT_REL_ACC,
+) -> SketchState:
+    """Build every sketch in `SKETCHES` from one (streaming) pass over `source`."""
+    lf = with_sketch_segments(source.lazy())
+    hll = [
+        _hll_registers(lf, name, seg, val, precision)
+        for name, (seg, val, kind) in SKETCHES.items()
+        if kind == "hll"
+    ]
+    qnt = [
+        _quantile_buckets(lf, name, seg, val, rel_acc)
+        for name, (seg, val, kind) in SKETCHES.items()
+        if kind == "quantile"
+    ]
+    frames = pl.collect_all([pl.concat(hll), pl.concat(qnt)], engine="streaming")
+    return SketchState(precision=precision, rel_acc=rel_acc, registers=frames[0], buckets=frames[1])
+
+
+def scan_sketches(csv_path: str | Path, precision: int = DEFAULT_PRECISION, rel_acc: float = DEFAULT_REL_ACC) -> SketchState:
+    """Sketch a raw export straight from disk without materializing it."""
+    lf = pl.scan_csv(csv_path, infer_schema_length=1000).with_columns(
+        pl.col(COL_POS).cast(pl.Int64, strict=False),
+        pl.col(COL_CPC).cast(pl.Float64, strict=False),
+        pl.col(COL_KEYWORD).cast(pl.Utf8).str.strip_chars(),
+        pl.col(COL_URL).cast(pl.Utf8).str.strip_chars(),
+    )
+    return partial_sketches(lf, precision=precision, rel_acc=rel_acc)
+
+
+def merge_sketches(states: Iterable[SketchState]) -> SketchState:
+    """Merge sketch states from shards/markets (register max, bucket sum)."""
+    states = list(states)
+    if not states:
+        raise ValueError("merge_sketches() needs at least one state")
+    first = states[0]
+    if any(s.precision != first.precision or s.rel_acc != first.rel_acc for s in states):
+        raise ValueError("Cannot merge sketches built with different precision/rel_acc")
+    return SketchState(
+        precision=first.precision,
+        rel_acc=first.rel_acc,
+        registers=pl.concat([s.registers for s in states])
+        .group_by(["sketch", "segment", "register"])
+        .agg(pl.max("rho")),
+        buckets=pl.concat([s.buckets for s in states])
+        .group_by(["sketch", "segment", "bin"])
+        .agg(pl.sum("count")),
+    )
+
+
+def hll_estimates(state: SketchState, sketch: str) -> pl.DataFrame:
+    """Distinct-count estimates per segment for one HLL sketch."""
+    m = 2**state.precision
+    alpha = 0.7213 / (1 + 1.079 / m)
+    return (
+        state.registers.filter(pl.col("sketch") == sketch)
+        .group_by("segment")
+        .agg(
+            (pl.lit(2.0) ** -pl.col("rho").cast(pl.Float64)).sum().alias("_z"),
+            pl.len().alias("_filled"),
+        )
+        .with_columns((m - pl.col("_filled")).alias("_empty"))
+        .with_columns((alpha * m * m / (pl.col("_z") + pl.col("_empty"))).alias("_raw"))
+        .select(
+            "segment",
+            # Linear counting for the small range
+            pl.when((pl.col("_raw") <= 2.5 * m) & (pl.col("_empty") > 0))
+            .then(m * (m / pl.col("_empty").cast(pl.Float64)).log())
+            .otherwise(pl.col("_raw"))
+            .round(0)
+            .cast(pl.Int64)
+            .alias("estimate"),
+        )
+    )
+
+
+def quantile_estimates(state: SketchState, sketch: str, quantiles: Iterable[float] = (0.5, 0.9)) -> pl.DataFrame:
+    """Quantiles per segment (within `rel_acc` relative error) for one sketch."""
+    gamma = (1 + state.rel_acc) / (1 - state.rel_acc)
+    ranked = (
+        state.buckets.filter(pl.col("sketch") == sketch)
+        .sort(["segment", "bin"])
+        .with_columns(
+            pl.col("count").cum_sum().over("segment").alias("_cum"),
+            pl.col("count").sum().over("segment").alias("_total"),
+        )
+    )
+    value = (
+        pl.when(pl.col("bin") == _ZERO_BIN)
+        .then(0.0)
+        .otherwise(2 * pl.lit(gamma) ** pl.col("bin").cast(pl.Float64) / (gamma + 1))
+    )
+    aggs = [
+        value.filter(pl.col("_cum") > q * (pl.col("_total") - 1)).first().alias(f"p{round(q * 100)}")
+        for q in quantiles
+    ]
+    return ranked.group_by("segment").agg(aggs)
+
+
+def sketch_summary(state: SketchState) -> dict[str, pl.DataFrame]:
+    """Per-service and per-location sketch columns.
+
+    services: service, distinct_urls_est, pos_p50, pos_p90, cpc_p50, cpc_p90
+    locations: location, distinct_keywords_est
+    """
+    urls = hll_estimates(state, "distinct_urls_by_service").rename(
+        {"segment": "service", "estimate": "distinct_urls_est"}
+    )
+    # Positions are integers; rounding removes the bucket's relative error
+    pos = quantile_estimates(state, "pos_by_service").select(
+        pl.col("segment").alias("service"),
+        pl.col("p50").round(0).alias("pos_p50"),
+        pl.col("p90").round(0).alias("pos_p90"),
+    )
+    cpc = quantile_estimates(state, "cpc_by_service").rename(
+        {"segment": "service", "p50": "cpc_p50", "p90": "cpc_p90"}
+    )
+    services = urls.join(pos, on="service", how="full", coalesce=True).join(
+        cpc, on="service", how="full", coalesce=True
+    )
+    locations = (
+        hll_estimates(state, "distinct_keywords_by_location")
+        .rename({"segment": "location", "estimate": "distinct_keywords_est"})
+        .sort("distinct_keywords_est", descending=True)
+    )
+    return {"services": services, "locations": locations}
+
+
+def services_breakdown_with_sketches(services: pl.DataFrame, state: SketchState) -> pl.DataFrame:
+    """`services_breakdown` output with the sketch columns appended."""
+    return services.join(sketch_summary(state)["services"], on="service", how="left")
@@ -0,0 +1,356 @@
+"""Service taxonomy registry: validated, compiled URL → service matcher.
+
+The taxonomy is an ordered list of (regex, label) patterns; when several
+match a URL the last one wins (same as the original `pl.when` chain). It
+comes from `config/service_patterns.json` when present, otherwise from the
+built-in defaults. The config is either a list of
+`{"pattern": ..., "label": ..., "parent": ...?}` items or an object
+`{"patterns": [...], "parents": {"child": "parent", ...}}`; parents form an
+optional service hierarchy.
+
+Compiling:
+- every pattern is checked with the Polars regex engine (invalid → error)
+- patterns that are plain literals or alternations of literals
+  (`/agency/video-(marketing|production)`, `new-?york`) are expanded to
+  their literal strings and matched together in a single Aho–Corasick pass
+  (`str.extract_many`), so their count barely affects the per-URL cost;
+  only genuine regexes are matched one by one
+- literal patterns are checked for duplicates, for being unreachable
+  (every literal contains a literal of a later pattern, so a later pattern
+  always wins) and for overlaps with later patterns of another label
+
+The compiled form is cached as JSON under `artifacts/cache/taxonomy/`,
+keyed by the SHA-256 of the config, and memoized in-process per config
+file state, so `url_service` no longer re-reads the config on every call.
+Invalid configs raise `ValueError` instead of silently using the defaults.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import polars as pl
+
+
+DEFAULT_CONFIG = Path("config") / "service_patterns.json"
+CACHE_DIR = Path("artifacts") / "cache" / "taxonomy"
+OTHER = "other"
+_COMPILER_VERSION = 1
+_MAX_EXPANSIONS = 64
+_META = set(".^$*+?{}[]\\|()")
+_LOADED: dict[tuple, "Taxonomy"] = {}
+
+
+class _NotLiteral(Exception):
+    pass
+
+
+@dataclass
+class Taxonomy:
+    patterns: list[str]
+    labels: list[str]
+    literals: list[list[str] | None]  # None: matched with the regex engine
+    parents: dict[str, str]
+    issues: list[dict]
+    digest: str
+
+    @property
+    def services(self) -> list[str]:
+        return sorted(set(self.labels) | set(self.parents) | set(self.parents.values()))
+
+    def _winner(self, url: pl.Expr) -> pl.Expr:
+        """Index of the last matching pattern, -1 if none."""
+        lit_index: dict[str, int] = {}
+        for i, lits in enumerate(self.literals):
+            for lit in lits or ():
+                lit_index[lit] = i
+        parts = [pl.lit(-1, dtype=pl.Int32)]
+        if lit_index:
+            parts.append(
+                url.str.extract_many(list(lit_index), overlapping=True)
+                .list.eval(
+                    pl.element().replace_strict(list(lit_index), list(lit_index.values()), return_dtype=pl.Int32)
+                )
+                .list.max()
+            )
+        for i, (pat, lits) in enumerate(zip(self.patterns, self.literals)):
+            if lits is None:
+                parts.append(pl.when(url.str.contains(pat)).then(pl.lit(i, dtype=pl.Int32)))
+        return pl.max_horizontal(parts)
+
+    def service_expr(self, url: pl.Expr) -> pl.Expr:
+        """Service label of each URL ('other' when nothing matches)."""
+        return self._winner(url).replace_strict(
+            list(range(len(self.labels))), self.labels, default=pl.lit(OTHER), return_dtype=pl.Utf8
+        )
+
+    def group_expr(self, service: pl.Expr) -> pl.Expr:
+        """Top-level ancestor of each service label (the label itself without a parent)."""
+        roots = {label: self.ancestors(label)[-1] for label in self.services if label in self.parents}
+        if not roots:
+            return service
+        return service.replace(list(roots), list(roots.values()))
+
+    def ancestors(self, label: str) -> list[str]:
+        """[label, parent, grandparent, …]."""
+        chain = [label]
+        while chain[-1] in self.parents:
+            chain.append(self.parents[chain[-1]])
+        return chain
+
+    def validation_report(self) -> pl.DataFrame:
+        return pl.DataFrame(
+            self.issues,
+            schema={
+                "issue": pl.Utf8,
+                "index": pl.Int64,
+                "label": pl.Utf8,
+                "pattern": pl.Utf8,
+                "other_index": pl.Int64,
+                "other_label": pl.Utf8,
+                "detail": pl.Utf8,
+            },
+        )
+
+    def hit_report(self, urls: pl.Series) -> pl.DataFrame:
+        """Per-pattern hits over the distinct `urls`.
+
+        matches: URLs the pattern matches; wins: URLs it labels (last match);
+        match_ms: time for a standalone `str.contains` of that pattern.
+        status: dead (never matches), shadowed (matches but never wins), ok.
+        """
+        frame = pl.DataFrame({"url": urls}).unique()
+        wins = (
+            frame.select(self._winner(pl.col("url")).alias("index"))
+            .group_by("index")
+            .len()
+            .rename({"len": "wins"})
+        )
+        rows = []
+        for i, (pat, label, lits) in enumerate(zip(self.patterns, self.labels, self.literals)):
+            start = time.perf_counter()
+            matches = int(frame["url"].str.contains(pat).sum())
+            rows.append(
+                {
+                    "index": i,
+                    "label": label,
+                    "parent": self.parents.get(label, ""),
+                    "pattern": pat,
+                    "kind": "regex" if lits is None else "literal",
+                    "matches": matches,
+                    "match_ms": (time.perf_counter() - start) * 1000,
+                }
+            )
+        return (
+            pl.DataFrame(rows)
+            .with_columns(pl.col("index").cast(pl.Int32))
+            .join(wins, on="index", how="left")
+            .with_columns(pl.col("wins").fill_null(0))
+            .with_columns(
+                pl.when(pl.col("matches") == 0)
+                .then(pl.lit("dead"))
+                .when(pl.col("wins") == 0)
+                .then(pl.lit("shadowed"))
+                .otherwise(pl.lit("ok"))
+                .alias("status")
+            )
+            .sort("index")
+            .select("index", "label", "parent", "pattern", "kind", "matches", "wins", "status", "match_ms")
+        )
+
+
+def expand_literals(pattern: str) -> list[str] | None:
+    """Literal strings a regex is equivalent to (for substring search), or None.
+
+    Handles plain characters, escaped punctuation, (?:…)/(…) groups with `|`
+    alternation and a `?` on a single character or group.
+    """
+    try:
+        out, i = _parse_alternation(pattern, 0)
+    except _NotLiteral:
+        return None
+    if i != len(pattern) or "" in out:
+        return None
+    return sorted(set(out))
+
+
+def _parse_alternation(p: str, i: int) -> tuple[list[str], int]:
+    options, i = _parse_sequence(p, i)
+    while i < len(p) and p[i] == "|":
+        more, i = _parse_sequence(p, i + 1)
+        options = options + more
+    return options, i
+
+
+def _parse_sequence(p: str, i: int) -> tuple[list[str], int]:
+    out = [""]
+    while i < len(p) and p[i] not in "|)":
+        c = p[i]
+        if c == "(":
+            i += 1
+            if p.startswith("?:", i):
+                i += 2
+            elif p.startswith("?", i):
+                raise _NotLiteral
+            atom, i = _parse_alternation(p, i)
+            if i >= len(p) or p[i] != ")":
+                raise _NotLiteral
+            i += 1
+        elif c == "\\":
+            if i + 1 >= len(p) or p[i + 1].isalnum():
+                raise _NotLiteral
+            atom, i = [p[i + 1]], i + 2
+        elif c in _META:
+            raise _NotLiteral
+        else:
+            atom, i = [c], i + 1
+        if i < len(p) and p[i] == "?":
+            atom, i = atom + [""], i + 1
+        if i < len(p) and p[i] in "*+?{":
+            raise _NotLiteral
+        out = [a + b for a in out for b in atom]
+        if len(out) > _MAX_EXPANSIONS:
+            raise _NotLiteral
+    return out, i
+
+
+def _parse_config(data) -> tuple[list[tuple[str, str]], dict[str, str]]:
+    if isinstance(data, dict):
+        items, parents = data.get("patterns"), dict(data.get("parents") or {})
+    else:
+        items, parents = data, {}
+    if not isinstance(items, list) or not items:
+        raise ValueError("service taxonomy: expected a non-empty list of {pattern, label} items")
+    patterns = []
+    for n, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("pattern") or not item.get("label"):
+            raise ValueError(f"service taxonomy: item {n} needs non-empty 'pattern' and 'label': {item!r}")
+        label = str(item["label"])
+        patterns.append((str(item["pattern"]), label))
+        if item.get("parent"):
+            if parents.get(label, item["parent"]) != item["parent"]:
+                raise ValueError(f"service taxonomy: '{label}' has two parents")
+            parents[label] = str(item["parent"])
+    return patterns, parents
+
+
+def compile_taxonomy(patterns: list[tuple[str, str]], parents: dict[str, str] | None = None) -> Taxonomy:
+    """Validate and compile an ordered (pattern, label) list; raises ValueError on errors."""
+    parents = dict(parents or {})
+    errors = []
+    probe = pl.Series("url", [""], dtype=pl.Utf8)
+    for n, (pat, label) in enumerate(patterns):
+        try:
+            probe.str.contains(pat)
+        except pl.exceptions.PolarsError as e:
+            reason = next((ln for ln in str(e).splitlines() if ln.startswith("error:")), str(e).splitlines()[0])
+            errors.append(f"pattern {n} ({label}) {pat!r}: {reason}")
+    cycles = set()
+    for label in parents:
+        seen = [label]
+        while seen[-1] in parents:
+            seen.append(parents[seen[-1]])
+            if seen[-1] in seen[:-1]:
+                cycle = seen[seen.index(seen[-1]) :]
+                if frozenset(cycle) not in cycles:
+                    cycles.add(frozenset(cycle))
+                    errors.append(f"parent cycle: {' → '.join(cycle)}")
+                break
+    if errors:
+        raise ValueError("service taxonomy is invalid:\n- " + "\n- ".join(errors))
+
+    literals = [expand_literals(pat) for pat, _ in patterns]
+    issues = []
+
+    def issue(kind: str, i: int | None, j: int | None = None, detail: str = "", label: str | None = None) -> None:
+        issues.append(
+            {
+                "issue": kind,
+                "index": i,
+                "label": patterns[i][1] if i is not None else label,
+                "pattern": patterns[i][0] if i is not None else None,
+                "other_index": j,
+                "other_label": None if j is None else patterns[j][1],
+                "detail": detail,
+            }
+        )
+
+    first_seen: dict[str, int] = {}
+    for i, (pat, _) in enumerate(patterns):
+        if pat in first_seen:
+            issue("duplicate", first_seen[pat], i, "same pattern later in the list; the later one wins")
+        first_seen.setdefault(pat, i)
+    for i, lits_i in enumerate(literals):
+        if lits_i is None:
+            continue
+        shadowed: dict[str, int] = {}
+        for j in range(i + 1, len(patterns)):
+            lits_j = literals[j]
+            if lits_j is None or patterns[j][0] == patterns[i][0]:
+                continue
+            hit = [a for a in lits_i if any(b in a for b in lits_j)]
+            for a in hit:
+                shadowed[a] = j
+            if hit and patterns[j][1] != patterns[i][1]:
+                issue("overlap", i, j, f"URLs containing {', '.join(hit)} are labelled '{patterns[j][1]}'")
+        if shadowed and len(shadowed) == len(lits_i):
+            issue("unreachable", i, max(shadowed.values()), "a later pattern matches whenever this one does")
+    for label, parent in parents.items():
+        if label not in {lbl for _, lbl in patterns} and label not in parents.values():
+            issue("unused_parent", None, detail=f"'{label}' → '{parent}': no pattern produces '{label}'", label=label)
+
+    return Taxonomy(
+        patterns=[p for p, _ in patterns],
+        labels=[lbl for _, lbl in patterns],
+        literals=literals,
+        parents=parents,
+        issues=issues,
+        digest=_digest(patterns, parents),
+    )
+
+
+def _digest(patterns: list[tuple[str, str]], parents: dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps([_COMPILER_VERSION, patterns, parents], sort_keys=True).encode()).hexdigest()
+
+
+def _compile_cached(patterns: list[tuple[str, str]], parents: dict[str, str], cache_dir: Path | None) -> Taxonomy:
+    cached = cache_dir / f"{_digest(patterns, parents)}.json" if cache_dir else None
+    if cached and cached.exists():
+        return Taxonomy(**json.loads(cached.read_text(encoding="utf-8")))
+    taxonomy = compile_taxonomy(patterns, parents)
+    if cached:
+        try:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            cached.write_text(json.dumps(taxonomy.__dict__), encoding="utf-8")
+        except OSError:
+            pass  # read-only checkout: compile again in the next process
+    return taxonomy
+
+
+def load_taxonomy(path: str | Path | None = None, cache_dir: Path | None = CACHE_DIR) -> Taxonomy:
+    """Registry for `path` (default config/service_patterns.json, else built-in defaults).
+
+    Memoized per (path, mtime, size); compiled forms are cached on disk by
+    config hash. Raises ValueError for malformed or invalid configs.
+    """
+    cfg = Path(path) if path is not None else DEFAULT_CONFIG
+    if cfg.exists():
+        stat = cfg.stat()
+        key = (str(cfg.resolve()), stat.st_mtime_ns, stat.st_size)
+        if key not in _LOADED:
+            try:
+                data = json.loads(cfg.read_text(encoding="utf-8"))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"service taxonomy {cfg}: invalid JSON: {e}") from e
+            _LOADED[key] = _compile_cached(*_parse_config(data), cache_dir)
+        return _LOADED[key]
+    if path is not None:
+        raise FileNotFoundError(cfg)
+    if ("defaults",) not in _LOADED:
+        from .analysis import _default_service_patterns
+
+        _LOADED[("defaults",)] = compile_taxonomy(_default_service_patterns())
+    return _LOADED[("defaults",)]
@@ -0,0 +1,246 @@
+"""Keyword topic clusters with MinHash signatures and LSH banding.
+
+Keywords are tokenized into padded character 3-gram shingles per word (so
+word order and plurals barely matter: "seo agency nyc" ~ "nyc seo agencies").
+MinHash signatures are computed with NumPy over the distinct shingle hashes
+(`num_perm` multiply-shift hash functions, processed a few at a time to bound
+memory). LSH splits each signature into `bands` bands; keywords that share a
+band bucket become candidates, candidates are kept when their signature
+agreement (the Jaccard estimate) reaches `threshold`. Each keyword then
+follows its highest-volume similar keyword until a local maximum, which
+names the topic, and stays in that topic only if it is itself similar to
+the topic keyword; a chain is cut at its first keyword that is not, which
+heads a topic of its own. Every step is a sort, gather or reduce over
+arrays, so the cost is near-linear in the number of keywords.
+"""
+from __future__ import annotations
+
+import numpy as np
+import polars as pl
+
+from .analysis import (
+    COL_KEYWORD,
+    COL_POS,
+    COL_TRAFFIC,
+    COL_TRAFFIC_COST,
+    COL_URL,
+    COL_VOLUME,
+    _wcount,
+    _wcount_if,
+    _wmean,
+    _wsum,
+)
+
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands × 4 rows: buckets start catching pairs around Jaccard 0.5
+SHINGLE_SIZE = 3
+_PERM_CHUNK = 8
+_EMPTY = np.iinfo(np.uint32).max
+_HASH_SEED = 0x5EED
+
+
+def keyword_tokens(keywords: pl.Series) -> pl.DataFrame:
+    """(kid, token) rows; `kid` is the position in `keywords`, tokens are lowercased words."""
+    return (
+        pl.DataFrame(
+            {
+                "kid": pl.int_range(len(keywords), dtype=pl.UInt32, eager=True),
+                "token": keywords.str.to_lowercase().str.replace_all(r"[^\w]+", " ").str.split(" "),
+            }
+        )
+        .explode("token")
+        .filter(pl.col("token").is_not_null() & (pl.col("token") != ""))
+    )
+
+
+def token_shingles(tokens: pl.Series, k: int = SHINGLE_SIZE) -> pl.DataFrame:
+    """(tid, shingle hash) for the padded character k-grams of each token; `tid` is the position in `tokens`."""
+    return (
+        pl.DataFrame({"tid": pl.int_range(len(tokens), dtype=pl.UInt32, eager=True), "token": " " + tokens + " "})
+        .with_columns(
+            pl.int_ranges(0, pl.max_horizontal(pl.col("token").str.len_chars() - k + 1, 1)).alias("offset")
+        )
+        .explode("offset")
+        .select("tid", pl.col("token").str.slice(pl.col("offset"), k).hash(_HASH_SEED).alias("shingle"))
+    )
+
+
+def _min_by_group(values: np.ndarray, group: np.ndarray, n_groups: int) -> np.ndarray:
+    """Row-wise minimum of `values` per group id (`group` sorted ascending)."""
+    out = np.full((n_groups, values.shape[1]), _EMPTY, dtype=np.uint32)
+    if group.size:
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        out[group[starts]] = np.minimum.reduceat(values, starts, axis=0)
+    return out
+
+
+def minhash_signatures(keywords: pl.Series, num_perm: int = NUM_PERM, seed: int = 0) -> np.ndarray:
+    """(len(keywords), num_perm) uint32 MinHash matrix.
+
+    A keyword's shingle set is the union of its tokens' shingle sets, so
+    signatures are computed once per distinct token and combined with an
+    element-wise minimum. Keywords without tokens stay at the max value.
+    """
+    pairs = keyword_tokens(keywords)
+    vocab = pairs["token"].unique()
+    tid = pairs.select(pl.col("token").replace_strict(vocab, pl.int_range(len(vocab), dtype=pl.UInt32, eager=True)))
+    kid = pairs["kid"].to_numpy()
+    tid = tid.to_series().to_numpy()
+    shingles = token_shingles(vocab).sort("tid")
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+    h = shingles["shingle"].to_numpy()[:, None]
+    # Multiply-shift hashing (wrapping uint64 arithmetic), one column per permutation
+    token_sig = _min_by_group(
+        ((h * a + b) >> np.uint64(32)).astype(np.uint32), shingles["tid"].to_numpy(), len(vocab)
+    )
+    sig = np.empty((len(keywords), num_perm), dtype=np.uint32)
+    for lo in range(0, num_perm, _PERM_CHUNK):
+        sig[:, lo : lo + _PERM_CHUNK] = _min_by_group(
+            token_sig[tid, lo : lo + _PERM_CHUNK], kid, len(keywords)
+        )
+    return sig
+
+
+def lsh_parents(sig: np.ndarray, rank: np.ndarray, bands: int = BANDS, threshold: float = 0.6) -> np.ndarray:
+    """Hill-climbing parent per keyword from LSH buckets.
+
+    In every band, keywords hashing to the same bucket are linked to the
+    bucket member with the highest `rank` (e.g. search volume). A keyword's
+    parent is its highest-ranked such leader whose estimated Jaccard
+    (signature agreement) is >= threshold, or itself. Following parents
+    ends at local maxima (roots). A keyword below threshold against its
+    root is cut loose at the top of its chain and becomes a root itself,
+    and the keywords below it are checked again against the new root, so
+    every keyword is similar to its topic keyword and short, overlapping
+    keywords do not chain into one topic.
+    """
+    n, num_perm = sig.shape
+    rows = num_perm // bands
+    ids = np.flatnonzero(sig[:, 0] != _EMPTY)
+    # Low bits of the sort key hold the inverted rank so one argsort groups
+    # buckets with their highest-ranked member first
+    rank_bits = max(1, int(rank.max(initial=0)).bit_length())
+    low = np.uint64((1 << rank_bits) - 1)
+    inv_rank = low - rank[ids].astype(np.uint64)
+    src, dst = [], []
+    for band in range(bands):
+        block = sig[ids, band * rows : (band + 1) * rows].astype(np.uint64)
+        key = np.zeros(ids.size, dtype=np.uint64)
+        for col in block.T:
+            key = (key ^ col) * np.uint64(0x9E3779B97F4A7C15)
+        sort_key = (key & ~low) | inv_rank
+        order = np.argsort(sort_key)
+        sorted_key = sort_key[order] >> np.uint64(rank_bits)
+        run_start = np.r_[True, sorted_key[1:] != sorted_key[:-1]]
+        leader = order[np.flatnonzero(run_start)[np.cumsum(run_start) - 1]]
+        member = ~run_start
+        a, b = ids[order[member]], ids[leader[member]]
+        keep = (sig[a] == sig[b]).mean(axis=1) >= threshold
+        src.append(a[keep])
+        dst.append(b[keep])
+    src, dst = np.concatenate(src), np.concatenate(dst)
+    parent = np.arange(n)
+    if src.size:
+        best = np.lexsort((-rank[dst], src))
+        first = np.r_[True, src[best][1:] != src[best][:-1]]
+        parent[src[best][first]] = dst[best][first]
+    idx = np.arange(n)
+    while True:
+        root = parent
+        while not np.array_equal(up := root[root], root):
+            root = up
+        far = (sig == sig[root]).mean(axis=1) < threshold
+        if not far.any():
+            return root
+        # Cut only the topmost dissimilar keyword of each chain; the ones
+        # below it may be similar to it
+        cut = far & ~far[parent]
+        parent[cut] = idx[cut]
+
+
+def keyword_topics(
+    df: pl.DataFrame,
+    threshold: float = 0.6,
+    num_perm: int = NUM_PERM,
+    bands: int = BANDS,
+    seed: int = 0,
+) -> pl.DataFrame:
+    """Map each distinct keyword to a `topic_id` and `topic` (its anchor keyword)."""
+    keywords = (
+        df.filter(pl.col(COL_KEYWORD).is_not_null())
+        .group_by(COL_KEYWORD)
+        .agg(pl.max(COL_VOLUME).fill_null(0).alias("volume"))
+        .sort(COL_KEYWORD)
+    )
+    sig = minhash_signatures(keywords[COL_KEYWORD], num_perm=num_perm, seed=seed)
+    # Unique rank: volume, then alphabetical order
+    rank = keywords.select(
+        pl.struct(pl.col("volume"), -pl.int_range(pl.len())).rank("ordinal")
+    ).to_series().to_numpy()
+    parent = lsh_parents(sig, rank, bands=bands, threshold=threshold)
+    return keywords.select(
+        COL_KEYWORD,
+        pl.Series("topic_id", parent, dtype=pl.UInt32),
+        keywords[COL_KEYWORD].gather(parent).alias("topic"),
+    )
+
+
+def topic_clusters(df: pl.DataFrame, topics: pl.DataFrame | None = None, min_keywords: int = 2) -> pl.DataFrame:
+    """Per-topic traffic, volume, average position, movers and dominant URL.
+
+    Volume counts each keyword once even when it ranks with several URLs.
+    """
+    if topics is None:
+        topics = keyword_topics(df)
+    # Drop small topics before the row-level join
+    topics = topics.filter(pl.len().over("topic_id") >= min_keywords)
+    rows = df.join(topics, on=COL_KEYWORD, how="inner").with_columns(
+        pl.when(pl.col(COL_KEYWORD).is_first_distinct())
+        .then(pl.col(COL_VOLUME))
+        .otherwise(0)
+        .alias("_keyword_volume")
+    )
+    stats = rows.group_by("topic_id").agg(
+        pl.col(COL_KEYWORD).n_unique().alias("keywords"),
+        pl.first("topic"),
+        _wsum(rows, COL_TRAFFIC).alias("traffic"),
+        _wsum(rows, COL_TRAFFIC_COST).alias("traffic_cost"),
+        _wsum(rows, "_keyword_volume").alias("volume"),
+        _wmean(rows, COL_POS).alias("avg_position"),
+        _wcount(rows).alias("rankings"),
+        _wcount_if(rows, pl.col("pos_change") > 0).alias("improving"),
+        _wcount_if(rows, pl.col("pos_change") < 0).alias("declining"),
+        pl.col(COL_KEYWORD).unique().sort().head(5).str.join(" | ").alias("sample_keywords"),
+    )
+    dominant = (
+        rows.group_by(["topic_id", COL_URL])
+        .agg(_wsum(rows, COL_TRAFFIC).alias("_url_traffic"))
+        .sort(["topic_id", "_url_traffic", COL_URL], descending=[False, True, False])
+        .group_by("topic_id", maintain_order=True)
+        .agg(
+            pl.first(COL_URL).alias("dominant_url"),
+            pl.first("_url_traffic").alias("dominant_url_traffic"),
+        )
+    )
+    return (
+        stats.join(dominant, on="topic_id", how="left")
+        .select(
+            "topic_id",
+            "topic",
+            "keywords",
+            "rankings",
+            "traffic",
+            "traffic_cost",
+            "volume",
+            "avg_position",
+            "improving",
+            "declining",
+            "dominant_url",
+            "dominant_url_traffic",
+            "sample_keywords",
+        )
+        .sort(["traffic", "volume", "topic_id"], descending=[True, True, False])
+    )
@@ -0,0 +1,114 @@
+"""Position-bucket transitions between the previous and the current ranking.
+
+Both positions are encoded as small integer bucket codes — 0 for keywords
+without a previous position ("new"), then 1..k+1 for the buckets of the
+position edges — and packed into one cell code `from × (k + 2) + to`. A
+single group_by over (service, url_category, Keyword Intents, cell) is the
+only pass over the frame; every slice (all keywords, each service, each
+category, each intent) is rolled up from that small table, so adding
+slices costs nothing per row.
+
+- position_transitions: keywords, traffic and share of the slice per
+  (dimension, segment, from_bucket, to_bucket), with the movement
+  (up/down/same/new) of the cell
+- transition_matrix: one slice as a from × to grid, zeros filled in
+"""
+from __future__ import annotations
+
+from typing import Sequence
+
+import polars as pl
+
+from .analysis import (
+    COL_INTENTS,
+    COL_POS,
+    COL_PREV_POS,
+    COL_TRAFFIC,
+    POSITION_BUCKETS,
+    _wcount,
+    _wsum,
+    bucket_labels,
+)
+
+
+NEW = "new"
+# Slice dimensions and the frame column each one is keyed on
+DIMENSIONS = {"service": "service", "category": "url_category", "intent": COL_INTENTS}
+
+
+def bucket_code(pos: pl.Expr, edges: Sequence[int] = POSITION_BUCKETS) -> pl.Expr:
+    """1-based bucket index of `pos`; 0 where the position is missing or 0."""
+    code = pl.sum_horizontal(*(pos > e for e in edges)) + 1
+    return pl.when(pos > 0).then(code).otherwise(0).cast(pl.UInt16)
+
+
+def transition_cells(df: pl.DataFrame, edges: Sequence[int] = POSITION_BUCKETS) -> pl.DataFrame:
+    """Keywords and traffic per (service, url_category, intents, cell): the one pass over the rows."""
+    size = len(edges) + 2
+    cell = bucket_code(pl.col(COL_PREV_POS), edges) * size + bucket_code(pl.col(COL_POS), edges)
+    return (
+        df.filter(pl.col(COL_POS) > 0)
+        .group_by("service", "url_category", COL_INTENTS, cell.alias("cell"))
+        .agg(_wcount(df).alias("keywords"), _wsum(df, COL_TRAFFIC).alias("traffic"))
+    )
+
+
+def position_transitions(df: pl.DataFrame, edges: Sequence[int] = POSITION_BUCKETS) -> pl.DataFrame:
+    """Previous → current bucket counts for all keywords and per service, category and intent."""
+    cells = transition_cells(df, edges)
+    # Intent combinations count once for each intent they contain
+    by_intent = cells.with_columns(
+        pl.col(COL_INTENTS).str.split(",").list.eval(pl.element().str.strip_chars())
+    ).explode(COL_INTENTS)
+    slices = [cells.select(pl.lit("all").alias("dimension"), pl.lit("all").alias("segment"), "cell", "keywords", "traffic")]
+    for dimension, column in DIMENSIONS.items():
+        source = by_intent if column == COL_INTENTS else cells
+        slices.append(
+            source.select(
+                pl.lit(dimension).alias("dimension"), pl.col(column).alias("segment"), "cell", "keywords", "traffic"
+            )
+        )
+    labels = [NEW, *bucket_labels(edges)]
+    size = len(labels)
+    decode = dict(enumerate(labels))
+    from_code = pl.col("cell") // size
+    to_code = pl.col("cell") % size
+    return (
+        pl.concat(slices, how="vertical_relaxed")
+        .filter(pl.col("segment").is_not_null() & (pl.col("segment") != ""))
+        .group_by("dimension", "segment", "cell")
+        .agg(pl.sum("keywords"), pl.sum("traffic"))
+        .with_columns(
+            from_code.replace_strict(decode, return_dtype=pl.Utf8).alias("from_bucket"),
+            to_code.replace_strict(decode, return_dtype=pl.Utf8).alias("to_bucket"),
+            pl.when(from_code == 0)
+            .then(pl.lit(NEW))
+            .when(to_code < from_code)
+            .then(pl.lit("up"))
+            .when(to_code > from_code)
+            .then(pl.lit("down"))
+            .otherwise(pl.lit("same"))
+            .alias("movement"),
+            (pl.col("keywords") / pl.col("keywords").sum().over("dimension", "segment")).alias("share"),
+        )
+        .sort("dimension", "segment", "cell")
+        .select("dimension", "segment", "from_bucket", "to_bucket", "movement", "keywords", "traffic", "share")
+    )
+
+
+def transition_matrix(
+    transitions: pl.DataFrame,
+    dimension: str = "all",
+    segment: str = "all",
+    value: str = "keywords",
+    edges: Sequence[int] = POSITION_BUCKETS,
+) -> pl.DataFrame:
+    """One slice of `position_transitions` as a grid: a row per previous bucket, a column per current one."""
+    labels = [NEW, *bucket_labels(edges)]
+    grid = pl.DataFrame({"from_bucket": labels}).join(pl.DataFrame({"to_bucket": labels[1:]}), how="cross")
+    part = transitions.filter((pl.col("dimension") == dimension) & (pl.col("segment") == segment))
+    return (
+        grid.join(part.select("from_bucket", "to_bucket", value), on=["from_bucket", "to_bucket"], how="left", maintain_order="left")
+        .with_columns(pl.col(value).fill_null(0))
+        .pivot(on="to_bucket", index="from_bucket", values=value)
+    )